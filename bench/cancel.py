@@ -0,0 +1,98 @@
+"""
+Cancel latency check.
+
+    python -m bench.cancel
+    python -m bench.cancel --policy delete --after 1.5
+
+Starts a throttled download through the app's batch path, cancels it after
+`--after` seconds and reports how long the job took to give its slot back.
+The runs cover native progressive and DASH downloads, curl as an external
+downloader (a child process that has to be killed), and an extraction
+stuck on a slow server (bounded by CANCEL_GRACE). It also reports the
+child processes left running and the partial files left behind under the
+chosen policy.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import youtube_downloader as ytd  # noqa: E402
+from bench import scenarios as sc  # noqa: E402
+from bench.media_server import MediaServer  # noqa: E402
+
+
+class CurlApp(sc.BenchApp):
+    def _get_base_opts(self, single=False):
+        opts = super()._get_base_opts(single)
+        opts["external_downloader"] = {"default": "curl"}
+        opts["external_downloader_args"] = {"curl": ["--silent"]}
+        return opts
+
+
+def run(app, url, out, after):
+    box = {}
+
+    def job():
+        try:
+            app._batch_one(url, out, "best", "mp4")
+            box["res"] = "finished"
+        except Exception as e:
+            box["res"] = type(e).__name__
+    t = threading.Thread(target=job, daemon=True)
+    t.start()
+    time.sleep(after)
+    tok = app.tokens["batch"]
+    procs = list(tok.procs)
+    t0 = time.monotonic()
+    app._cancel("batch")
+    t.join()
+    latency = time.monotonic() - t0
+    time.sleep(1)  # children are reaped and partial files cleaned up in the background
+    alive = sum(1 for p in procs if p.poll() is None)
+    left = [f for f in os.listdir(out) if not f.endswith(".mp4") or ".part" in f]
+    return box.get("res"), latency, len(procs), alive, len(left)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Cancel latency check")
+    ap.add_argument("--after", type=float, default=1.0, help="seconds before cancelling")
+    ap.add_argument("--bandwidth", type=int, default=512, help="KB/s per connection")
+    ap.add_argument("--policy", choices=("keep", "delete"), default="keep")
+    a = ap.parse_args(argv)
+
+    fast = MediaServer(bandwidth=a.bandwidth * 1024, size=64 * 1024 * 1024, segment=256 * 1024).start()
+    slow = MediaServer(latency=60).start()
+    os.chdir(tempfile.mkdtemp(prefix="ytdl-cancel-"))
+    ytd.messagebox = sc._MessageBox()
+    cases = [
+        ("native progressive", sc.BenchApp, f"{fast.base_url}/watch/progressive/p1"),
+        ("native dash", sc.BenchApp, f"{fast.base_url}/watch/dash/d1"),
+        ("curl (child process)", CurlApp, f"{fast.base_url}/watch/progressive/c1"),
+        ("stuck extraction", sc.BenchApp, f"{slow.base_url}/watch/progressive/s1"),
+    ]
+    print(f"{'case':<22} {'result':<13} {'cancel s':>8} {'children':>8} {'alive':>5} {'leftover':>8}")
+    worst = 0
+    try:
+        for name, cls, url in cases:
+            out = os.path.join(os.getcwd(), name.split()[0])
+            os.makedirs(out, exist_ok=True)
+            cfg = dict(ytd.DEFAULT_CONFIG, download_path=out, use_aria2c=False, proxy="",
+                       cancel_partial=a.policy)
+            res, lat, kids, alive, left = run(cls(cfg), url, out, a.after)
+            worst = max(worst, lat)
+            print(f"{name:<22} {res:<13} {lat:>8.2f} {kids:>8} {alive:>5} {left:>8}")
+    finally:
+        fast.stop()
+        slow.stop()
+    print(f"worst cancel latency {worst:.2f}s (grace {ytd.CANCEL_GRACE}s)")
+    return 0 if worst <= ytd.CANCEL_GRACE + 1 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Browser cookie cache check.
+
+    python -m bench.cookies
+    python -m bench.cookies --cookies 20000 --jobs 50
+
+Builds a synthetic Firefox profile (a cookies.sqlite with --cookies rows),
+then loads cookies for --jobs YoutubeDL instances the way batch and queue
+jobs do: once with plain yt-dlp, which reads the database every time, and
+once through the app's shared cache. It then checks that touching the
+database triggers a fresh extraction and that the private on-disk copy
+is reused by a new cache and is owner-only.
+"""
+
+import argparse
+import os
+import sqlite3
+import stat
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import youtube_downloader as ytd  # noqa: E402
+
+
+def make_profile(path, n):
+    os.makedirs(path, exist_ok=True)
+    db = sqlite3.connect(os.path.join(path, "cookies.sqlite"))
+    db.execute("CREATE TABLE moz_cookies (id INTEGER PRIMARY KEY, originAttributes TEXT DEFAULT '', "
+               "name TEXT, value TEXT, host TEXT, path TEXT, expiry INTEGER, isSecure INTEGER)")
+    db.executemany("INSERT INTO moz_cookies (name, value, host, path, expiry, isSecure) VALUES (?, ?, ?, ?, ?, ?)",
+                   ((f"c{i}", "v" * 40, f".site{i % 500}.example", "/", 4102444800, 1) for i in range(n)))
+    db.execute("PRAGMA user_version = 12")
+    db.commit()
+    db.close()
+
+
+def load(cls, spec, jobs):
+    """Mean ms spent getting a YoutubeDL's cookie jar (construction not counted)."""
+    spent = 0.0
+    for _ in range(jobs):
+        with cls({"cookiesfrombrowser": spec, "quiet": True}) as ydl:
+            t0 = time.perf_counter()
+            n = len(ydl.cookiejar)
+            spent += time.perf_counter() - t0
+    return spent / jobs * 1000, n
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Browser cookie cache check")
+    ap.add_argument("--cookies", type=int, default=5000)
+    ap.add_argument("--jobs", type=int, default=20)
+    a = ap.parse_args(argv)
+
+    work = tempfile.mkdtemp(prefix="ytdl-cookies-")
+    profile = os.path.join(work, "profile")
+    make_profile(profile, a.cookies)
+    spec = ("firefox", profile, None, None)
+    ytd.COOKIES.path = os.path.join(work, ytd.COOKIE_CACHE_FILE)
+
+    plain_ms, n1 = load(ytd.yt_dlp.YoutubeDL, spec, a.jobs)
+    before = ytd.METRICS.values["ytdl_cookie_extractions"]
+    cached_ms, n2 = load(ytd.CachedCookieYDL, spec, a.jobs)
+    extractions = ytd.METRICS.values["ytdl_cookie_extractions"] - before
+    print(f"{a.jobs} jobs, {a.cookies} cookies")
+    print(f"  plain yt-dlp  {plain_ms:8.2f} ms of cookie loading per job")
+    print(f"  cached        {cached_ms:8.2f} ms of cookie loading per job ({extractions} extraction)")
+
+    db = os.path.join(profile, "cookies.sqlite")
+    os.utime(db, (time.time() + 5, time.time() + 5))
+    load(ytd.CachedCookieYDL, spec, 1)
+    refreshed = ytd.METRICS.values["ytdl_cookie_extractions"] - before - extractions
+    print(f"  after the database changed: {refreshed} new extraction")
+
+    mode = stat.S_IMODE(os.stat(ytd.COOKIES.path).st_mode)
+    fresh = ytd.CookieCache(ytd.COOKIES.path)
+    t0 = time.perf_counter()
+    n3 = len(fresh.jar(spec))
+    print(f"  from disk in a new cache: {(time.perf_counter() - t0) * 1000:.1f} ms, "
+          f"{n3} cookies, file mode {mode:o}")
+    ok = n1 == n2 == n3 == a.cookies and extractions == 1 and refreshed == 1 and \
+        ytd.METRICS.values["ytdl_cookie_extractions"] - before == 2 and (os.name == "nt" or mode == 0o600)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
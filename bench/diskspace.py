@@ -0,0 +1,127 @@
+"""
+Disk space preflight and low-space pause check.
+
+    python -m bench.diskspace
+    python -m bench.diskspace --count 12 --kind dash
+
+Three runs through the app's batch path:
+
+  preflight  the size estimate should match what is then downloaded, and
+             the downloads should reuse the preflight's extractions (one
+             info request per video, not two)
+  low space  the free-space margin starts above what the volume has, so the
+             first job has to wait; once the margin is lowered every job
+             should finish without a single failure
+  disk full  a job that hits ENOSPC mid-download waits and runs again
+             instead of failing
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import yt_dlp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import youtube_downloader as ytd  # noqa: E402
+from bench import scenarios as sc  # noqa: E402
+from bench.media_server import MediaServer  # noqa: E402
+
+
+class LogApp(sc.BenchApp):
+
+    def __init__(self, cfg):
+        super().__init__(cfg)
+        self.lines = []
+
+    def log(self, msg):
+        self.lines.append(msg)
+        super().log(msg)
+
+
+def batch(server, kind, count, tag, **cfg):
+    out = tempfile.mkdtemp(prefix="ytdl-disk-out-")
+    app = LogApp(dict(ytd.DEFAULT_CONFIG, download_path=out, use_aria2c=False, proxy="", **cfg))
+    app._apply_disk_guard()
+    urls = [f"{server.base_url}/watch/{kind}/{tag}-{i:03d}" for i in range(count)]
+    return app, out, urls
+
+
+def done_files(out):
+    return [f for f in os.listdir(out) if f.endswith(".mp4")]
+
+
+def check_preflight(server, kind, count, size):
+    server.reset_stats()
+    app, out, urls = batch(server, kind, count, "pre")
+    t0 = time.monotonic()
+    app._t_batch(urls)
+    wall = time.monotonic() - t0
+    est = [m for m in app.lines if "📐" in m]
+    got = sum(os.path.getsize(os.path.join(out, f)) for f in done_files(out))
+    shutil.rmtree(out)
+    print(f"preflight   {est[0][7:] if est else 'no estimate'}")
+    print(f"            downloaded {ytd.fmt_size(got)} in {wall:.2f}s, "
+          f"{server.info_requests} info requests for {count} videos")
+    return bool(est) and got == count * size and server.info_requests == count and not app.errors
+
+
+def check_low_space(server, kind, count, pause):
+    app, out, urls = batch(server, kind, count, "low", preflight=False)
+    ytd.DISK.poll = 0.1
+    ytd.DISK.margin = ytd.free_bytes(out) + 1024 ** 3
+    th = threading.Thread(target=app._t_batch, args=(urls,), daemon=True)
+    th.start()
+    time.sleep(pause)
+    paused = ytd.METRICS.values["ytdl_disk_paused"]
+    early = len(done_files(out))
+    ytd.DISK.margin = 0
+    th.join(120)
+    n = len(done_files(out))
+    shutil.rmtree(out)
+    print(f"low space   {paused} job paused, {early} files after {pause:.0f}s; "
+          f"{n}/{count} done after resuming, {len(app.errors)} errors")
+    return paused == 1 and early == 0 and n == count and not app.errors
+
+
+def check_disk_full():
+    calls = []
+
+    def job():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise yt_dlp.utils.DownloadError("ERROR: unable to write data: [Errno 28] No space left on device")
+        return "ok"
+    res = ytd.DISK.run(job, [tempfile.gettempdir()])
+    print(f"disk full   {len(calls)} attempts, result {res!r}")
+    return res == "ok" and len(calls) == 2
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Disk space preflight and low-space pause check")
+    ap.add_argument("--kind", default="progressive")
+    ap.add_argument("--count", type=int, default=6)
+    ap.add_argument("--size", type=float, default=2, help="MB per video")
+    ap.add_argument("--pause", type=float, default=2, help="seconds to hold the low-space run")
+    a = ap.parse_args(argv)
+
+    size = int(a.size * 1024 * 1024)
+    server = MediaServer(size=size, segment=256 * 1024).start()
+    os.chdir(tempfile.mkdtemp(prefix="ytdl-disk-"))
+    ytd.messagebox = sc._MessageBox()
+    try:
+        ok = check_preflight(server, a.kind, a.count, size)
+        ok &= check_low_space(server, a.kind, a.count, a.pause)
+        ok &= check_disk_full()
+    finally:
+        server.stop()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Metadata export check.
+
+    python -m bench.export
+    python -m bench.export --urls 1000 --latency 0.2 --workers 8
+
+Exports the metadata of a long URL list without downloading anything, the
+way the Batch page's "Export Metadata" button and `--export` do. Every
+request to the server costs `latency` seconds, like a watch page and its
+manifest. The list has duplicates, a few removed videos (404) and a few
+that fail once (503). It is exported three ways:
+  - one URL at a time through the Single page's fetch, the old way, on a
+    sample of the list
+  - headless to JSONL, stopped halfway and left with its last row cut
+    short, then resumed
+  - from the Batch page to CSV
+
+Checks:
+  - the resumed JSONL has one row per unique URL, with metadata and format
+    sizes; removed videos have an error row, the ones that failed once do not
+  - the resume skips the rows the first run exported and retries its errors
+  - the CSV has the same rows
+  - the parallel export reaches --min-rate URLs per minute
+"""
+
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import youtube_downloader as ytd  # noqa: E402
+from bench import scenarios as sc  # noqa: E402
+from bench.media_server import MediaServer  # noqa: E402
+
+
+class ExportApp(sc.BenchApp):
+    """BenchApp whose Single page fetch shows nothing."""
+
+    def __init__(self, cfg):
+        super().__init__(cfg)
+        self.batch_file = None
+        self.fetched = 0
+
+    def _display_info(self, info):
+        self.fetched += 1
+
+
+class BenchHeadless(sc.BenchOpts, ytd.HeadlessApp):
+    def log(self, msg):
+        pass
+
+
+def url_list(base, n, kind):
+    """n video URLs, every tenth listed twice, with some removed and some flaky ones."""
+    urls = []
+    for i in range(n):
+        vid = "gone" if i % 50 == 7 else "flaky" if i % 50 == 21 else "v"
+        urls.append(f"{base}/watch/{kind}/{vid}{i:05d}")
+        if i % 10 == 3:
+            urls.append(urls[-1] + "?feature=share")
+    return urls
+
+
+def jsonl_rows(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Metadata export check")
+    ap.add_argument("--urls", type=int, default=600, help="unique URLs in the list")
+    ap.add_argument("--kind", default="dash", help="progressive, dash or hls")
+    ap.add_argument("--latency", type=float, default=0.1, help="seconds per request")
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--sample", type=int, default=40, help="URLs fetched one at a time for comparison")
+    ap.add_argument("--min-rate", type=float, default=300, help="URLs per minute the export must reach")
+    a = ap.parse_args(argv)
+
+    server = MediaServer(latency=a.latency).start()
+    work = tempfile.mkdtemp(prefix="ytdl-export-")
+    os.chdir(work)
+    ytd.messagebox = sc._MessageBox()
+    cfg = dict(ytd.DEFAULT_CONFIG, download_path=os.path.join(work, "out"), use_aria2c=False, proxy="",
+               preflight=False, export_workers=a.workers, retry_backoff=1)
+    urls = url_list(server.base_url, a.urls, a.kind)
+    src = os.path.join(work, "urls.txt")
+    with open(src, "w") as f:
+        f.write("\n".join(urls) + "\n")
+    out = os.path.join(work, "meta.jsonl")
+    try:
+        app = ExportApp(cfg)
+        sample = [f"{server.base_url}/watch/{a.kind}/one{i:05d}" for i in range(a.sample)]
+        t0 = time.monotonic()
+        for url in sample:
+            app._t_fetch(url)
+        one = {"rows": app.fetched, "secs": time.monotonic() - t0}
+
+        hl = BenchHeadless(cfg)
+        ytd.INFO_CACHE.infos.clear()
+        t0 = time.monotonic()
+        run = threading.Thread(target=hl.export, args=(src, out))
+        run.start()
+        while run.is_alive():
+            if os.path.exists(out) and sum(1 for _ in open(out, "rb")) >= a.urls // 2:
+                hl.tokens["export"].cancel()
+                break
+            time.sleep(0.05)
+        run.join()
+        done = jsonl_rows(out)
+        first = {"rows": len(done), "secs": time.monotonic() - t0, "ok": sum(1 for r in done if not r["error"])}
+        with open(out, "a", encoding="utf-8") as f:
+            f.write('{"url": "' + urls[-1][:20])  # killed in the middle of a row
+
+        ytd.INFO_CACHE.infos.clear()
+        t0 = time.monotonic()
+        st = BenchHeadless(cfg).export(src, out)
+        resumed = {"rows": st["done"] + st["failed"], "secs": time.monotonic() - t0, "skipped": st["skipped"]}
+        rows = jsonl_rows(out)
+
+        ytd.INFO_CACHE.infos.clear()
+        csv_out = os.path.join(work, "meta.csv")
+        t0 = time.monotonic()
+        app._t_export(urls, csv_out)
+        with open(csv_out, encoding="utf-8", newline="") as f:
+            csv_rows = list(csv.DictReader(f))
+        gui = {"rows": len(csv_rows), "secs": time.monotonic() - t0}
+    finally:
+        server.stop()
+        shutil.rmtree(work, ignore_errors=True)
+
+    print(f"{'':<24} {'rows':>6} {'seconds':>8} {'URLs/min':>9}")
+    for name, r in (("one at a time (sample)", one), ("headless, stopped", first),
+                    ("headless, resumed", resumed), ("batch page to CSV", gui)):
+        print(f"{name:<24} {r['rows']:>6} {r['secs']:>8.2f} {r['rows'] / r['secs'] * 60:>9.0f}")
+    keys = [ytd.url_key(r["url"]) for r in rows]
+    failed = sorted(r["url"].rsplit("/", 1)[-1] for r in rows if r["error"])
+    gone = sorted(f"gone{i:05d}" for i in range(a.urls) if i % 50 == 7)
+    sized = sum(1 for r in rows if not r["error"] and r["est_size"] and all(f["size"] for f in r["formats"]))
+    print(f"JSONL rows             {len(rows)} for {a.urls} unique URLs, {len(keys) - len(set(keys))} duplicated, "
+          f"{resumed['skipped']} skipped on resume, {len(failed)} errors, {sized} with every format sized")
+    print(f"CSV rows               {len(csv_rows)}, "
+          f"{sum(1 for r in csv_rows if r['error'])} errors")
+    rate = gui["rows"] / gui["secs"] * 60
+    print(f"export vs one at a time {rate / (one['rows'] / one['secs'] * 60):.1f}x faster")
+    ok = (len(rows) == a.urls and len(set(keys)) == a.urls and failed == gone
+          and sized == a.urls - len(gone) and a.urls // 2 <= first["rows"] < a.urls
+          and resumed["skipped"] == first["ok"] and len(csv_rows) == a.urls
+          and sorted(r["url"].rsplit("/", 1)[-1] for r in csv_rows if r["error"]) == gone
+          and rate >= a.min_rate and one["rows"] == a.sample)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Format index check.
+
+    python -m bench.formats
+    python -m bench.formats --duration 7200
+
+Builds a YouTube-like info dict: progressive, H.264, VP9 and AV1 video,
+and AAC and Opus audio, some with exact sizes and some with only
+bitrates. It runs yt-dlp's own processing for every quality and
+container with the options the Single page passes (format,
+merge_output_format, with webm falling back to mkv). Every FormatIndex entry must name the same formats
+and extension yt-dlp picks. Also reports how long building the index
+takes, and how long a lookup (a dropdown change) takes.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp  # noqa: E402
+
+import youtube_downloader as ytd  # noqa: E402
+
+# itag, ext, vcodec, acodec, height, tbr (kbps), fps
+YT_FORMATS = [
+    ("139", "m4a", "none", "mp4a.40.5", None, 49, None), ("140", "m4a", "none", "mp4a.40.2", None, 129, None),
+    ("249", "webm", "none", "opus", None, 53, None), ("251", "webm", "none", "opus", None, 135, None),
+    ("18", "mp4", "avc1.42001E", "mp4a.40.2", 360, 600, 30),
+    ("160", "mp4", "avc1.4d400c", "none", 144, 80, 30), ("278", "webm", "vp9", "none", 144, 95, 30),
+    ("133", "mp4", "avc1.4d4015", "none", 240, 180, 30), ("242", "webm", "vp9", "none", 240, 200, 30),
+    ("134", "mp4", "avc1.4d401e", "none", 360, 380, 30), ("243", "webm", "vp9", "none", 360, 400, 30),
+    ("135", "mp4", "avc1.4d401f", "none", 480, 750, 30), ("244", "webm", "vp9", "none", 480, 720, 30),
+    ("136", "mp4", "avc1.64001F", "none", 720, 1500, 30), ("247", "webm", "vp9", "none", 720, 1400, 30),
+    ("398", "mp4", "av01.0.05M.08", "none", 720, 1100, 30),
+    ("137", "mp4", "avc1.640028", "none", 1080, 3000, 30), ("248", "webm", "vp9", "none", 1080, 2600, 30),
+    ("399", "mp4", "av01.0.08M.08", "none", 1080, 2100, 30),
+    ("271", "webm", "vp9", "none", 1440, 9000, 30), ("400", "mp4", "av01.0.12M.08", "none", 1440, 6500, 30),
+    ("313", "webm", "vp9", "none", 2160, 18000, 30), ("401", "mp4", "av01.0.12M.08", "none", 2160, 13000, 30),
+]
+
+
+def raw_info(duration):
+    formats = []
+    for i, (fid, ext, vc, ac, h, tbr, fps) in enumerate(YT_FORMATS):
+        f = {"format_id": fid, "ext": ext, "vcodec": vc, "acodec": ac, "tbr": tbr, "fps": fps,
+             "url": f"https://example.invalid/videoplayback?itag={fid}", "protocol": "https"}
+        if h:
+            f.update(height=h, width=h * 16 // 9)
+        if i % 2:  # half the formats only know their bitrate
+            f["filesize"] = int(tbr * 125 * duration)
+        formats.append(f)
+    return {"id": "formatindex", "title": "Format index bench", "duration": duration,
+            "webpage_url": "https://www.youtube.com/watch?v=formatindex", "extractor": "youtube",
+            "extractor_key": "Youtube", "formats": formats}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Format index check")
+    ap.add_argument("--duration", type=int, default=600, help="video length in seconds")
+    a = ap.parse_args(argv)
+
+    base = {"quiet": True, "no_warnings": True, "simulate": True}
+    with yt_dlp.YoutubeDL(base) as ydl:
+        processed = ydl.process_ie_result(raw_info(a.duration), download=False)
+    t0 = time.perf_counter()
+    ytd.format_selector.cache_clear()
+    index = ytd.FormatIndex(processed)
+    build = time.perf_counter() - t0
+
+    combos = [(q, c) for q in ytd.VIDEO_QUALITIES for c in ytd.VIDEO_FORMATS]
+    combos += [("Audio Only", c) for c in ytd.AUDIO_FORMATS]
+    bad = []
+    for qual, cont in combos:
+        audio = qual == "Audio Only"
+        opts = dict(base, format="bestaudio/best" if audio else ytd.QUALITY_MAP[qual])
+        if not audio:
+            opts["merge_output_format"] = ytd.merge_format(cont)
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            want = ydl.process_ie_result(raw_info(a.duration), download=False)
+        got = index.get(qual, cont)
+        ext = cont if audio else want["ext"]
+        if not got or (got.format_id, got.ext) != (want["format_id"], ext):
+            bad.append(f"{qual}/{cont}: index {got and (got.format_id, got.ext)}, yt-dlp {(want['format_id'], ext)}")
+
+    n = 10000
+    t0 = time.perf_counter()
+    for i in range(n):
+        index.get(*combos[i % len(combos)])
+    lookup = (time.perf_counter() - t0) / n
+
+    print(f"{'quality':<16} {'container':<9} {'formats':<8} {'ext':<5} {'size':>10}  notes")
+    for qual, cont in (("Best Quality", "mp4"), ("1080p (Full HD)", "webm"), ("480p (SD)", "mkv"),
+                       ("720p (HD)", "flv"), ("Worst Quality", "mp4"), ("Audio Only", "m4a"), ("Audio Only", "mp3")):
+        c = index.get(qual, cont)
+        notes = ", ".join(k for k in ("merge", "transcode", "incompatible") if getattr(c, k))
+        notes += "" if c.exact else " ~size"
+        print(f"{qual:<16} {cont:<9} {c.format_id:<8} {c.ext:<5} {ytd.fmt_size(c.size):>10}  {notes.strip(', ')}")
+    print(f"\n{len(combos) - len(bad)}/{len(combos)} combinations match yt-dlp's pick")
+    print(f"index built in {build * 1000:.1f} ms, lookup {lookup * 1e6:.1f} µs")
+    for line in bad:
+        print("  mismatch", line)
+    return 0 if not bad else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
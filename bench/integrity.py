@@ -0,0 +1,89 @@
+"""
+Integrity hash check.
+
+    python -m bench.integrity
+    python -m bench.integrity --algo blake2b --size 64
+
+Downloads each kind through the app's batch path with the integrity option
+on. It runs once straight to the destination, and once through a staging
+directory on another volume (/dev/shm by default), which makes the final
+move a copy. The digest in the history record must match one computed
+independently from the finished file. "read back" counts the files the app
+had to read again to hash them. It should stay at 0: the digest comes from
+the download stream or from the copy.
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import youtube_downloader as ytd  # noqa: E402
+from bench import scenarios as sc  # noqa: E402
+from bench.media_server import MediaServer  # noqa: E402
+
+
+def file_digest(algo, path):
+    h = hashlib.new(algo)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def run(server, kind, algo, stage, n):
+    out = tempfile.mkdtemp(prefix="ytdl-hash-out-")
+    ytd.STAGING.path, ytd.STAGING.cap = stage, 0
+    ytd.INTEGRITY.algo = algo
+    app = sc.BenchApp(dict(ytd.DEFAULT_CONFIG, download_path=out, use_aria2c=False, proxy="",
+                           preflight=False))
+    m0 = dict(ytd.METRICS.values)
+    t0 = time.monotonic()
+    app._t_batch([f"{server.base_url}/watch/{kind}/{kind}-{'s' if stage else 'd'}{i}" for i in range(n)])
+    wall = time.monotonic() - t0
+    good = 0
+    for rec in app.history:
+        path = os.path.join(out, f"{rec.title}.mp4")
+        if rec.hash == f"{algo}:{file_digest(algo, path)}":
+            good += 1
+    shutil.rmtree(out)
+    return {"records": len(app.history), "good": good, "wall": wall,
+            "streamed": ytd.METRICS.values["ytdl_hash_streamed"] - m0["ytdl_hash_streamed"],
+            "reads": ytd.METRICS.values["ytdl_hash_reads"] - m0["ytdl_hash_reads"]}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Integrity hash check")
+    ap.add_argument("--algo", default="sha256", choices=ytd.HASH_ALGOS[1:])
+    ap.add_argument("--kinds", default="progressive,dash,hls")
+    ap.add_argument("--count", type=int, default=2)
+    ap.add_argument("--size", type=float, default=8, help="MB per video")
+    ap.add_argument("--stage", default="/dev/shm/ytdl-bench-hash" if os.path.isdir("/dev/shm")
+                    else os.path.join(tempfile.gettempdir(), "ytdl-bench-hash"))
+    a = ap.parse_args(argv)
+
+    server = MediaServer(size=int(a.size * 1024 * 1024), segment=512 * 1024).start()
+    os.chdir(tempfile.mkdtemp(prefix="ytdl-hash-"))
+    ytd.messagebox = sc._MessageBox()
+    print(f"{'kind':<12} {'staged':>6} {'records':>7} {'match':>5} {'streamed':>8} {'read back':>9} {'wall s':>6}")
+    ok = True
+    try:
+        for kind in a.kinds.split(","):
+            for stage in ("", a.stage):
+                r = run(server, kind, a.algo, stage, a.count)
+                print(f'{kind:<12} {"yes" if stage else "no":>6} {r["records"]:>7} {r["good"]:>5} '
+                      f'{r["streamed"]:>8} {r["reads"]:>9} {r["wall"]:>6.2f}')
+                ok &= r["records"] == r["good"] == a.count and r["reads"] == 0
+    finally:
+        server.stop()
+        shutil.rmtree(a.stage, ignore_errors=True)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,335 @@
+"""
+Local media server for the offline benchmarks.
+
+Serves synthetic progressive, DASH and HLS media plus the JSON "player
+responses" the stub extractor reads. Every response can be delayed
+(latency) and paced (bandwidth) so runs are reproducible without network.
+"""
+
+import json
+import os
+import random
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BLOCK = random.Random(0x59544450).getrandbits(8 * 64 * 1024).to_bytes(64 * 1024, "little")
+KINDS = ("progressive", "dash", "hls")
+
+
+def synth_bytes(start, length):
+    """Deterministic filler: the same 64 KiB random block repeated."""
+    out = bytearray()
+    pos = start
+    while len(out) < length:
+        off = pos % len(BLOCK)
+        take = min(len(BLOCK) - off, length - len(out))
+        out += BLOCK[off:off + take]
+        pos += take
+    return bytes(out)
+
+
+class MediaServer:
+    """Threaded HTTP server with per-connection bandwidth and fixed latency.
+
+    bandwidth  bytes/s per connection, 0 = unlimited
+    latency    seconds added before every response header
+    size       bytes per video
+    segment    bytes per DASH/HLS segment
+    throttle   (after, seconds): once `after` info requests have been served,
+               answer every info request with 429 for `seconds`
+
+    Video IDs starting with "gone" get a 404 and ones starting with "flaky"
+    get a 503 on their first info request, for the retry benchmarks.
+
+    `static` is a directory of real media served under /static/, with byte
+    ranges, for the benchmarks that need ffmpeg to read what it gets.
+
+    `channels` maps a channel name to its video count. Channels list their
+    videos newest first, 30 to a page; names starting with "pl" list oldest
+    first and report a count, like a playlist.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, bandwidth=0, latency=0.0,
+                 size=8 * 1024 * 1024, segment=512 * 1024, duration=120, search_results=200,
+                 throttle=None, static=None):
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.size = size
+        self.segment = segment
+        self.duration = duration
+        self.search_results = search_results
+        self.search_requests = 0
+        self.static = static
+        self.channels = {}
+        self.channel_requests = 0
+        self.throttle = throttle
+        self.info_requests = 0
+        self.throttled_at = None
+        self.rejected = {429: 0, 404: 0, 503: 0}
+        self.flaky_seen = set()
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {}
+            self.search_requests = 0
+            self.channel_requests = 0
+            self.info_requests = 0
+            self.throttled_at = None
+            self.rejected = {429: 0, 404: 0, 503: 0}
+            self.flaky_seen = set()
+
+    def _record(self, vid, key, value=None):
+        with self.lock:
+            st = self.stats.setdefault(vid, {"bytes": 0, "requests": 0})
+            if key == "bytes":
+                st["bytes"] += value
+                st.setdefault("first_byte", time.monotonic())
+                st["last_byte"] = time.monotonic()
+            elif key == "info":
+                st.setdefault("info", time.monotonic())
+            st["requests"] += 1 if key != "bytes" else 0
+
+    def info_status(self, vid):
+        """HTTP status for an info request: 200, or the simulated error."""
+        with self.lock:
+            self.info_requests += 1
+            status = 200
+            if vid.startswith("gone"):
+                status = 404
+            elif vid.startswith("flaky") and vid not in self.flaky_seen:
+                self.flaky_seen.add(vid)
+                status = 503
+            elif self.throttle:
+                after, secs = self.throttle
+                now = time.monotonic()
+                if self.throttled_at is None and self.info_requests > after:
+                    self.throttled_at = now
+                if self.throttled_at is not None and now - self.throttled_at < secs:
+                    status = 429
+            if status != 200:
+                self.rejected[status] += 1
+            return status
+
+    # ── payloads ──
+
+    def segments(self):
+        return max(1, -(-self.size // self.segment))
+
+    def info(self, kind, vid):
+        return {"id": vid, "kind": kind, "title": f"Bench {kind} {vid}",
+                "duration": self.duration, "size": self.size}
+
+    def mpd(self, vid):
+        n = self.segments()
+        seg_ms = self.duration * 1000 // n
+        return f"""<?xml version="1.0" encoding="UTF-8"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" mediaPresentationDuration="PT{seg_ms * n / 1000:.3f}S"
+     minBufferTime="PT2S" profiles="urn:mpeg:dash:profile:isoff-on-demand:2011">
+  <Period>
+    <AdaptationSet mimeType="video/mp4" segmentAlignment="true">
+      <Representation id="av" bandwidth="{self.size * 8 // max(1, self.duration)}"
+                      codecs="avc1.4d401f,mp4a.40.2" width="1280" height="720">
+        <SegmentTemplate timescale="1000" duration="{seg_ms}" startNumber="1"
+                         initialization="init.mp4" media="seg-$Number$.m4s"/>
+      </Representation>
+    </AdaptationSet>
+  </Period>
+</MPD>
+"""
+
+    def m3u8(self, vid):
+        n = self.segments()
+        seg_dur = self.duration / n
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-PLAYLIST-TYPE:VOD",
+                 f"#EXT-X-TARGETDURATION:{int(seg_dur) + 1}", "#EXT-X-MEDIA-SEQUENCE:0"]
+        for i in range(n):
+            lines += [f"#EXTINF:{seg_dur:.3f},", f"seg-{i}.ts"]
+        lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n"
+
+    def master_m3u8(self, vid):
+        bw = self.size * 8 // max(1, self.duration)
+        return ("#EXTM3U\n"
+                f'#EXT-X-STREAM-INF:BANDWIDTH={bw},RESOLUTION=1280x720,CODECS="avc1.4d401f,mp4a.40.2"\n'
+                "media.m3u8\n")
+
+    def segment_range(self, n):
+        start = n * self.segment
+        return start, max(0, min(self.segment, self.size - start))
+
+
+def _make_handler(server):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, body, ctype, vid=None, status=200, headers=None, media=False):
+            if server.latency:
+                time.sleep(server.latency)
+            self.send_response(status)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            if self.command == "HEAD":
+                return
+            step = 16 * 1024
+            t0 = time.monotonic()
+            for i in range(0, len(body), step):
+                try:
+                    self.wfile.write(body[i:i + step])
+                except (BrokenPipeError, ConnectionResetError):
+                    return  # client went away (cancelled download)
+                if media and vid:
+                    server._record(vid, "bytes", min(step, len(body) - i))
+                if server.bandwidth:
+                    ahead = (i + step) / server.bandwidth - (time.monotonic() - t0)
+                    if ahead > 0:
+                        time.sleep(ahead)
+
+        def do_HEAD(self):
+            self.do_GET()
+
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            m = re.match(r"^/info/(\w+)/([\w-]+)\.json$", path)
+            if m:
+                kind, vid = m.groups()
+                status = server.info_status(vid)
+                if status != 200:
+                    return self._send(b"{}", "application/json", status=status,
+                                      headers={"Retry-After": "1"} if status == 429 else None)
+                server._record(vid, "info")
+                return self._send(json.dumps(server.info(kind, vid)).encode(), "application/json")
+
+            m = re.match(r"^/playlist/(\w+)/(\d+)\.json$", path)
+            if m:
+                kind, count = m.group(1), int(m.group(2))
+                body = {"id": f"pl-{kind}-{count}", "title": f"Bench {kind} playlist {count}",
+                        "entries": [f"{kind}-{i:05d}" for i in range(count)]}
+                return self._send(json.dumps(body).encode(), "application/json")
+
+            m = re.match(r"^/channel/(\w+)/([\w-]+)/(\d+)\.json$", path)
+            if m:
+                kind, name, page, per = m.group(1), m.group(2), int(m.group(3)), 30
+                with server.lock:
+                    server.channel_requests += 1
+                    size = server.channels.get(name, 0)
+                order = range(size) if name.startswith("pl") else range(size - 1, -1, -1)
+                ids = [f"{name}-{i:05d}" for i in order[page * per:(page + 1) * per]]
+                body = {"id": f"ch-{name}", "title": f"Bench channel {name}", "entries": ids,
+                        "more": (page + 1) * per < size, "count": size if name.startswith("pl") else None}
+                return self._send(json.dumps(body).encode(), "application/json")
+
+            m = re.match(r"^/search/(\d+)\.json$", path)
+            if m:
+                page, per = int(m.group(1)), 20  # YouTube returns ~20 results per continuation
+                with server.lock:
+                    server.search_requests += 1
+                ids = [f"s{i:05d}" for i in range(page * per, min((page + 1) * per, server.search_results))]
+                body = {"entries": ids, "more": (page + 1) * per < server.search_results}
+                return self._send(json.dumps(body).encode(), "application/json")
+
+            m = re.match(r"^/static/([\w-]+)(\.\w+)$", path)
+            if m and server.static:
+                try:
+                    with open(os.path.join(server.static, m.group(1) + m.group(2)), "rb") as f:
+                        data = f.read()
+                except OSError:
+                    return self._send(b"not found", "text/plain", status=404)
+                # a small send buffer, so bytes counted as sent are close to bytes read
+                self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 64 * 1024)
+                return self._ranged(data, "application/octet-stream", m.group(1))
+
+            m = re.match(r"^/media/([\w-]+)\.mp4$", path)
+            if m:
+                return self._progressive(m.group(1))
+
+            m = re.match(r"^/dash/([\w-]+)/(manifest\.mpd|init\.mp4|seg-(\d+)\.m4s)$", path)
+            if m:
+                vid, name, num = m.groups()
+                if name == "manifest.mpd":
+                    return self._send(server.mpd(vid).encode(), "application/dash+xml")
+                if name == "init.mp4":
+                    return self._send(synth_bytes(0, 1024), "video/mp4", vid, media=True)
+                start, length = server.segment_range(int(num) - 1)
+                return self._send(synth_bytes(start, length), "video/iso.segment", vid, media=True)
+
+            m = re.match(r"^/hls/([\w-]+)/(master\.m3u8|media\.m3u8|seg-(\d+)\.ts)$", path)
+            if m:
+                vid, name, num = m.groups()
+                if name == "master.m3u8":
+                    return self._send(server.master_m3u8(vid).encode(), "application/vnd.apple.mpegurl")
+                if name == "media.m3u8":
+                    return self._send(server.m3u8(vid).encode(), "application/vnd.apple.mpegurl")
+                start, length = server.segment_range(int(num))
+                return self._send(synth_bytes(start, length), "video/mp2t", vid, media=True)
+
+            self._send(b"not found", "text/plain", status=404)
+
+        def _progressive(self, vid):
+            self._ranged(None, "video/mp4", vid)
+
+        def _ranged(self, data, ctype, vid):
+            """data (synthetic media when None), honouring a Range header."""
+            size = server.size if data is None else len(data)
+
+            def body(start, length):
+                return synth_bytes(start, length) if data is None else data[start:start + length]
+            rng = self.headers.get("Range")
+            m = re.match(r"bytes=(\d*)-(\d*)", rng or "")
+            if m and (m.group(1) or m.group(2)):
+                start = int(m.group(1) or 0)
+                end = min(int(m.group(2)) if m.group(2) else size - 1, size - 1)
+                if start >= size:
+                    return self._send(b"", ctype, status=416,
+                                      headers={"Content-Range": f"bytes */{size}"})
+                return self._send(body(start, end - start + 1), ctype, vid, status=206,
+                                  headers={"Accept-Ranges": "bytes",
+                                           "Content-Range": f"bytes {start}-{end}/{size}"},
+                                  media=True)
+            self._send(body(0, size), ctype, vid, headers={"Accept-Ranges": "bytes"}, media=True)
+
+    return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Serve synthetic benchmark media")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--bandwidth", type=int, default=0, help="bytes/s per connection, 0 = unlimited")
+    ap.add_argument("--latency", type=float, default=0.0, help="seconds before each response")
+    ap.add_argument("--size", type=int, default=8 * 1024 * 1024)
+    a = ap.parse_args()
+    srv = MediaServer(port=a.port, bandwidth=a.bandwidth, latency=a.latency, size=a.size).start()
+    print(f"Serving on {srv.base_url}  (Ctrl+C to stop)")
+    try:
+        srv.thread.join()
+    except KeyboardInterrupt:
+        srv.stop()
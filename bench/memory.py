@@ -0,0 +1,187 @@
+"""
+Memory footprint of what the app keeps between downloads.
+
+    python -m bench.memory
+    python -m bench.memory --entries 20000 --formats 400
+
+Builds the state a long session holds: a fetched playlist, the video shown
+on the Single page, a full history and a long queue. It also builds the
+finished downloads whose history callbacks are still waiting on a busy Tk
+loop. Where the raw yt-dlp dicts come in, the "dicts" variant keeps them
+as the app used to. The "records" variant converts them into the slotted
+records at the same place. Each variant runs twice in its own process:
+once for peak RSS, and once under tracemalloc to count what each structure
+still holds after a gc.
+"""
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import youtube_downloader as ytd  # noqa: E402
+from bench.scenarios import _peak_rss_mb  # noqa: E402
+
+VARIANTS = ("dicts", "records")
+
+
+def flat_entry(i):
+    """A YouTube tab entry roughly as extract_flat returns it."""
+    vid = f"v{i:010d}"
+    return {
+        "_type": "url", "ie_key": "Youtube", "id": vid, "url": f"https://www.youtube.com/watch?v={vid}",
+        "title": f"Synthetic playlist entry number {i} with a realistic title", "description": None,
+        "duration": 300 + i % 900, "channel_id": "UC" + "x" * 22, "channel": "Bench Channel",
+        "channel_url": "https://www.youtube.com/channel/UC" + "x" * 22, "uploader": "Bench Channel",
+        "uploader_id": "@bench", "uploader_url": "https://www.youtube.com/@bench",
+        "thumbnails": [{"url": f"https://i.ytimg.com/vi/{vid}/hq{w}.jpg?sqp=-oaymwE{i}", "height": h, "width": w}
+                       for w, h in ((168, 94), (196, 110), (246, 138), (336, 188))],
+        "timestamp": None, "release_timestamp": None, "availability": None,
+        "view_count": 1000 + i * 7, "live_status": None, "channel_is_verified": None,
+        "__x_forwarded_for_ip": None,
+    }
+
+
+def full_info(n_formats, tag="0"):
+    """A single-video info dict with n_formats formats, as a YouTube extraction returns it."""
+    vid = f"full{tag:>07}"
+    headers = {"User-Agent": "Mozilla/5.0 (X11; Linux x86_64) Gecko/20100101 Firefox/128.0",
+               "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+               "Accept-Language": "en-us,en;q=0.5", "Sec-Fetch-Mode": "navigate"}
+    formats = [{
+        "format_id": str(100 + i), "format_note": f"{144 * (1 + i % 8)}p", "ext": "mp4",
+        "protocol": "https", "acodec": "none" if i % 3 else "mp4a.40.2", "vcodec": "avc1.64001F",
+        "url": f"https://rr{i % 9}---sn-bench.googlevideo.com/videoplayback?id={vid}&itag={i}&"
+               + "&".join(f"p{k}={'%032x' % (i * 131 + k)}" for k in range(24)),
+        "width": 256 * (1 + i % 8), "height": 144 * (1 + i % 8), "fps": 30, "filesize": 10_000_000 + i,
+        "tbr": 500.0 + i, "vbr": 450.0 + i, "abr": None, "asr": None, "audio_channels": None,
+        "quality": i % 10, "has_drm": False, "source_preference": -1, "language": None,
+        "dynamic_range": "SDR", "container": "mp4_dash", "http_headers": dict(headers),
+        "downloader_options": {"http_chunk_size": 10485760}, "aspect_ratio": 1.78,
+        "resolution": f"{256 * (1 + i % 8)}x{144 * (1 + i % 8)}", "video_ext": "mp4", "audio_ext": "none",
+        "format": f"{100 + i} - {256 * (1 + i % 8)}x{144 * (1 + i % 8)} ({144 * (1 + i % 8)}p)",
+    } for i in range(n_formats)]
+    return {
+        "id": vid, "title": f"Full info {tag}", "webpage_url": f"https://www.youtube.com/watch?v={vid}",
+        "channel": "Bench Channel", "uploader": "Bench Channel", "duration": 3600, "view_count": 123456,
+        "like_count": 4321, "upload_date": "20260101", "width": 1920, "height": 1080,
+        "resolution": "1920x1080", "filesize_approx": 512_000_000, "ext": "mp4", "format": formats[-1]["format"],
+        "thumbnail": f"https://i.ytimg.com/vi/{vid}/maxresdefault.jpg",
+        "description": "Synthetic description line.\n" * 80,
+        "formats": formats, "requested_formats": formats[-2:],
+        "thumbnails": [{"url": f"https://i.ytimg.com/vi/{vid}/t{i}.jpg", "preference": -i, "id": str(i)}
+                       for i in range(40)],
+        "automatic_captions": {f"l{i}": [{"ext": e, "url": f"https://www.youtube.com/api/timedtext?v={vid}"
+                                           f"&lang=l{i}&fmt={e}&sig={'%040x' % i}", "name": f"Lang {i}"}
+                                          for e in ("json3", "srv1", "srv2", "srv3", "ttml", "vtt")]
+                               for i in range(150)},
+        "heatmap": [{"start_time": i * 36.0, "end_time": (i + 1) * 36.0, "value": i / 100} for i in range(100)],
+        "requested_downloads": [{"filepath": f"/tmp/{vid}.mp4", "filesize": 512_000_000}],
+    }
+
+
+def build(variant, entries, formats, history, queue, pending):
+    """The state one session keeps, built the way each variant keeps it."""
+    rec = variant == "records"
+    state = {}
+
+    pl = [flat_entry(i) for i in range(entries)]  # yt-dlp hands over the whole list at once
+    state["playlist"] = [ytd.PlaylistEntry.from_entry(e) for e in pl if e] if rec else pl
+    del pl
+
+    info = full_info(formats)
+    state["current_info"] = ytd.VideoInfo.from_info(info) if rec else info
+    del info
+
+    waiting = []  # Tk callbacks: `lambda i=info: self._add_hist(i)` before, the finished entry now
+    for i in range(pending):
+        info = full_info(formats, str(i + 1))
+        waiting.append(ytd.App._hist_record(info) if rec else info)
+    state["pending"] = waiting
+    del info
+
+    hist = []
+    for i in range(history):
+        h = ytd.App._hist_record({"title": f"History item {i}", "webpage_url": f"https://youtu.be/h{i:08d}",
+                                  "format": "137+140", "filesize": 1_000_000 + i, "duration": 600},
+                                 {"elapsed": 12.5, "throughput": 2e6, "effective_throughput": 1.8e6,
+                                  "phases": {p: {"start": 0.0, "end": 1.0, "seconds": 1.0, "bytes": 0}
+                                             for p in ytd.JOB_PHASES}})
+        hist.append(h if rec else h.to_dict())
+    state["history"] = hist
+
+    items = []
+    for i in range(queue):
+        fields = dict(id=i, url=f"https://www.youtube.com/watch?v=q{i:010d}", key=f"Youtube:q{i:010d}",
+                      title=f"Queued video {i}", qual="Best Quality", fmt="mp4", type="Video", prio=0)
+        items.append(ytd.QueueItem(**fields) if rec else fields)
+    state["queue"] = items
+    return state
+
+
+def measure(variant, traced, **sizes):
+    """Child process: build the state and report peak RSS, or what each part retains."""
+    if not traced:
+        build(variant, **sizes)
+        return {"peak_rss_mb": _peak_rss_mb()}
+    tracemalloc.start()
+    state = build(variant, **sizes)
+    gc.collect()
+    total = tracemalloc.get_traced_memory()[0]
+    held = {}
+    for name in list(state):  # drop the parts one at a time to see what each held
+        gc.collect()
+        cur = tracemalloc.get_traced_memory()[0]
+        del state[name]
+        gc.collect()
+        held[name] = cur - tracemalloc.get_traced_memory()[0]
+    return {"held_mb": {k: v / 2 ** 20 for k, v in held.items()}, "total_mb": total / 2 ** 20}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Memory footprint of playlist, info, history and queue state")
+    ap.add_argument("--entries", type=int, default=5000, help="playlist entries")
+    ap.add_argument("--formats", type=int, default=300, help="formats in the Single page's info dict")
+    ap.add_argument("--history", type=int, default=500)
+    ap.add_argument("--queue", type=int, default=1000)
+    ap.add_argument("--pending", type=int, default=20, help="finished downloads waiting on the Tk loop")
+    ap.add_argument("--variant", choices=VARIANTS, help=argparse.SUPPRESS)  # child process
+    ap.add_argument("--traced", action="store_true", help=argparse.SUPPRESS)
+    a = ap.parse_args(argv)
+    sizes = dict(entries=a.entries, formats=a.formats, history=a.history, queue=a.queue, pending=a.pending)
+
+    if a.variant:
+        print(json.dumps(measure(a.variant, a.traced, **sizes)))
+        return 0
+
+    res = {}
+    for v in VARIANTS:
+        res[v] = {}
+        for traced in (False, True):
+            proc = subprocess.run([sys.executable, "-m", "bench.memory", "--variant", v]
+                                  + ["--traced"] * traced + [f"--{k}={n}" for k, n in sizes.items()],
+                                  capture_output=True, text=True,
+                                  cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            if proc.returncode != 0:
+                print(proc.stderr[-2000:], file=sys.stderr)
+                return 1
+            res[v].update(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    d, r = res["dicts"], res["records"]
+    print(f"{'held after gc':<16} {'dicts MB':>9} {'records MB':>10} {'saved':>6}")
+    for name in d["held_mb"]:
+        b, f = d["held_mb"][name], r["held_mb"][name]
+        print(f"{name:<16} {b:>9.2f} {f:>10.2f} {1 - f / b:>6.0%}" if b else f"{name:<16} {b:>9.2f} {f:>10.2f}")
+    print(f"{'total':<16} {d['total_mb']:>9.2f} {r['total_mb']:>10.2f} {1 - r['total_mb'] / d['total_mb']:>6.0%}")
+    if d["peak_rss_mb"]:
+        print(f"{'peak RSS':<16} {d['peak_rss_mb']:>9.1f} {r['peak_rss_mb']:>10.1f}")
+    return 0 if r["total_mb"] < d["total_mb"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+Job orchestrator check.
+
+    python -m bench.orchestrator
+    python -m bench.orchestrator --workers 1 --count 4 --kind dash
+
+Submits a single download, a batch, a queue run, a playlist and a search
+prefetch together, the way the GUI's start buttons do. The download pool
+has fewer slots than there are download jobs. The main thread stands in
+for the Tk loop and drains the event channel on the app's timer. The
+playlist is cancelled while it still waits for a slot. One queue item is
+paused from the start and resumed once everything else is done.
+
+Checks:
+  - the download pool never runs more jobs than it has slots
+  - the cancelled playlist never starts, and its dropped callback runs
+  - every other job finishes, the queue run too while its paused item
+    is still queued, and resuming that item runs it
+  - every worker callback runs on the main thread
+
+Also reports how long callbacks wait in the channel.
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import youtube_downloader as ytd  # noqa: E402
+from bench import scenarios as sc  # noqa: E402
+from bench.media_server import MediaServer  # noqa: E402
+
+
+class ChannelApp(sc.BenchApp):
+    """BenchApp whose worker callbacks go through the real event channel."""
+
+    def __init__(self, cfg):
+        super().__init__(cfg)
+        self.waits = []
+        self.off_thread = 0
+
+    def _ui(self, fn, *args):
+        t0 = time.monotonic()
+
+        def run():
+            self.waits.append(time.monotonic() - t0)
+            if threading.current_thread() is not threading.main_thread():
+                self.off_thread += 1
+            fn(*args)
+        ytd.App._ui(self, run)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Job orchestrator check")
+    ap.add_argument("--kind", default="progressive")
+    ap.add_argument("--count", type=int, default=3, help="videos per batch and queue run")
+    ap.add_argument("--workers", type=int, default=2, help="download pool slots")
+    ap.add_argument("--size", type=float, default=2, help="MB per video")
+    ap.add_argument("--bandwidth", type=int, default=4 * 1024 * 1024, help="bytes/s per connection")
+    a = ap.parse_args(argv)
+
+    server = MediaServer(size=int(a.size * 1024 * 1024), bandwidth=a.bandwidth).start()
+    work = tempfile.mkdtemp(prefix="ytdl-orch-")
+    os.chdir(work)
+    ytd.messagebox = sc._MessageBox()
+    out = os.path.join(work, "out")
+    app = ChannelApp(dict(ytd.DEFAULT_CONFIG, download_path=out, use_aria2c=False, proxy="",
+                          preflight=False, download_workers=a.workers))
+    app._apply_orchestrator()
+    base = f"{server.base_url}/watch/{a.kind}"
+    for i in range(a.count):
+        app.dl_counter += 1
+        item = ytd.QueueItem(id=app.dl_counter, url=f"{base}/q{i}", title=f"q{i}",
+                             qual=app.cfg["default_video_quality"], fmt="mp4", type="Video")
+        app.download_queue.append(item)
+        app.queue_widgets.append((sc._Widget(), sc._Widget(), item))
+    held = ytd.QueueItem(id=app.dl_counter + 1, url=f"{base}/held", title="held", paused=True,
+                         qual=app.cfg["default_video_quality"], fmt="mp4", type="Video")
+    app.download_queue.append(held)
+    app.queue_widgets.append((sc._Widget(), sc._Widget(), held))
+    dropped = []
+
+    t0 = time.monotonic()
+    futs = [
+        app._submit("download", app._t_download, f"{base}/s0", slot="single"),
+        app._submit("download", app._t_batch, [f"{base}/b{i}" for i in range(a.count)], slot="batch"),
+        app._submit("download", app._t_queue, slot="queue"),
+        app._submit("download", app._t_pl_dl, f"{server.base_url}/playlist/{a.kind}/{a.count}",
+                    slot="playlist", dropped=lambda: dropped.append(time.monotonic())),
+        app._submit("fetch", app._t_search_prefetch, "bench", 10, 0),
+    ]
+    app._cancel("playlist")
+    peak_run = peak_wait = 0
+    try:
+        while not all(f.done() for f in futs) or not ytd.ORCH.events.empty():
+            ytd.ORCH.drain()
+            peak_run = max(peak_run, ytd.ORCH.running["download"])
+            peak_wait = max(peak_wait, ytd.ORCH.waiting["download"])
+            time.sleep(ytd.UI_TICK_MS / 1000)
+        wall = time.monotonic() - t0
+        left = list(app.download_queue)
+        held.paused = False
+        app._wake_queue()
+        while ytd.ORCH.busy("queue") or not ytd.ORCH.events.empty():
+            ytd.ORCH.drain()
+            time.sleep(ytd.UI_TICK_MS / 1000)
+    finally:
+        server.stop()
+    files = sorted(f for f in os.listdir(out) if f.endswith(".mp4"))
+    shutil.rmtree(work, ignore_errors=True)
+
+    expect = 2 + 2 * a.count
+    waits = sorted(app.waits)
+    print(f"jobs submitted     {len(futs)} ({sum(f.cancelled() for f in futs)} dropped before starting)")
+    print(f"download pool      {a.workers} slots, peak {peak_run} running, {peak_wait} waiting")
+    print(f"files              {len(files)}/{expect}, {len(app.errors)} errors, {wall:.2f}s")
+    print(f"paused item        {'held the queue' if left != [held] else 'left queued'}, "
+          f"{'ran on resume' if not app.download_queue else 'never ran'}")
+    print(f"ui callbacks       {len(waits)}, wait p50 {statistics.median(waits) * 1000:.1f} ms, "
+          f"max {waits[-1] * 1000:.1f} ms, {app.off_thread} off the Tk thread")
+    ok = (peak_run <= a.workers and peak_wait >= 1 and futs[3].cancelled() and dropped
+          and len(files) == expect and not app.errors and app.off_thread == 0
+          and left == [held] and not app.download_queue)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
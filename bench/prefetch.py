@@ -0,0 +1,64 @@
+"""
+Info prefetch check.
+
+    python -m bench.prefetch --latency 200 --count 5
+
+Downloads `count` videos twice through the app's batch path: once cold,
+and once after INFO_CACHE.prefetch() has warmed their info dicts. For
+each pass it prints the median time from job start to first media byte
+and the number of info requests that reached the server.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import youtube_downloader as ytd  # noqa: E402
+from bench import scenarios as sc  # noqa: E402
+from bench.media_server import MediaServer  # noqa: E402
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Info prefetch check")
+    ap.add_argument("--latency", type=float, default=200, help="ms added to every response")
+    ap.add_argument("--count", type=int, default=5)
+    ap.add_argument("--size", type=float, default=2, help="MB per video")
+    a = ap.parse_args(argv)
+
+    server = MediaServer(latency=a.latency / 1000, size=int(a.size * 1024 * 1024)).start()
+    os.chdir(tempfile.mkdtemp(prefix="ytdl-prefetch-"))
+    ytd.messagebox = sc._MessageBox()
+    print(f"{'pass':<10} {'jobs':>4} {'ok':>3} {'TTFB ms':>8} {'info reqs':>9}")
+    try:
+        for name in ("cold", "prefetched"):
+            cfg = dict(ytd.DEFAULT_CONFIG, download_path=os.path.join(os.getcwd(), name),
+                       use_aria2c=False, proxy="")
+            app = sc.BenchApp(cfg)
+            urls = [f"{server.base_url}/watch/progressive/{name}-{i:03d}" for i in range(a.count)]
+            if name == "prefetched":
+                cfg["prefetch_count"] = a.count
+                app._prefetch_infos(urls)
+                while ytd.INFO_CACHE.threads:
+                    time.sleep(0.05)
+            server.reset_stats()
+            starts = {}
+            for url in urls:
+                starts[url.rsplit("/", 1)[-1]] = time.monotonic()
+                app._batch_one(url, cfg["download_path"], "best", "mp4")
+            st = dict(server.stats)
+            ttfb = [st[v]["first_byte"] - t for v, t in starts.items() if "first_byte" in st.get(v, {})]
+            done = sum(1 for f in os.listdir(cfg["download_path"]) if f.endswith(".mp4"))
+            print(f"{name:<10} {a.count:>4} {done:>3} {statistics.median(ttfb) * 1000:>8.0f} "
+                  f"{sum(s['requests'] for s in st.values()):>9}")
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
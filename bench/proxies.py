@@ -0,0 +1,86 @@
+"""
+Proxy pool check.
+
+    python -m bench.proxies
+    python -m bench.proxies --jobs 24 --workers 4 --policy round-robin
+
+Runs downloads from several threads through the app's batch path with a
+pool of local forwarding proxies: two fast exits, one slow exit and one
+that is dead (its port is closed). Prints how many jobs and bytes each
+proxy carried, its measured throughput and whether the pool evicted it.
+The slow exit should carry less than the fast ones, and the dead one
+should be evicted.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import youtube_downloader as ytd  # noqa: E402
+from bench import scenarios as sc  # noqa: E402
+from bench.media_server import MediaServer  # noqa: E402
+from bench.proxy_server import ForwardProxy  # noqa: E402
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Proxy pool check")
+    ap.add_argument("--jobs", type=int, default=20)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--size", type=float, default=1, help="MB per video")
+    ap.add_argument("--fast", type=int, default=8192, help="KB/s per connection on the fast exits")
+    ap.add_argument("--slow", type=int, default=512, help="KB/s per connection on the slow exit")
+    ap.add_argument("--policy", choices=ytd.PROXY_POLICIES, default="least-loaded")
+    a = ap.parse_args(argv)
+
+    server = MediaServer(size=int(a.size * 1024 * 1024)).start()
+    exits = {"fast-1": ForwardProxy(bandwidth=a.fast * 1024).start(),
+             "fast-2": ForwardProxy(bandwidth=a.fast * 1024).start(),
+             "slow": ForwardProxy(bandwidth=a.slow * 1024).start(),
+             "dead": ForwardProxy().start()}
+    names = {p.url: n for n, p in exits.items()}
+    exits["dead"].stop()
+
+    os.chdir(tempfile.mkdtemp(prefix="ytdl-proxies-"))
+    ytd.messagebox = sc._MessageBox()
+    out = os.path.abspath("out")
+    cfg = dict(ytd.DEFAULT_CONFIG, download_path=out, use_aria2c=False, proxy="", job_retries=0)
+    ytd.PROXIES.configure(list(names), a.policy, check_url=f"{server.base_url}/info/progressive/health.json",
+                          interval=2)
+    app = sc.BenchApp(cfg)
+
+    def job(i):
+        try:
+            app._batch_one(f"{server.base_url}/watch/progressive/p{i:04d}", out, "best", "mp4")
+            return True
+        except Exception:
+            return False
+
+    t0 = time.monotonic()
+    with ThreadPoolExecutor(max_workers=a.workers) as ex:
+        ok = sum(ex.map(job, range(a.jobs)))
+    wall = time.monotonic() - t0
+    for p in exits.values():
+        if p is not exits["dead"]:
+            p.stop()
+    server.stop()
+
+    print(f"{ok}/{a.jobs} jobs in {wall:.1f}s, policy {a.policy}")
+    print(f"{'proxy':<8} {'jobs':>5} {'MB':>7} {'MB/s':>7} {'latency ms':>10} {'evicted':>8}")
+    stats = ytd.PROXIES.stats()
+    for url, st in stats.items():
+        rate = f'{st["rate"] / 1e6:.2f}' if st["rate"] else "—"
+        lat = f'{st["latency"] * 1000:.0f}' if st["latency"] else "—"
+        print(f'{names[url]:<8} {st["jobs"]:>5} {st["bytes"] / 1e6:>7.1f} {rate:>7} {lat:>10} '
+              f'{"yes" if st["evicted"] else "no":>8}')
+    by = {names[u]: st for u, st in stats.items()}
+    good = by["dead"]["evicted"] and by["slow"]["jobs"] < min(by["fast-1"]["jobs"], by["fast-2"]["jobs"])
+    return 0 if good else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Forwarding HTTP proxy stand-in for the proxy pool benchmarks.
+
+Handles plain-HTTP proxy requests (absolute-URI GET/HEAD), which is all the
+local media server needs, with its own per-connection bandwidth cap and
+latency so a pool can have fast and slow exits. stop() closes the port, so
+a stopped proxy refuses connections like a dead exit.
+"""
+
+import http.client
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HOP_HEADERS = {"connection", "keep-alive", "proxy-connection", "proxy-authorization", "te",
+               "trailers", "transfer-encoding", "upgrade"}
+
+
+class ForwardProxy:
+
+    def __init__(self, host="127.0.0.1", port=0, bandwidth=0, latency=0.0):
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes = 0
+        self.httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _make_handler(proxy):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_HEAD(self):
+            self.do_GET()
+
+        def do_GET(self):
+            u = urllib.parse.urlsplit(self.path)
+            if not u.hostname:
+                self.send_error(400, "absolute URI expected")
+                return
+            with proxy.lock:
+                proxy.requests += 1
+            if proxy.latency:
+                time.sleep(proxy.latency)
+            conn = http.client.HTTPConnection(u.hostname, u.port or 80, timeout=30)
+            headers = {k: v for k, v in self.headers.items() if k.lower() not in HOP_HEADERS}
+            conn.request(self.command, urllib.parse.urlunsplit(("", "", u.path or "/", u.query, "")),
+                         headers=headers)
+            resp = conn.getresponse()
+            self.send_response(resp.status, resp.reason)
+            for k, v in resp.getheaders():
+                if k.lower() not in HOP_HEADERS:
+                    self.send_header(k, v)
+            self.end_headers()
+            t0, sent = time.monotonic(), 0
+            try:
+                while True:
+                    chunk = resp.read(16 * 1024)
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    sent += len(chunk)
+                    if proxy.bandwidth:
+                        ahead = sent / proxy.bandwidth - (time.monotonic() - t0)
+                        if ahead > 0:
+                            time.sleep(ahead)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                conn.close()
+                with proxy.lock:
+                    proxy.bytes += sent
+
+    return Handler
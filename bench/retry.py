@@ -0,0 +1,77 @@
+"""
+Retry and circuit breaker check.
+
+    python -m bench.retry
+    python -m bench.retry --count 12 --throttle-after 4 --throttle-for 6
+
+Runs one batch through the app's batch path against a server that starts
+answering every info request with 429 after a while, plus one video that
+is gone (404, must not be retried) and one that fails once with 503 (must
+be retried and succeed). The batch runs twice, with and without the
+circuit breaker, and reports completed jobs, how many requests hit the
+throttled server and the wall time.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import youtube_downloader as ytd  # noqa: E402
+from bench import scenarios as sc  # noqa: E402
+from bench.media_server import MediaServer  # noqa: E402
+
+
+def run(server, urls, breaker, a):
+    server.reset_stats()
+    ytd.BREAKER.hosts.clear()
+    ytd.BREAKER.threshold = 3 if breaker else 10 ** 9
+    ytd.BREAKER.cooldown = a.cooldown
+    out = tempfile.mkdtemp(prefix="ytdl-retry-", dir=os.getcwd())
+    # no preflight: its own info request for the gone video would count as a second 404
+    cfg = dict(ytd.DEFAULT_CONFIG, download_path=out, use_aria2c=False, proxy="", preflight=False,
+               job_retries=a.retries, retry_backoff=a.backoff)
+    app = sc.BenchApp(cfg)
+    app.out_e = sc._Widget(out)
+    t0 = time.monotonic()
+    app._t_batch(urls)
+    wall = time.monotonic() - t0
+    done = sum(1 for f in os.listdir(out) if f.endswith(".mp4") and ".part" not in f)
+    return done, dict(server.rejected), wall
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Retry and circuit breaker check")
+    ap.add_argument("--count", type=int, default=10, help="good videos in the batch")
+    ap.add_argument("--throttle-after", type=int, default=3, help="info requests before the 429s start")
+    ap.add_argument("--throttle-for", type=float, default=5, help="seconds the server keeps throttling")
+    ap.add_argument("--retries", type=int, default=4, help="job_retries")
+    ap.add_argument("--backoff", type=float, default=1, help="retry_backoff seconds")
+    ap.add_argument("--cooldown", type=float, default=2, help="breaker cooldown seconds")
+    a = ap.parse_args(argv)
+
+    server = MediaServer(size=256 * 1024, throttle=(a.throttle_after, a.throttle_for)).start()
+    os.chdir(tempfile.mkdtemp(prefix="ytdl-retry-"))
+    ytd.messagebox = sc._MessageBox()
+    urls = [f"{server.base_url}/watch/progressive/v{i:03d}" for i in range(a.count)]
+    urls[1:1] = [f"{server.base_url}/watch/progressive/gone1", f"{server.base_url}/watch/progressive/flaky1"]
+    want = a.count + 1  # everything except the gone video
+
+    print(f"{'breaker':<8} {'done':>4}/{want:<3} {'429s':>5} {'404s':>5} {'503s':>5} {'wall s':>7}")
+    ok = True
+    try:
+        for breaker in (True, False):
+            done, rej, wall = run(server, urls, breaker, a)
+            ok &= done == want and rej[404] == 1
+            print(f"{'on' if breaker else 'off':<8} {done:>4}/{want:<3} {rej[429]:>5} {rej[404]:>5} "
+                  f"{rej[503]:>5} {wall:>7.1f}")
+    finally:
+        server.stop()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
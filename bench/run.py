@@ -0,0 +1,126 @@
+"""
+Offline download benchmarks.
+
+    python -m bench.run
+    python -m bench.run --modes batch,queue --kinds dash --count 10 --bandwidth 4096
+    python -m bench.run --json bench_output.json
+    python -m bench.run --baseline bench_output.json --tolerance 0.15
+
+Starts the local media server, runs every (mode, kind) scenario in a fresh
+process against it, and prints throughput, median time to first byte, CPU
+time and peak RSS. With --baseline the run exits non-zero when throughput
+drops or peak RSS grows by more than --tolerance, so it can gate CI.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.media_server import KINDS, MediaServer  # noqa: E402
+from bench.scenarios import MODES  # noqa: E402
+
+
+def run_one(server, mode, kind, count, fragments, timeout):
+    server.reset_stats()
+    with tempfile.TemporaryDirectory(prefix="ytdl-bench-") as work:
+        spec = {"mode": mode, "kind": kind, "count": count, "base_url": server.base_url,
+                "workdir": work, "fragments": fragments}
+        t0 = time.monotonic()
+        proc = subprocess.run([sys.executable, "-m", "bench.scenarios", json.dumps(spec)],
+                              capture_output=True, text=True, timeout=timeout,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        wall = time.monotonic() - t0
+    if proc.returncode != 0:
+        raise RuntimeError(f"{mode}/{kind} failed:\n{proc.stderr[-2000:]}")
+    res = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    stats = dict(server.stats)
+    total = sum(s["bytes"] for s in stats.values())
+    ttfb = [s["first_byte"] - s["info"] for s in stats.values() if "info" in s and "first_byte" in s]
+    res.update(
+        bytes=total,
+        throughput_mbs=total / res["wall_s"] / 1e6 if res["wall_s"] else 0.0,
+        ttfb_ms=statistics.median(ttfb) * 1000 if ttfb else None,
+        process_wall_s=wall,
+    )
+    return res
+
+
+def compare(results, baseline, tolerance):
+    base = {(r["mode"], r["kind"]): r for r in baseline}
+    failures = []
+    for r in results:
+        b = base.get((r["mode"], r["kind"]))
+        if not b:
+            continue
+        if b["throughput_mbs"] and r["throughput_mbs"] < b["throughput_mbs"] * (1 - tolerance):
+            failures.append(f'{r["mode"]}/{r["kind"]}: throughput {r["throughput_mbs"]:.1f} MB/s '
+                            f'< baseline {b["throughput_mbs"]:.1f} MB/s')
+        if b.get("peak_rss_mb") and r.get("peak_rss_mb") and \
+                r["peak_rss_mb"] > b["peak_rss_mb"] * (1 + tolerance):
+            failures.append(f'{r["mode"]}/{r["kind"]}: peak RSS {r["peak_rss_mb"]:.0f} MB '
+                            f'> baseline {b["peak_rss_mb"]:.0f} MB')
+    return failures
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Offline download benchmarks")
+    ap.add_argument("--modes", default=",".join(MODES))
+    ap.add_argument("--kinds", default=",".join(KINDS))
+    ap.add_argument("--count", type=int, default=5, help="videos per batch/queue/playlist run")
+    ap.add_argument("--size", type=float, default=8, help="MB per video")
+    ap.add_argument("--segment", type=int, default=512, help="KB per DASH/HLS segment")
+    ap.add_argument("--bandwidth", type=int, default=0, help="KB/s per connection, 0 = unlimited")
+    ap.add_argument("--latency", type=float, default=0, help="ms added to every response")
+    ap.add_argument("--fragments", type=int, default=8, help="concurrent_fragments setting")
+    ap.add_argument("--timeout", type=float, default=600)
+    ap.add_argument("--json", help="write results to this file")
+    ap.add_argument("--baseline", help="compare against a previous --json file")
+    ap.add_argument("--tolerance", type=float, default=0.15)
+    a = ap.parse_args(argv)
+
+    server = MediaServer(bandwidth=a.bandwidth * 1024, latency=a.latency / 1000,
+                         size=int(a.size * 1024 * 1024), segment=a.segment * 1024).start()
+    results = []
+    try:
+        print(f"{'mode':<9} {'kind':<12} {'jobs':>4} {'ok':>3} {'MB':>8} {'wall s':>7} "
+              f"{'MB/s':>7} {'TTFB ms':>8} {'CPU s':>6} {'RSS MB':>7}")
+        for mode in a.modes.split(","):
+            for kind in a.kinds.split(","):
+                count = 1 if mode == "single" else a.count
+                r = run_one(server, mode, kind, count, a.fragments, a.timeout)
+                results.append(r)
+                ttfb = f'{r["ttfb_ms"]:.0f}' if r["ttfb_ms"] is not None else "—"
+                rss = f'{r["peak_rss_mb"]:.0f}' if r["peak_rss_mb"] is not None else "—"
+                print(f'{mode:<9} {kind:<12} {r["jobs"]:>4} {r["completed"]:>3} '
+                      f'{r["bytes"] / 1e6:>8.1f} {r["wall_s"]:>7.2f} {r["throughput_mbs"]:>7.1f} '
+                      f'{ttfb:>8} {r["cpu_s"]:>6.2f} {rss:>7}')
+                for err in r["errors"]:
+                    print(f"    {err}")
+    finally:
+        server.stop()
+
+    if a.json:
+        with open(a.json, "w") as f:
+            json.dump(results, f, indent=4)
+    failed = [r for r in results if r["completed"] < r["jobs"]]
+    for r in failed:
+        print(f'FAIL {r["mode"]}/{r["kind"]}: {r["completed"]}/{r["jobs"]} jobs completed')
+    if a.baseline:
+        with open(a.baseline) as f:
+            regressions = compare(results, json.load(f), a.tolerance)
+        for msg in regressions:
+            print(f"REGRESSION {msg}")
+        failed += regressions
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""
+Benchmark scenarios that drive the real App download paths headlessly.
+
+BenchApp skips the Tk window entirely: the worker-thread methods
+(_t_download, _t_batch, _t_queue, _t_pl_dl) run unchanged, while the
+widgets they read and poke are replaced by inert stand-ins, and `after` and
+the Tk event channel (`_ui`) run callbacks inline. Each scenario runs in its own process so CPU and
+peak RSS are measured per scenario.
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import youtube_downloader as ytd  # noqa: E402
+from bench.stub_extractor import BENCH_EXTRACTORS  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MODES = ("single", "batch", "queue", "playlist")
+
+
+class _Widget:
+    """Stand-in for the Tk widgets and variables the worker threads touch."""
+
+    def __init__(self, value=""):
+        self.value = value
+
+    def get(self, *args):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class _MessageBox:
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: True
+
+
+class BenchOpts:
+    """Points yt-dlp at the bench extractors only; mix in before the App class."""
+
+    def _get_base_opts(self, single=False):
+        opts = super()._get_base_opts(single)
+        opts["allowed_extractors"] = ["benchmedia.*"]
+        opts["fixup"] = "never"
+        return opts
+
+    def _ydl(self, opts):
+        ydl = super()._ydl(opts)
+        for ie in BENCH_EXTRACTORS:
+            ydl.add_info_extractor(ie())
+        return ydl
+
+
+class BenchApp(BenchOpts, ytd.App):
+
+    def __init__(self, cfg):
+        self.tk = None  # keeps tkinter's __getattr__ from recursing
+        self.cfg = cfg
+        self.history = []
+        self.download_queue = []
+        self.queue_widgets = []
+        self.dl_counter = 0
+        self.current_info = None
+        self.last_clip = ""
+        self.is_downloading = False
+        self.tokens = {}
+        self.q_running = None
+        self.q_active = False
+        self.profile_jobs = False
+        self.q_ctl = {}
+        self.ba_stop = False
+        self.pl_cbs = []
+        self.pl_entries = []
+        self.pl_urls = []
+        self.errors = []
+        widgets = {
+            "out_e": cfg["download_path"], "dl_type": "Video",
+            "qual_var": cfg["default_video_quality"], "vfmt": cfg["default_video_format"],
+            "afmt": cfg["default_audio_format"], "abr": "192",
+            "ck_thumb": False, "ck_esub": False, "ck_sthumb": False, "ck_dsub": False, "ck_sb": False,
+            "clip_var": "", "ck_keyframes": False,
+            "pl_q": cfg["default_video_quality"], "pl_f": cfg["default_video_format"],
+            "ba_q": cfg["default_video_quality"], "ba_f": cfg["default_video_format"],
+        }
+        for name in ("prog_bar", "prog_pct", "prog_speed", "prog_eta", "prog_size", "prog_stat",
+                     "dl_btn", "status_lbl", "pl_prog", "pl_stat", "ba_prog", "ba_stat", "ba_log",
+                     "q_cnt"):
+            widgets[name] = ""
+        for name, value in widgets.items():
+            setattr(self, name, _Widget(value))
+
+    def after(self, ms, func=None, *args):
+        if func:
+            func(*args)
+
+    def _ui(self, fn, *args):
+        fn(*args)
+
+    def log(self, msg):
+        if msg.startswith(("[ERR", "[ERROR")):
+            self.errors.append(msg)
+
+
+def run_scenario(mode, kind, count, base_url, workdir, fragments=8):
+    """Run one scenario in this process and return its process-level metrics."""
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)  # history/config files land in the scratch dir
+    ytd.messagebox = _MessageBox()
+
+    cfg = dict(ytd.DEFAULT_CONFIG)
+    cfg.update(download_path=os.path.join(workdir, "out"), concurrent_fragments=fragments,
+               use_aria2c=False, speed_limit=0, proxy="")
+    app = BenchApp(cfg)
+    os.makedirs(cfg["download_path"], exist_ok=True)
+    urls = [f"{base_url}/watch/{kind}/{kind}-{i:05d}" for i in range(count)]
+
+    cpu0, wall0 = _cpu(), time.monotonic()
+    if mode == "single":
+        for url in urls:
+            app._t_download(url)
+    elif mode == "batch":
+        app._t_batch(urls)
+    elif mode == "queue":
+        for url in urls:
+            app.dl_counter += 1
+            item = ytd.QueueItem(id=app.dl_counter, url=url, title=url.rsplit("/", 1)[-1],
+                                 qual=cfg["default_video_quality"], fmt="mp4", type="Video")
+            app.download_queue.append(item)
+            app.queue_widgets.append((_Widget(), _Widget(), item))
+        app._t_queue()
+    elif mode == "playlist":
+        app._t_pl_dl(f"{base_url}/playlist/{kind}/{count}")
+    else:
+        raise ValueError(f"unknown mode {mode!r}")
+    wall = time.monotonic() - wall0
+    cpu = _cpu() - cpu0
+
+    files = [f for _, _, fs in os.walk(cfg["download_path"]) for f in fs
+             if not f.endswith((".part", ".ytdl"))]
+    return {
+        "mode": mode, "kind": kind, "jobs": count,
+        "completed": len(files),
+        "history": len(app.history),
+        "wall_s": wall,
+        "cpu_s": cpu,
+        "peak_rss_mb": _peak_rss_mb(),
+        "errors": app.errors[:5],
+    }
+
+
+def _cpu():
+    if resource:
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        kids = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return own.ru_utime + own.ru_stime + kids.ru_utime + kids.ru_stime
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def _peak_rss_mb():
+    if not resource:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+if __name__ == "__main__":
+    # child entry point used by bench.run: one JSON spec in, one JSON result out
+    spec = json.loads(sys.argv[1])
+    print(json.dumps(run_scenario(**spec)))
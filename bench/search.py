@@ -0,0 +1,68 @@
+"""
+Search cache and pagination check.
+
+    python -m bench.search --latency 150 --size 15
+
+Runs the app's search cache against the bench server's paged search
+endpoint and reports, per step, the wall time and how many search
+requests reached the server: a cold first page, the same search again,
+the next page with and without a background prefetch, and a query that
+differs only in case and spacing.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import youtube_downloader as ytd  # noqa: E402
+from bench import scenarios as sc  # noqa: E402
+from bench.media_server import MediaServer  # noqa: E402
+from bench.stub_extractor import BenchSearchIE  # noqa: E402
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Search cache and pagination check")
+    ap.add_argument("--latency", type=float, default=150, help="ms added to every response")
+    ap.add_argument("--size", type=int, default=15, help="results per page")
+    a = ap.parse_args(argv)
+
+    server = MediaServer(latency=a.latency / 1000).start()
+    BenchSearchIE.BASE = server.base_url
+    os.chdir(tempfile.mkdtemp(prefix="ytdl-search-"))
+    cfg = dict(ytd.DEFAULT_CONFIG, download_path=os.getcwd())
+    app = sc.BenchApp(cfg)
+    cache = ytd.SearchCache()
+
+    def step(name, query, page):
+        before, t0 = server.search_requests, time.monotonic()
+        entries, more, hit = cache.page(query, page, a.size, lambda: app._ydl(app._search_opts()))
+        ms = (time.monotonic() - t0) * 1000
+        print(f"{name:<28} {len(entries):>4} {'hit' if hit else 'miss':>5} "
+              f"{server.search_requests - before:>4} {ms:>9.1f}")
+        return entries
+
+    print(f"{'step':<28} {'n':>4} {'cache':>5} {'reqs':>4} {'ms':>9}")
+    try:
+        first = step("page 1 (cold)", "lofi beats", 0)
+        again = step("page 1 again", "lofi beats", 0)
+        step("page 1, other spelling", "  LoFi   Beats ", 0)
+        step("page 2 (no prefetch)", "lofi beats", 1)
+        step("page 3 (no prefetch)", "lofi beats", 2)
+        step("page 1 (cold)", "jazz", 0)
+        t = threading.Thread(target=cache.page, args=("jazz", 1, a.size, lambda: app._ydl(app._search_opts())))
+        t.start()
+        t.join()
+        step("page 2 (prefetched)", "jazz", 1)
+        assert first == again
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+Section download check.
+
+    python -m bench.sections
+    python -m bench.sections --hours 3 --clip 300
+
+Builds a long real MP4 with ffmpeg, with a chapter every 10 minutes, and
+serves it with byte ranges, the way YouTube serves its https formats. The
+server paces its responses and keeps a small send buffer, so what it counts
+as sent is close to what ffmpeg read.
+It then downloads parts of the video through the Single page and the queue:
+  - a time range cut at keyframes
+  - the same range with exact cuts (re-encoded at the edges)
+  - one chapter picked by title
+  - a queued item with its own range
+
+For each part it reports the bytes the server sent and the length of the
+file that came out.
+
+Checks:
+  - each part transfers a small fraction of the source, in line with its length
+  - keyframe cuts are within a GOP of the range, and exact cuts within half a second
+
+Needs ffmpeg on PATH or the imageio-ffmpeg package.
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import youtube_downloader as ytd  # noqa: E402
+from bench import scenarios as sc  # noqa: E402
+from bench.media_server import MediaServer  # noqa: E402
+
+GOP = 2  # seconds between keyframes in the generated video
+CHAPTER = 600
+
+
+def find_ffmpeg():
+    exe = shutil.which("ffmpeg")
+    if not exe:
+        try:
+            import imageio_ffmpeg
+            exe = imageio_ffmpeg.get_ffmpeg_exe()
+        except (ImportError, RuntimeError):
+            return None
+    return exe
+
+
+def make_media(ffmpeg, root, name, seconds):
+    """<name>.mp4 and <name>.json under root."""
+    mp4 = os.path.join(root, name + ".mp4")
+    subprocess.run([ffmpeg, "-hide_banner", "-loglevel", "error", "-f", "lavfi",
+                    "-i", "testsrc2=s=128x72:r=5", "-t", str(seconds), "-c:v", "libx264",
+                    "-preset", "ultrafast", "-g", str(5 * GOP), "-b:v", "40k", "-maxrate", "40k",
+                    "-bufsize", "80k", "-movflags", "+faststart", mp4], check=True)
+    chapters = [{"start_time": s, "end_time": min(s + CHAPTER, seconds), "title": f"Part {i + 1}"}
+                for i, s in enumerate(range(0, seconds, CHAPTER))]
+    meta = {"title": f"Bench lecture {name}", "duration": seconds, "size": os.path.getsize(mp4),
+            "chapters": chapters}
+    with open(os.path.join(root, name + ".json"), "w") as f:
+        json.dump(meta, f)
+    return meta
+
+
+def media_seconds(ffmpeg, path):
+    err = subprocess.run([ffmpeg, "-hide_banner", "-i", path], capture_output=True, text=True).stderr
+    m = re.search(r"Duration: (\d+):(\d+):([\d.]+)", err)
+    return int(m[1]) * 3600 + int(m[2]) * 60 + float(m[3]) if m else None
+
+
+class SectionApp(sc.BenchApp):
+    """BenchApp that finds ffmpeg where this machine has it."""
+
+    ffmpeg_dir = None
+
+    def _get_base_opts(self, single=False):
+        opts = super()._get_base_opts(single)
+        opts["ffmpeg_location"] = self.ffmpeg_dir
+        return opts
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Section download check")
+    ap.add_argument("--hours", type=float, default=3, help="length of the source video")
+    ap.add_argument("--clip", type=int, default=300, help="seconds per time range")
+    ap.add_argument("--bandwidth", type=int, default=4 * 1024 * 1024, help="bytes/s per connection")
+    a = ap.parse_args(argv)
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        print("ffmpeg not found: install it or `pip install imageio-ffmpeg`")
+        return 2
+
+    work = tempfile.mkdtemp(prefix="ytdl-sections-")
+    os.chdir(work)
+    ytd.messagebox = sc._MessageBox()
+    bindir = os.path.join(work, "bin")
+    os.makedirs(bindir)
+    os.symlink(ffmpeg, os.path.join(bindir, "ffmpeg"))  # yt-dlp looks for it by name
+    SectionApp.ffmpeg_dir = bindir
+    static = os.path.join(work, "static")
+    os.makedirs(static)
+    seconds = int(a.hours * 3600)
+    t0 = time.monotonic()
+    meta = make_media(ffmpeg, static, "lecture", seconds)
+    print(f"source       {ytd.fmt_dur(seconds)}, {ytd.fmt_size(meta['size'])} "
+          f"(built in {time.monotonic() - t0:.1f}s)")
+
+    server = MediaServer(static=static, bandwidth=a.bandwidth).start()
+    cfg = dict(ytd.DEFAULT_CONFIG, download_path=os.path.join(work, "queue"), use_aria2c=False,
+               proxy="", preflight=False)
+    app = SectionApp(cfg)
+    app._apply_ffmpeg()
+    start = min(3600, seconds // 3)
+    rng = f"{ytd.fmt_dur(start)}-{ytd.fmt_dur(start + a.clip)}"
+    chapter = f"Part {start // CHAPTER + 2}"
+    cases = [("keyframe cuts", rng, False, a.clip),
+             ("exact cuts", rng, True, a.clip),
+             (f"chapter {chapter!r}", chapter, False, CHAPTER),
+             ("queue item", f"{ytd.fmt_dur(2 * start)}-{ytd.fmt_dur(2 * start + a.clip)}", False, a.clip)]
+    url = f"{server.base_url}/file/lecture"
+    rows = []
+    try:
+        for i, (name, sections, exact, want) in enumerate(cases):
+            out = os.path.join(work, f"out{i}")
+            server.reset_stats()
+            n_err = len(app.errors)
+            t0 = time.monotonic()
+            if name.startswith("queue"):
+                app.cfg["download_path"] = out
+                app.dl_counter += 1
+                item = ytd.QueueItem(id=app.dl_counter, url=url, title="lecture", qual="Best Quality",
+                                     fmt="mp4", type="Video", sections=sections, keyframes=exact)
+                app.download_queue.append(item)
+                app.queue_widgets.append((sc._Widget(), sc._Widget(), item))
+                app._t_queue()
+            else:
+                app.out_e.set(out)
+                app.clip_var.set(sections)
+                app.ck_keyframes.set(exact)
+                app._t_download(url)
+            wall = time.monotonic() - t0
+            files = [f for f in os.listdir(out) if f.endswith(".mp4")] if os.path.isdir(out) else []
+            got = media_seconds(ffmpeg, os.path.join(out, files[0])) if len(files) == 1 else None
+            sent = sum(st["bytes"] for st in server.stats.values())
+            rows.append({"name": name, "sent": sent, "share": sent / meta["size"], "want": want,
+                         "got": got, "exact": exact, "wall": wall, "file": files[0] if files else None,
+                         "errors": len(app.errors) - n_err})
+    finally:
+        server.stop()
+        shutil.rmtree(work, ignore_errors=True)
+
+    print(f"{'part':<24} {'sent':>9} {'of src':>7} {'clip':>6} {'wanted':>7} {'got':>8} {'secs':>6}")
+    ok = True
+    for r in rows:
+        got = "—" if r["got"] is None else f"{r['got']:.1f}"
+        print(f"{r['name']:<24} {ytd.fmt_size(r['sent']):>9} {r['share']:>7.1%} {r['want'] / seconds:>6.1%} "
+              f"{r['want']:>7} {got:>8} {r['wall']:>6.1f}  {r['file'] or ''}")
+        slack = 0.5 if r["exact"] else GOP + 0.5
+        ok &= (not r["errors"] and r["got"] is not None and abs(r["got"] - r["want"]) <= slack
+               and r["share"] <= 3 * r["want"] / seconds + 0.02)
+    for msg in app.errors:
+        print(msg[:300])
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Shared-queue scaling and crash-recovery check.
+
+    python -m bench.shared_queue
+    python -m bench.shared_queue --jobs 60 --workers 1,2,4,8
+    python -m bench.shared_queue --jobs 20 --workers 3 --kill 1
+
+Fills a fresh SQLite queue with jobs for the local media server, runs N
+headless worker processes against it, optionally SIGKILLs some of them
+mid-run so their leases have to expire and be reclaimed, then checks that
+every job finished and appears exactly once in the common history.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import youtube_downloader as ytd  # noqa: E402
+from bench.media_server import MediaServer  # noqa: E402
+from bench.scenarios import BenchOpts  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class BenchWorker(BenchOpts, ytd.HeadlessApp):
+    def log(self, msg):
+        if msg.startswith(("[ERR", "[ERROR")):
+            print(msg, file=sys.stderr, flush=True)
+
+
+def run_one(server, kind, jobs, workers, kill, lease, timeout):
+    with tempfile.TemporaryDirectory(prefix="ytdl-shared-") as work:
+        db = os.path.join(work, "jobs.db")
+        q = ytd.SharedQueue(db, "bench-runner", lease=lease)
+        q.add([f"{server.base_url}/watch/{kind}/{kind}-{i:05d}" for i in range(jobs)], "Best Quality", "mp4")
+
+        t0 = time.monotonic()
+        procs = [subprocess.Popen([sys.executable, "-m", "bench.shared_queue", "--child", db,
+                                   os.path.join(work, "out"), str(lease), f"w{i}"], cwd=ROOT)
+                 for i in range(workers)]
+        killed = 0
+        deadline = time.monotonic() + timeout
+        while any(p.poll() is None for p in procs):
+            if time.monotonic() > deadline:
+                for p in procs:
+                    p.kill()
+                raise RuntimeError(f"timed out after {timeout}s: {q.status()[0]}")
+            if killed < kill and q.status()[0].get("done", 0) >= jobs // 4:
+                procs[killed].kill()  # dies holding a lease
+                killed += 1
+            time.sleep(0.2)
+        wall = time.monotonic() - t0
+
+        counts, rows = q.status()
+        hist = q.history()
+        ids = [rec_id for rec_id, _ in hist]
+        urls = {rec["url"] for _, rec in hist}
+        ok = counts == {"done": jobs} and len(ids) == jobs and len(urls) == jobs
+        return {"workers": workers, "killed": killed, "wall_s": wall, "jobs_per_s": jobs / wall,
+                "counts": counts, "ok": ok,
+                "per_worker": {w["id"]: w["done"] for w in rows if w["id"] != "bench-runner"}}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Shared-queue scaling / recovery check")
+    ap.add_argument("--jobs", type=int, default=24)
+    ap.add_argument("--workers", default="1,2,4", help="comma-separated worker counts to try")
+    ap.add_argument("--kill", type=int, default=0, help="workers to SIGKILL mid-run")
+    ap.add_argument("--kind", default="progressive", choices=("progressive", "dash", "hls"))
+    ap.add_argument("--size", type=float, default=2, help="MB per video")
+    ap.add_argument("--bandwidth", type=int, default=2048, help="KB/s per connection")
+    ap.add_argument("--lease", type=float, default=4, help="lease seconds (short so kills recover fast)")
+    ap.add_argument("--timeout", type=float, default=600)
+    a = ap.parse_args(argv)
+
+    server = MediaServer(bandwidth=a.bandwidth * 1024, size=int(a.size * 1024 * 1024)).start()
+    failed = False
+    try:
+        print(f"{'workers':>7} {'killed':>6} {'wall s':>7} {'jobs/s':>7}  result  per worker")
+        for n in map(int, a.workers.split(",")):
+            r = run_one(server, a.kind, a.jobs, n, min(a.kill, n - 1), a.lease, a.timeout)
+            failed |= not r["ok"]
+            print(f'{r["workers"]:>7} {r["killed"]:>6} {r["wall_s"]:>7.2f} {r["jobs_per_s"]:>7.2f}  '
+                  f'{"OK" if r["ok"] else "FAIL":<6}  {sorted(r["per_worker"].values(), reverse=True)}'
+                  + ("" if r["ok"] else f'  {r["counts"]}'))
+    finally:
+        server.stop()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        db, out, lease, wid = sys.argv[2:6]
+        cfg = dict(ytd.DEFAULT_CONFIG, download_path=out, use_aria2c=False, speed_limit=0, proxy="")
+        BenchWorker(cfg).work(ytd.SharedQueue(db, wid, lease=float(lease)))
+    else:
+        sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Staging directory check.
+
+    python -m bench.staging
+    python -m bench.staging --stage /mnt/ssd/ytdl-stage --kinds progressive,dash
+
+Downloads through the app's batch path with a staging directory (by
+default on /dev/shm, normally a different volume from the temp dir used as
+the destination). A watcher polls the destination while each job runs.
+Nothing but the finished file should ever appear there, and it must never
+appear partially written. The staging directory should be empty
+afterwards. A last run sets a cap below the video size to check the
+fallback to direct writes, decided once the video's size is known.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import youtube_downloader as ytd  # noqa: E402
+from bench import scenarios as sc  # noqa: E402
+from bench.media_server import MediaServer  # noqa: E402
+
+
+def watch(out, name, size, stop, seen):
+    """Note every other file that shows up in out, and name while it is short of size."""
+    while not stop.is_set():
+        for f in os.listdir(out):
+            try:
+                n = os.path.getsize(os.path.join(out, f))
+            except OSError:
+                continue
+            if f == f".{name}.ytdl-move":
+                continue  # atomic_move's own hidden copy target
+            if f != name:
+                seen["temp"].add(f)
+            elif n < size:
+                seen["partial"].add(f)
+        time.sleep(0.005)
+
+
+def run(server, kind, stage, cap, size):
+    out = tempfile.mkdtemp(prefix="ytdl-stage-out-")
+    ytd.STAGING.path, ytd.STAGING.cap = stage, cap
+    app = sc.BenchApp(dict(ytd.DEFAULT_CONFIG, download_path=out, use_aria2c=False, proxy=""))
+    vid = f"{kind}-{int(cap)}"
+    seen, stop = {"temp": set(), "partial": set()}, threading.Event()
+    w = threading.Thread(target=watch, args=(out, f"Bench {kind} {vid}.mp4", size, stop, seen), daemon=True)
+    w.start()
+    url = f"{server.base_url}/watch/{kind}/{vid}"
+    staged0 = ytd.METRICS.values["ytdl_staged_jobs"]
+    t0 = time.monotonic()
+    app._batch_one(url, out, "best", "mp4")
+    wall = time.monotonic() - t0
+    stop.set()
+    w.join()
+    final = [f for f in os.listdir(out) if f.endswith(".mp4")]
+    left = os.listdir(stage) if os.path.isdir(stage) else []
+    shutil.rmtree(out)
+    return {"staged": ytd.METRICS.values["ytdl_staged_jobs"] > staged0, "final": len(final),
+            "temp": len(seen["temp"]), "partial": len(seen["partial"]), "left": len(left), "wall": wall}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Staging directory check")
+    ap.add_argument("--stage", default="/dev/shm/ytdl-bench-stage" if os.path.isdir("/dev/shm")
+                    else os.path.join(tempfile.gettempdir(), "ytdl-bench-stage"))
+    ap.add_argument("--kinds", default="progressive,dash,hls")
+    ap.add_argument("--size", type=float, default=4, help="MB per video")
+    ap.add_argument("--bandwidth", type=int, default=4096, help="KB/s per connection")
+    a = ap.parse_args(argv)
+
+    size = int(a.size * 1024 * 1024)
+    server = MediaServer(bandwidth=a.bandwidth * 1024, size=size, segment=256 * 1024).start()
+    os.chdir(tempfile.mkdtemp(prefix="ytdl-stage-"))
+    ytd.messagebox = sc._MessageBox()
+    cases = [(k, 0) for k in a.kinds.split(",")] + [(a.kinds.split(",")[0], 1024)]
+    print(f"{'kind':<12} {'cap':>6} {'staged':>6} {'final':>5} {'temp in dest':>12} "
+          f"{'partial seen':>12} {'left in stage':>13} {'wall s':>6}")
+    ok = True
+    try:
+        for kind, cap in cases:
+            r = run(server, kind, a.stage, cap, size)
+            print(f'{kind:<12} {cap or "—":>6} {"yes" if r["staged"] else "no":>6} {r["final"]:>5} '
+                  f'{r["temp"]:>12} {r["partial"]:>12} {r["left"]:>13} {r["wall"]:>6.2f}')
+            if cap:
+                ok &= not r["staged"] and r["final"] == 1
+            else:
+                ok &= r["staged"] and r["final"] == 1 and not (r["temp"] or r["partial"] or r["left"])
+    finally:
+        server.stop()
+        shutil.rmtree(a.stage, ignore_errors=True)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Content store check.
+
+    python -m bench.store
+    python -m bench.store --store /dev/shm/ytdl-store --kind dash
+
+Downloads two overlapping playlists and then a batch of the same videos,
+each into its own folder, with a content store on. Videos that were
+already downloaded should come from the store as links, not from the
+server. By default the store sits on the same volume as the folders, so
+the links are hardlinks. A store on another volume gives symlinks. gc()
+must keep every entry that a folder still links to. Once the folders are
+deleted, it must remove everything.
+
+Two failure cases run without the server:
+  - symlinking fails after the store took the file: the video must stay in
+    its folder and gc() must not remove anything
+  - two processes share a store (two ContentStore objects on one path): gc()
+    from one must keep the other's videos
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import youtube_downloader as ytd  # noqa: E402
+from bench import scenarios as sc  # noqa: E402
+from bench.media_server import MediaServer  # noqa: E402
+
+
+def downloaded(server):
+    return sum(s["bytes"] for s in server.stats.values())
+
+
+def failures(work):
+    """The two failure cases; True when no video was lost."""
+    def video(name):
+        path = os.path.join(work, "fail", name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(os.urandom(1000))
+        return path
+
+    store = ytd.ContentStore(os.path.join(work, "store-fail"), "symlink")
+    path = video("a.mp4")
+    symlink, ytd.os.symlink = ytd.os.symlink, lambda *a, **k: (_ for _ in ()).throw(OSError("no privilege"))
+    try:
+        store.put("aa" + "0" * 22, path)
+    finally:
+        ytd.os.symlink = symlink
+    kept = os.path.isfile(path) and not os.path.islink(path)
+    swept = store.gc()
+    print(f"symlink fails      video {'kept' if kept else 'LOST'} in its folder; gc removed {swept[0]}")
+
+    shared = os.path.join(work, "store-shared")
+    one, two = ytd.ContentStore(shared, "symlink"), ytd.ContentStore(shared, "symlink")
+    one.gc()
+    two.gc()  # both have read the (empty) index
+    b, c = video("b.mp4"), video("c.mp4")
+    one.put("bb" + "0" * 22, b)
+    two.put("cc" + "0" * 22, c)
+    swept2 = one.gc()
+    both = all(os.path.isfile(p) for p in (b, c))
+    print(f"two stores         {len(one.index)} entries; gc removed {swept2[0]}; "
+          f"videos {'kept' if both else 'LOST'}")
+    return kept and swept == (0, 0) and both and swept2 == (0, 0) and len(one.index) == 2
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Content store check")
+    ap.add_argument("--kind", default="progressive")
+    ap.add_argument("--size", type=float, default=4, help="MB per video")
+    ap.add_argument("--store", help="store directory (default: beside the download folders)")
+    ap.add_argument("--link", default="auto", choices=ytd.STORE_LINKS)
+    a = ap.parse_args(argv)
+
+    size = int(a.size * 1024 * 1024)
+    server = MediaServer(size=size, segment=512 * 1024).start()
+    work = tempfile.mkdtemp(prefix="ytdl-store-")
+    os.chdir(work)
+    ytd.messagebox = sc._MessageBox()
+    ytd.STORE.path, ytd.STORE.mode = a.store or os.path.join(work, "store"), a.link
+    base = server.base_url
+    runs = [("playlist A (3)", "playlist", f"{base}/playlist/{a.kind}/3", 3),
+            ("playlist B (5)", "playlist", f"{base}/playlist/{a.kind}/5", 2),
+            ("batch (5)", "batch", [f"{base}/watch/{a.kind}/{a.kind}-{i:05d}" for i in range(5)], 0)]
+    print(f"{'run':<16} {'files':>5} {'downloaded MB':>13} {'store hits':>10} {'expected new':>12}")
+    ok = True
+    try:
+        for i, (name, mode, target, new) in enumerate(runs):
+            out = os.path.join(work, f"out{i}")
+            app = sc.BenchApp(dict(ytd.DEFAULT_CONFIG, download_path=out, use_aria2c=False, proxy="",
+                                   preflight=False))
+            server.reset_stats()
+            hits = ytd.METRICS.values["ytdl_store_hits"]
+            app.out_e.set(out)
+            if mode == "playlist":
+                app._t_pl_dl(target)
+            else:
+                app._t_batch(target)
+            files = [f for _, _, fs in os.walk(out) for f in fs if f.endswith(".mp4")]
+            got = downloaded(server)
+            hits = ytd.METRICS.values["ytdl_store_hits"] - hits
+            print(f"{name:<16} {len(files):>5} {got / 1e6:>13.1f} {hits:>10} {new:>12}")
+            ok &= got == new * size and hits == len(files) - new and not app.errors
+
+        links = {how for e in ytd.STORE.index.values() for how in e["links"].values()}
+        shutil.rmtree(os.path.join(work, "out0"))
+        kept = ytd.STORE.gc()
+        for i in (1, 2):
+            shutil.rmtree(os.path.join(work, f"out{i}"))
+        gone = ytd.STORE.gc()
+        print(f"link kinds {sorted(links)}; gc with folders left: {kept[0]} removed; "
+              f"after deleting them: {gone[0]} removed, {ytd.fmt_size(gone[1])} freed")
+        ok &= kept[0] == 0 and gone[0] == 5 and not ytd.STORE.index
+        ok &= failures(work)
+    finally:
+        server.stop()
+        if a.store:
+            shutil.rmtree(a.store, ignore_errors=True)
+        shutil.rmtree(work, ignore_errors=True)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
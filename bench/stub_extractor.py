@@ -0,0 +1,122 @@
+"""
+yt-dlp extractor for the local benchmark media server.
+
+URLs look like  http://127.0.0.1:<port>/watch/<kind>/<id>
+           and  http://127.0.0.1:<port>/playlist/<kind>/<count>
+           and  http://127.0.0.1:<port>/channel/<kind>/<name>
+           and  http://127.0.0.1:<port>/file/<name>
+where <kind> is progressive, dash or hls. Channels are read a page at a
+time, only as far as the caller iterates. /file/ URLs are real media from
+the server's static directory: <name>.mp4, described by <name>.json
+(title, duration, size, chapters). BenchSearchIE answers
+`ytsearch…:` queries from the same server in 20-result pages. Extraction goes through the same
+yt-dlp machinery as the real site: a JSON player response, then the MPD or
+M3U8 manifest parsers for the adaptive kinds.
+"""
+
+import itertools
+
+from yt_dlp.extractor.common import InfoExtractor, SearchInfoExtractor
+
+
+class BenchMediaIE(InfoExtractor):
+    IE_NAME = "benchmedia"
+    _VALID_URL = r"(?P<base>https?://(?:127\.0\.0\.1|localhost):\d+)/watch/(?P<kind>progressive|dash|hls)/(?P<id>[\w-]+)"
+
+    def _real_extract(self, url):
+        base, kind, vid = self._match_valid_url(url).group("base", "kind", "id")
+        meta = self._download_json(f"{base}/info/{kind}/{vid}.json", vid)
+
+        if kind == "dash":
+            formats = self._extract_mpd_formats(f"{base}/dash/{vid}/manifest.mpd", vid)
+        elif kind == "hls":
+            formats = self._extract_m3u8_formats(
+                f"{base}/hls/{vid}/master.m3u8", vid, "mp4", m3u8_id="hls")
+        else:
+            formats = [{
+                "format_id": "progressive",
+                "url": f"{base}/media/{vid}.mp4",
+                "ext": "mp4",
+                "vcodec": "avc1.4d401f",
+                "acodec": "mp4a.40.2",
+                "width": 1280,
+                "height": 720,
+                "filesize": meta["size"],
+            }]
+        for f in formats:
+            f.setdefault("filesize_approx", meta["size"])
+
+        return {
+            "id": vid,
+            "title": meta["title"],
+            "duration": meta["duration"],
+            "webpage_url": url,
+            "formats": formats,
+        }
+
+
+class BenchPlaylistIE(InfoExtractor):
+    IE_NAME = "benchmedia:playlist"
+    _VALID_URL = r"(?P<base>https?://(?:127\.0\.0\.1|localhost):\d+)/playlist/(?P<kind>progressive|dash|hls)/(?P<count>\d+)"
+
+    def _real_extract(self, url):
+        base, kind, count = self._match_valid_url(url).group("base", "kind", "count")
+        data = self._download_json(f"{base}/playlist/{kind}/{count}.json", f"pl-{kind}")
+        entries = [
+            self.url_result(f"{base}/watch/{kind}/{vid}", BenchMediaIE, vid, f"Bench {kind} {vid}")
+            for vid in data["entries"]
+        ]
+        return self.playlist_result(entries, data["id"], data["title"])
+
+
+class BenchChannelIE(InfoExtractor):
+    IE_NAME = "benchmedia:channel"
+    _VALID_URL = r"(?P<base>https?://(?:127\.0\.0\.1|localhost):\d+)/channel/(?P<kind>progressive|dash|hls)/(?P<name>[\w-]+)"
+
+    def _real_extract(self, url):
+        base, kind, name = self._match_valid_url(url).group("base", "kind", "name")
+        first = self._download_json(f"{base}/channel/{kind}/{name}/0.json", name)
+
+        def entries():
+            data = first
+            for page in itertools.count(1):
+                for vid in data["entries"]:
+                    yield self.url_result(f"{base}/watch/{kind}/{vid}", BenchMediaIE, vid, f"Bench {kind} {vid}")
+                if not data["more"]:
+                    return
+                data = self._download_json(f"{base}/channel/{kind}/{name}/{page}.json", name,
+                                           note=f"Downloading page {page + 1}")
+
+        return self.playlist_result(entries(), first["id"], first["title"], playlist_count=first["count"])
+
+
+class BenchFileIE(InfoExtractor):
+    IE_NAME = "benchmedia:file"
+    _VALID_URL = r"(?P<base>https?://(?:127\.0\.0\.1|localhost):\d+)/file/(?P<id>[\w-]+)"
+
+    def _real_extract(self, url):
+        base, vid = self._match_valid_url(url).group("base", "id")
+        meta = self._download_json(f"{base}/static/{vid}.json", vid)
+        formats = [{"format_id": "mp4", "url": f"{base}/static/{vid}.mp4", "ext": "mp4",
+                    "vcodec": "avc1", "acodec": "none", "filesize": meta["size"]}]
+        return dict(meta, id=vid, webpage_url=url, formats=formats)
+
+
+class BenchSearchIE(SearchInfoExtractor):
+    # takes over the ytsearch prefix so the app's search path runs unchanged
+    IE_NAME = "benchmedia:search"
+    _SEARCH_KEY = "ytsearch"
+    BASE = "http://127.0.0.1:8765"
+
+    def _search_results(self, query):
+        for page in itertools.count():
+            data = self._download_json(f"{self.BASE}/search/{page}.json", query,
+                                       note=f"Downloading search page {page + 1}", query={"q": query})
+            for vid in data["entries"]:
+                yield self.url_result(f"{self.BASE}/watch/progressive/{vid}", BenchMediaIE, vid,
+                                      f"{query} {vid}", duration=120)
+            if not data["more"]:
+                return
+
+
+BENCH_EXTRACTORS = (BenchMediaIE, BenchPlaylistIE, BenchChannelIE, BenchFileIE, BenchSearchIE)
@@ -0,0 +1,154 @@
+"""
+Channel sync check.
+
+    python -m bench.sync
+    python -m bench.sync --videos 3000 --uploads 2 --latency 0.1
+
+Mirrors a channel the way the Playlist page's "Sync new" button does.
+The first sync takes a baseline (only remembers the videos). Then a few
+uploads appear at the top of the channel, and the next sync queues and
+downloads just those. A third sync finds nothing new. Every channel page
+costs `latency` seconds, like a real continuation request. The same
+channel is then enumerated in full the way Fetch does, for comparison. A
+playlist that grows at the end is synced too, and so is a channel through
+the headless `--sync` path. There, one upload fails to download through
+two syncs while three newer ones download, so it ends up below the point
+where the walk stops.
+
+Checks:
+  - the sync after the uploads finds exactly the uploads, from the first page
+  - they download, and the following sync finds nothing
+  - the append-order playlist and the headless sync find their new videos
+  - the upload that failed is offered again and downloads once it can
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import youtube_downloader as ytd  # noqa: E402
+from bench import scenarios as sc  # noqa: E402
+from bench.media_server import MediaServer  # noqa: E402
+
+
+class _FirstSync(sc._MessageBox):
+    """Answers No to "Queue all of them?", so a first sync takes a baseline."""
+
+    def askyesno(self, *args, **kwargs):
+        return False
+
+
+class SyncApp(sc.BenchApp):
+    """BenchApp with stand-in queue and playlist rows, whose queue runs inline."""
+
+    def __init__(self, cfg):
+        super().__init__(cfg)
+        self.pl_sync_btn = sc._Widget()
+        self.syncs = []
+
+    def _add_q_widget(self, item):
+        self.queue_widgets.append((sc._Widget(), sc._Widget(), item))
+
+    def _run_queue(self):
+        self._t_queue()
+
+    def _show_pl(self, title, entries):
+        pass
+
+    def _queue_sync(self, url, title, new, read, secs):
+        self.syncs.append({"new": len(new), "read": read, "secs": secs})
+        super()._queue_sync(url, title, new, read, secs)
+
+
+class BenchHeadless(sc.BenchOpts, ytd.HeadlessApp):
+    """Headless app whose downloads of the video IDs in `fail` fail."""
+
+    fail = ()
+
+    def log(self, msg):
+        pass
+
+    def _dl_item(self, item, timer):
+        if item.url.rsplit("/", 1)[-1] in self.fail:
+            raise RuntimeError("not available yet")
+        return super()._dl_item(item, timer)
+
+
+def sync(app, server, url):
+    """One sync through the GUI path; its summary plus the pages it fetched."""
+    pages = server.channel_requests
+    app._t_sync(url)
+    return dict(app.syncs[-1], pages=server.channel_requests - pages)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Channel sync check")
+    ap.add_argument("--videos", type=int, default=3000, help="videos on the channel")
+    ap.add_argument("--uploads", type=int, default=2, help="videos uploaded between syncs")
+    ap.add_argument("--latency", type=float, default=0.05, help="seconds per channel page")
+    ap.add_argument("--size", type=float, default=1, help="MB per video")
+    a = ap.parse_args(argv)
+
+    server = MediaServer(size=int(a.size * 1024 * 1024), latency=a.latency).start()
+    server.channels.update(daily=a.videos, pldaily=300, headless=200)
+    work = tempfile.mkdtemp(prefix="ytdl-sync-")
+    os.chdir(work)  # ytdl_sync.json lands in the scratch dir
+    ytd.messagebox = _FirstSync()
+    cfg = dict(ytd.DEFAULT_CONFIG, download_path=os.path.join(work, "out"), use_aria2c=False, proxy="",
+               preflight=False)
+    app = SyncApp(cfg)
+    url = f"{server.base_url}/channel/progressive/daily"
+    try:
+        base = sync(app, server, url)
+        server.channels["daily"] += a.uploads
+        fresh = sync(app, server, url)
+        files = sorted(os.listdir(cfg["download_path"])) if os.path.isdir(cfg["download_path"]) else []
+        again = sync(app, server, url)
+
+        pages = server.channel_requests
+        t0 = time.monotonic()
+        app._t_pl_fetch(url)
+        full = {"secs": time.monotonic() - t0, "read": len(app.pl_entries),
+                "pages": server.channel_requests - pages}
+
+        pl_url = f"{server.base_url}/channel/progressive/pldaily"
+        sync(app, server, pl_url)
+        server.channels["pldaily"] += a.uploads
+        pl = sync(app, server, pl_url)
+
+        hl = BenchHeadless(dict(cfg, download_path=os.path.join(work, "headless")))
+        hl_url = f"{server.base_url}/channel/progressive/headless"
+        hl.sync(hl_url, baseline=True)
+        server.channels["headless"] += 1
+        hl.fail = {"headless-00200"}
+        hl_runs = [hl.sync(hl_url)]
+        server.channels["headless"] += 3
+        hl_runs.append(hl.sync(hl_url))
+        hl.fail = ()
+        hl_runs.append(hl.sync(hl_url))
+    finally:
+        server.stop()
+        shutil.rmtree(work, ignore_errors=True)
+
+    print(f"{'':<22} {'new':>5} {'read':>6} {'pages':>6} {'seconds':>8}")
+    for name, r in (("first sync (baseline)", base), (f"after {a.uploads} uploads", fresh),
+                    ("sync again", again), ("full fetch", dict(full, new=None)),
+                    ("playlist, appended", pl)):
+        print(f"{name:<22} {'' if r['new'] is None else r['new']:>5} {r['read']:>6} {r['pages']:>6} "
+              f"{r['secs']:>8.2f}")
+    print(f"downloaded             {len(files)} files, {len(app.errors)} errors; "
+          f"headless syncs {', '.join(f'{d} done/{f} failed' for d, f in hl_runs)}")
+    print(f"sync vs full fetch     {full['secs'] / max(fresh['secs'], 1e-9):.0f}x faster")
+    ok = (base["read"] == a.videos and fresh["new"] == a.uploads and fresh["pages"] == 1
+          and len(files) == a.uploads and again["new"] == 0 and pl["new"] == a.uploads
+          and hl_runs == [(0, 1), (3, 1), (1, 0)] and not app.errors)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
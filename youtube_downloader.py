@@ -11,7 +11,10 @@ import os
 import sys
 import json
 import shutil
+import errno
 import traceback
+import copy
+import glob
 from datetime import datetime, timedelta
 from tkinter import filedialog, messagebox
 from PIL import Image
@@ -19,13 +22,42 @@ import urllib.request
 import io
 from pathlib import Path
 import subprocess
+import tempfile
+import time
+import statistics
+import argparse
+import asyncio
+import queue
+import cProfile
+import pstats
+import tracemalloc
+import socket
+import sqlite3
+from contextlib import contextmanager, nullcontext
+from collections import deque
+import zlib
+import re
+import csv
+import hashlib
+import functools
+import heapq
+import random
+import urllib.parse
 from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import http.cookiejar
+from yt_dlp.postprocessor import FFmpegExtractAudioPP, PostProcessor, get_postprocessor
+from yt_dlp.postprocessor.common import PostProcessingError
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessorError
 
 FFMPEG_PATH = r"C:\ProgramData\chocolatey\bin\ffmpeg.exe"
 APP_NAME = "YouTube Downloader Pro"
 APP_VERSION = "3.0"
 CONFIG_FILE = "ytdl_config.json"
 HISTORY_FILE = "ytdl_history.json"
+PROFILE_DIR = "ytdl_profiles"
+COOKIE_CACHE_FILE = "ytdl_cookies.json"
+SYNC_FILE = "ytdl_sync.json"
 
 DEFAULT_CONFIG = {
     "download_path": str(Path.home() / "Downloads" / "YouTubeDownloader"),
@@ -48,6 +80,42 @@ DEFAULT_CONFIG = {
     "concurrent_fragments": 8,
     "use_aria2c": False,
     "buffer_size": 1024,
+    "parallel_audio": False,
+    "parallel_audio_min_duration": 600,
+    "metrics_enabled": False,
+    "metrics_port": 9464,
+    "profile_jobs": False,
+    "profile_dir": PROFILE_DIR,
+    "shared_queue_path": "",
+    "search_cache_ttl": 600,
+    "info_cache_ttl": 1800,
+    "prefetch_count": 5,
+    "prefetch_workers": 2,
+    "cancel_partial": "keep",
+    "queue_sjf": False,
+    "job_retries": 3,
+    "retry_backoff": 5,
+    "breaker_threshold": 3,
+    "breaker_cooldown": 30,
+    "proxy_pool": [],
+    "proxy_policy": "least-loaded",
+    "proxy_check_url": "https://www.youtube.com/generate_204",
+    "proxy_check_interval": 60,
+    "cookie_cache_disk": False,
+    "cookie_cache_ttl": 600,
+    "staging_dir": "",
+    "staging_cap_gb": 20,
+    "preflight": True,
+    "preflight_workers": 4,
+    "min_free_gb": 1,
+    "integrity_hash": "off",
+    "store_dir": "",
+    "store_link": "auto",
+    "fetch_workers": 4,
+    "download_workers": 4,
+    "sync_stop_after": 3,
+    "clip_keyframes": False,
+    "export_workers": 8,
 }
 
 VIDEO_QUALITIES = [
@@ -70,6 +138,7 @@ QUALITY_MAP = {
 
 AUDIO_FORMATS = ["mp3", "m4a", "wav", "flac", "aac", "ogg", "opus"]
 VIDEO_FORMATS = ["mp4", "mkv", "webm", "avi", "mov", "flv"]
+Q_PRIO = {1: "▲ High", 0: "Normal", -1: "▼ Low"}
 BROWSER_LIST = ["none", "chrome", "firefox", "edge", "safari", "opera", "brave", "chromium"]
 
 
@@ -120,6 +189,8 @@ class YTLogger:
         self.cb(f"[INFO] {msg}")
 
     def warning(self, msg):
+        if "Retrying" in msg:
+            METRICS.inc("ytdl_retries")
         self.cb(f"[WARN] {msg}")
 
     def error(self, msg):
@@ -136,9 +207,11 @@ def load_thumbnail(url, size=(168, 94), callback=None):
         return
     cache_key = f"{url}_{size}"
     if cache_key in _thumb_cache:
+        METRICS.inc("ytdl_thumbnail_cache_hits")
         if callback:
             callback(_thumb_cache[cache_key])
         return
+    METRICS.inc("ytdl_thumbnail_cache_misses")
 
     def _load():
         try:
@@ -156,13 +229,3335 @@ def load_thumbnail(url, size=(168, 94), callback=None):
     _thumb_executor.submit(_load)
 
 
+# ══════════════════════════════════════
+#  CHUNK-PARALLEL AUDIO EXTRACTION
+# ══════════════════════════════════════
+
+# encoder: (samples per packet, encoder priming samples, samples a gapless
+#           decoder skips when the container declares no delay, raw muxer, extra encoder args)
+PARALLEL_AUDIO_CODECS = {
+    "libmp3lame": (1152, 1105, 529, "mp3",
+                   ["-reservoir", "0", "-write_xing", "0", "-id3v2_version", "0"]),
+    "aac": (1024, 1024, 0, "adts", []),
+    "libopus": (960, 312, 0, "ogg", []),
+}
+MP3_BITRATES = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320]
+MP3_RATES = [44100, 48000, 32000]
+
+
+def _mp3_packets(data):
+    """Split a raw MPEG-1 Layer III stream into frames."""
+    i = 0
+    while i + 4 <= len(data):
+        h = int.from_bytes(data[i:i + 4], "big")
+        if h >> 21 != 0x7FF:
+            raise ValueError(f"lost MP3 sync at byte {i}")
+        n = 144 * MP3_BITRATES[(h >> 12) & 15] * 1000 // MP3_RATES[(h >> 10) & 3] + ((h >> 9) & 1)
+        yield data[i:i + n]
+        i += n
+
+
+def _adts_packets(data):
+    """Split an ADTS stream into frames."""
+    i = 0
+    while i + 7 <= len(data):
+        if data[i] != 0xFF or data[i + 1] >> 4 != 0xF:
+            raise ValueError(f"lost ADTS sync at byte {i}")
+        n = ((data[i + 3] & 3) << 11) | (data[i + 4] << 3) | (data[i + 5] >> 5)
+        yield data[i:i + n]
+        i += n
+
+
+def _ogg_packets(data):
+    """Reassemble the packets of a single-stream Ogg file."""
+    i, pkt = 0, b""
+    while i + 27 <= len(data):
+        if data[i:i + 4] != b"OggS":
+            raise ValueError(f"lost Ogg sync at byte {i}")
+        nseg = data[i + 26]
+        lacing = data[i + 27:i + 27 + nseg]
+        i += 27 + nseg
+        for lv in lacing:
+            pkt += data[i:i + lv]
+            i += lv
+            if lv < 255:
+                yield pkt
+                pkt = b""
+
+
+# Ogg's CRC-32 is the MSB-first twin of zlib's; run zlib on bit-reversed bytes
+_BITREV = bytes(int(f"{i:08b}"[::-1], 2) for i in range(256))
+
+
+def _ogg_crc(page):
+    r = zlib.crc32(page.translate(_BITREV), 0xFFFFFFFF) ^ 0xFFFFFFFF
+    return int(f"{r:032b}"[::-1], 2)
+
+
+def _ogg_page(payload, granule, seq, flags=0, serial=0x59544450):
+    """Build one Ogg page holding a single packet."""
+    lacing = bytes([255] * (len(payload) // 255) + [len(payload) % 255])
+    page = bytearray(b"OggS\x00" + bytes([flags]) + granule.to_bytes(8, "little", signed=True)
+                     + serial.to_bytes(4, "little") + seq.to_bytes(4, "little") + b"\0\0\0\0"
+                     + bytes([len(lacing)]) + lacing + payload)
+    page[22:26] = _ogg_crc(bytes(page)).to_bytes(4, "little")
+    return bytes(page)
+
+
+class ParallelExtractAudioPP(FFmpegExtractAudioPP):
+    """FFmpegExtractAudio that encodes long inputs as frame-aligned chunks in
+    parallel ffmpeg processes and splices the packets back together.
+
+    Every chunk is fed a lead-in and a tail of neighbouring audio so the encoder
+    is primed at the joins; the priming packets are then dropped, so the joined
+    stream has no encoder delay and no gaps."""
+
+    MIN_CHUNK = 60  # seconds; shorter chunks spend more time priming than encoding
+
+    def __init__(self, downloader=None, min_duration=600, workers=None, **kwargs):
+        super().__init__(downloader, **kwargs)
+        self._min_duration = min_duration
+        self._workers = max(1, workers or os.cpu_count() or 1)
+        self._duration = None
+
+    def run(self, information):
+        self._duration = information.get("duration")
+        return super().run(information)
+
+    def run_ffmpeg(self, path, out_path, codec, more_opts):
+        spec = PARALLEL_AUDIO_CODECS.get(codec)
+        if (not spec or self._workers < 2 or not self._duration
+                or self._duration < self._min_duration):
+            return super().run_ffmpeg(path, out_path, codec, more_opts)
+        try:
+            stream = next(s for s in self.get_metadata_object(path)["streams"]
+                          if s.get("codec_type") == "audio")
+            rate, chans = int(stream["sample_rate"]), int(stream["channels"])
+        except Exception:
+            return super().run_ffmpeg(path, out_path, codec, more_opts)
+        if codec == "libopus":
+            rate = 48000
+        elif codec == "libmp3lame" and rate not in MP3_RATES:
+            return super().run_ffmpeg(path, out_path, codec, more_opts)
+
+        # the decoded input (f32 PCM, ~4 GB for 3 h of stereo) goes to local scratch space,
+        # not to the download folder, which may be a slow share
+        need = int(self._duration * rate * chans * 4 * 1.1)
+        root = next((d for d in (STAGING.path, tempfile.gettempdir()) if d and free_bytes(d) > need), None)
+        if root is None:
+            return super().run_ffmpeg(path, out_path, codec, more_opts)
+        os.makedirs(root, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=".ytdl-chunks-", dir=root)
+        try:
+            self._run_chunked(path, out_path, codec, more_opts, rate, chans, spec, tmp)
+        except (FFmpegPostProcessorError, OSError, ValueError) as err:
+            raise PostProcessingError(f"parallel audio conversion failed: {err}")
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def _run_chunked(self, path, out_path, codec, more_opts, rate, chans, spec, tmp):
+        frame, delay, skip, muxer, extra = spec
+        bpf = 4 * chans
+        raw = os.path.join(tmp, "decoded.f32")
+        self.real_run_ffmpeg([(path, [])], [(raw, [
+            "-vn", "-map", "0:a:0", "-f", "f32le", "-ar", str(rate), "-ac", str(chans)])])
+        # `skip` samples of silence are prepended so the final container's
+        # implied decoder delay lands exactly on the first source sample
+        total = os.path.getsize(raw) // bpf + skip
+
+        # chunk boundaries are whole packets so every join lands on a packet edge
+        frames = -(-total // frame)
+        per = max(-(-frames // self._workers), self.MIN_CHUNK * rate // frame)
+        chunks = [(s * frame, min((s + per) * frame, total)) for s in range(0, frames, per)]
+        lead_frames = -(-delay // frame) + 4
+        lead = lead_frames * frame - delay
+        tail = 2 * frame
+        self.to_screen(f"Encoding {len(chunks)} chunks in parallel ({self._workers} workers)")
+        tok = CancelToken.current()  # pool threads are not bound; track their encoders here
+
+        def encode(idx):
+            s, e = chunks[idx]
+            dst = os.path.join(tmp, f"{idx:04d}.{muxer}")
+            cmd = [self.executable, "-y", "-loglevel", "error",
+                   "-f", "f32le", "-ar", str(rate), "-ac", str(chans), "-i", "-",
+                   "-acodec", codec, *more_opts, *extra, "-f", muxer, dst]
+            if tok:
+                tok.check()
+            proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+            if tok:
+                tok.track(proc)
+            try:
+                with open(raw, "rb") as fh:
+                    start = s - lead
+                    silence = max(0, min(skip - start, e + tail - start))
+                    proc.stdin.write(b"\0" * silence * bpf)
+                    fh.seek((start + silence - skip) * bpf)
+                    left = (min(e + tail, total) - start - silence) * bpf
+                    while left > 0:
+                        buf = fh.read(min(left, 1 << 20))
+                        if not buf:
+                            break
+                        proc.stdin.write(buf)
+                        left -= len(buf)
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            err = proc.stderr.read().decode(errors="replace")
+            if proc.wait() != 0:
+                raise FFmpegPostProcessorError(err.strip().splitlines()[-1] if err.strip() else "encoder failed")
+            return dst
+
+        with ThreadPoolExecutor(max_workers=self._workers) as ex:
+            parts = list(ex.map(encode, range(len(chunks))))
+        os.remove(raw)
+
+        joined = os.path.join(tmp, f"joined.{muxer}")
+        with open(joined, "wb") as out:
+            done = seq = 0
+            for idx, part in enumerate(parts):
+                s, e = chunks[idx]
+                with open(part, "rb") as fh:
+                    data = fh.read()
+                os.remove(part)
+                keep = -(-(e - s) // frame)
+                if muxer == "ogg":
+                    pkts = list(_ogg_packets(data))
+                    if idx == 0:
+                        head = bytearray(pkts[0])
+                        head[10:12] = b"\0\0"  # no pre-skip: priming was dropped
+                        out.write(_ogg_page(bytes(head), 0, 0, flags=2))
+                        out.write(_ogg_page(pkts[1], 0, 1))
+                        seq = 2
+                    for pkt in pkts[2 + lead_frames:2 + lead_frames + keep]:
+                        done = min(done + frame, total)
+                        last = idx == len(parts) - 1 and done == total
+                        out.write(_ogg_page(pkt, done, seq, flags=4 if last else 0))
+                        seq += 1
+                else:
+                    split = _mp3_packets if muxer == "mp3" else _adts_packets
+                    pkts = list(split(data))
+                    out.write(b"".join(pkts[lead_frames:lead_frames + keep]))
+
+        # final remux: tags from the source, container from the target extension
+        self.real_run_ffmpeg([(joined, []), (path, [])], [(out_path, [
+            "-map", "0:a", "-map_metadata", "1", "-c", "copy"])])
+
+
+# ══════════════════════════════════════
+#  METRICS  (OpenMetrics / Prometheus)
+# ══════════════════════════════════════
+
+METRIC_DEFS = {
+    "ytdl_jobs_started": ("counter", "Download jobs started"),
+    "ytdl_jobs_completed": ("counter", "Download jobs completed and written to history"),
+    "ytdl_jobs_failed": ("counter", "Download jobs failed or cancelled"),
+    "ytdl_downloaded_bytes": ("counter", "Bytes received by downloads"),
+    "ytdl_retries": ("counter", "Retries reported by yt-dlp"),
+    "ytdl_thumbnail_cache_hits": ("counter", "Thumbnail cache hits"),
+    "ytdl_thumbnail_cache_misses": ("counter", "Thumbnail cache misses"),
+    "ytdl_thumbnail_cache_hit_ratio": ("gauge", "Thumbnail cache hit ratio"),
+    "ytdl_search_cache_hits": ("counter", "Search pages answered from memory"),
+    "ytdl_search_cache_misses": ("counter", "Search pages that needed a request"),
+    "ytdl_info_cache_hits": ("counter", "Extractions answered from the info cache"),
+    "ytdl_info_prefetched": ("counter", "Info dicts warmed by the background prefetcher"),
+    "ytdl_active_workers": ("gauge", "Download jobs in progress"),
+    "ytdl_queue_depth": ("gauge", "Items waiting in the download queue"),
+    "ytdl_extract_seconds": ("histogram", "Extraction latency per job"),
+    "ytdl_postprocess_seconds": ("histogram", "Merge and post-processing latency per job"),
+    "ytdl_cancel_seconds": ("histogram", "Time from cancel to the job's slot being free"),
+    "ytdl_job_retries": ("counter", "Failed jobs put back for another attempt"),
+    "ytdl_breaker_trips": ("counter", "Times a host's circuit breaker opened"),
+    "ytdl_breaker_open": ("gauge", "Hosts currently paused by their circuit breaker"),
+    "ytdl_proxies_healthy": ("gauge", "Proxies in the pool that are not evicted"),
+    "ytdl_proxy_evictions": ("counter", "Proxies taken out of the pool after failing"),
+    "ytdl_cookie_extractions": ("counter", "Times a browser cookie store was read and decrypted"),
+    "ytdl_cookie_cache_hits": ("counter", "YoutubeDL instances given the cached cookie jar"),
+    "ytdl_staged_jobs": ("counter", "Jobs whose temp files went to the staging directory"),
+    "ytdl_staging_fallbacks": ("counter", "Jobs written straight to the destination because staging was full"),
+    "ytdl_disk_waits": ("counter", "Times a job was held back for lack of disk space"),
+    "ytdl_disk_paused": ("gauge", "Jobs currently waiting for disk space"),
+    "ytdl_hash_streamed": ("counter", "Final files whose digest came from the download or move"),
+    "ytdl_hash_reads": ("counter", "Final files that had to be read back to hash them"),
+    "ytdl_store_hits": ("counter", "Downloads answered by a link into the content store"),
+    "ytdl_store_added": ("counter", "Finished downloads added to the content store"),
+    "ytdl_orch_jobs": ("counter", "Jobs the orchestrator ran to completion"),
+    "ytdl_orch_running": ("gauge", "Orchestrator jobs holding a pool slot"),
+    "ytdl_orch_waiting": ("gauge", "Orchestrator jobs waiting for a free pool slot"),
+    "ytdl_ui_events_pending": ("gauge", "Worker callbacks waiting for the Tk loop"),
+    "ytdl_sync_scanned": ("counter", "Channel and playlist entries read by syncs"),
+    "ytdl_sync_new": ("counter", "New videos found by syncs"),
+    "ytdl_export_rows": ("counter", "Rows written by metadata exports"),
+    "ytdl_export_failed": ("counter", "Metadata export rows that record an error"),
+}
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+class Metrics:
+    """Process-wide counters, gauges and histograms.
+
+    Always collected (it is a few dict updates per hook call); only served
+    when the metrics endpoint is enabled in Settings.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {k: 0 for k, (kind, _) in METRIC_DEFS.items() if kind != "histogram"}
+        self.hists = {k: [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+                      for k, (kind, _) in METRIC_DEFS.items() if kind == "histogram"}
+        self.gauge_fns = {}
+        self._seen = {}
+
+    def inc(self, name, v=1):
+        with self.lock:
+            self.values[name] += v
+
+    def gauge_fn(self, name, fn):
+        self.gauge_fns[name] = fn
+
+    def observe(self, name, v):
+        with self.lock:
+            h = self.hists[name]
+            i = next((i for i, b in enumerate(LATENCY_BUCKETS) if v <= b), len(LATENCY_BUCKETS))
+            h[i] += 1
+            h[-1] += v
+
+    def progress_hook(self, d):
+        # downloaded_bytes is cumulative per file; count only the new part
+        key = d.get("filename")
+        done = d.get("downloaded_bytes") or 0
+        with self.lock:
+            prev = self._seen.get(key, 0)
+            if done > prev:
+                self.values["ytdl_downloaded_bytes"] += done - prev
+            if d.get("status") == "downloading":
+                self._seen[key] = max(prev, done)
+            else:
+                self._seen.pop(key, None)
+
+    def render(self, openmetrics=False):
+        gauges = {}
+        for name, fn in self.gauge_fns.items():
+            try:
+                gauges[name] = fn()
+            except Exception:
+                pass
+        with self.lock:
+            values = dict(self.values, **gauges)
+            hists = {k: list(v) for k, v in self.hists.items()}
+        out = []
+        for name, (kind, text) in METRIC_DEFS.items():
+            sample = f"{name}_total" if kind == "counter" else name
+            out.append(f"# HELP {name if openmetrics else sample} {text}")
+            out.append(f"# TYPE {name if openmetrics else sample} {kind}")
+            if kind == "histogram":
+                h, cum = hists[name], 0
+                for b, n in zip(LATENCY_BUCKETS + ("+Inf",), h):
+                    cum += n
+                    out.append(f'{name}_bucket{{le="{b}"}} {cum}')
+                out.append(f"{name}_count {cum}")
+                out.append(f"{name}_sum {h[-1]:.6f}")
+            else:
+                out.append(f"{sample} {values[name]}")
+        if openmetrics:
+            out.append("# EOF")
+        return "\n".join(out) + "\n"
+
+
+METRICS = Metrics()
+METRICS.gauge_fn("ytdl_thumbnail_cache_hit_ratio", lambda: round(
+    METRICS.values["ytdl_thumbnail_cache_hits"] / max(1, METRICS.values["ytdl_thumbnail_cache_hits"]
+                                                      + METRICS.values["ytdl_thumbnail_cache_misses"]), 4))
+
+
+class MetricsServer:
+    """Serves METRICS on http://<host>:<port>/metrics from a daemon thread."""
+
+    def __init__(self, port, host="127.0.0.1", metrics=METRICS):
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                om = "application/openmetrics-text" in self.headers.get("Accept", "")
+                body = metrics.render(openmetrics=om).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8"
+                                 if om else "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# ══════════════════════════════════════
+#  CANCELLATION
+# ══════════════════════════════════════
+
+CANCEL_GRACE = 2  # seconds a cancelled job gets to unwind before its slot is freed anyway
+
+
+class JobCancelled(yt_dlp.utils.DownloadCancelled):
+    msg = "Cancelled by user"
+
+
+def _terminate(proc, timeout=3):
+    """terminate(), then kill() if the child is still alive after timeout; never blocks."""
+    def reap():
+        try:
+            proc.terminate()
+            proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        except OSError:
+            pass
+    threading.Thread(target=reap, daemon=True).start()
+
+
+class CancelToken:
+    """Cancellation for one job.
+
+    Checked by the job's progress and postprocessor hooks and before every
+    extraction and download (see watch). cancel() also terminates the child processes (ffmpeg, aria2c,
+    ...) started on the thread the token is bound to. With partial="delete"
+    the job's partial and intermediate files are removed once it unwinds;
+    "keep" leaves .part files so the next attempt resumes them.
+    """
+
+    _local = threading.local()
+
+    def __init__(self, partial="keep"):
+        self.partial = partial
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.procs = []
+        self.files = set()
+        self.cancelled_at = None
+
+    @classmethod
+    def current(cls):
+        return getattr(cls._local, "token", None)
+
+    @contextmanager
+    def bound(self):
+        prev, CancelToken._local.token = CancelToken.current(), self
+        try:
+            with _popen_tracking():
+                yield self
+        finally:
+            CancelToken._local.token = prev
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+    def check(self):
+        if self.event.is_set():
+            raise JobCancelled()
+
+    def cancel(self):
+        if self.event.is_set():
+            return
+        self.cancelled_at = time.monotonic()
+        self.event.set()
+        with self.lock:
+            procs, self.procs = self.procs, []
+        for proc in procs:
+            _terminate(proc)
+
+    def track(self, proc):
+        with self.lock:
+            self.procs = [p for p in self.procs if p.poll() is None] + [proc]
+        if self.event.is_set():
+            _terminate(proc)
+
+    def attach(self, opts):
+        opts.setdefault("progress_hooks", []).insert(0, self.progress_hook)
+        opts.setdefault("postprocessor_hooks", []).insert(0, self.pp_hook)
+        return self
+
+    def watch(self, ydl):
+        """Check before every extraction and download ydl starts, and note the files it writes."""
+        extract, dl = ydl.extract_info, ydl.dl
+
+        def extract_info(*args, **kwargs):
+            self.check()
+            return extract(*args, **kwargs)
+
+        def watched_dl(name, info, *args, **kwargs):
+            self.check()
+            self.files.add(name)
+            return dl(name, info, *args, **kwargs)
+        ydl.extract_info, ydl.dl = extract_info, watched_dl
+        return ydl
+
+    def progress_hook(self, d):
+        self.check()
+
+    def pp_hook(self, d):
+        info = d.get("info_dict") or {}
+        self.files.update(f["filepath"] for f in info.get("requested_formats") or [] if f.get("filepath"))
+        if info.get("filepath"):
+            self.files.add(info["filepath"])
+        self.check()
+
+    def cleanup(self):
+        """Remove what the job left behind: partial downloads, fragments, intermediates."""
+        for f in self.files:
+            cands = [f, f + ".part", f + ".ytdl", f + ".aria2", f + ".part.aria2",
+                     yt_dlp.utils.prepend_extension(f, "temp")]
+            for path in cands + glob.glob(glob.escape(f) + "*-Frag*"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+_popen_init = yt_dlp.utils.Popen.__init__
+_popen_lock = threading.Lock()
+_popen_jobs = 0
+
+
+def _tracked_popen_init(self, *args, **kwargs):
+    # every ffmpeg/aria2c/... yt-dlp starts goes through this class
+    _popen_init(self, *args, **kwargs)
+    tok = CancelToken.current()
+    if tok:
+        tok.track(self)
+
+
+@contextmanager
+def _popen_tracking():
+    """Track child processes only while some job is running; yt-dlp is left as is otherwise."""
+    global _popen_jobs
+    with _popen_lock:
+        if not _popen_jobs:
+            yt_dlp.utils.Popen.__init__ = _tracked_popen_init
+        _popen_jobs += 1
+    try:
+        yield
+    finally:
+        with _popen_lock:
+            _popen_jobs -= 1
+            if not _popen_jobs:
+                yt_dlp.utils.Popen.__init__ = _popen_init
+
+
+def run_job(token, fn, *args, grace=CANCEL_GRACE):
+    """fn(*args) on a helper thread bound to token.
+
+    Returns fn's result. Once token is cancelled, raises JobCancelled as soon
+    as fn unwinds, or after `grace` seconds if it is stuck (in a socket read,
+    say); the helper is then left to finish on its own.
+    """
+    done, box = threading.Event(), {}
+
+    def target():
+        try:
+            with token.bound():
+                box["res"] = fn(*args)
+        except BaseException as e:
+            box["err"] = e
+        finally:
+            done.set()
+    threading.Thread(target=target, daemon=True).start()
+    while not done.wait(0.2):
+        if token.cancelled and time.monotonic() - token.cancelled_at >= grace:
+            break
+    if token.cancelled and (not done.is_set() or "err" in box):
+        METRICS.observe("ytdl_cancel_seconds", time.monotonic() - token.cancelled_at)
+        if token.partial == "delete":
+            threading.Thread(target=lambda: (done.wait(30), token.cleanup()), daemon=True).start()
+        raise JobCancelled() from box.get("err")
+    if "err" in box:
+        raise box["err"]
+    return box.get("res")
+
+
+# ══════════════════════════════════════
+#  JOB ORCHESTRATOR  (asyncio loop + Tk event channel)
+# ══════════════════════════════════════
+
+ORCH_POOLS = {"fetch": 4, "download": 4, "io": 2}
+UI_TICK_MS = 15
+UI_DRAIN_BUDGET = 0.02  # seconds of worker callbacks the Tk loop runs per tick
+
+
+class Orchestrator:
+    """Runs every job the GUI starts in a capped pool, and posts worker callbacks to the Tk thread."""
+
+    def __init__(self, limits=None):
+        self.limits = dict(ORCH_POOLS, **(limits or {}))
+        self.events = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.running = dict.fromkeys(self.limits, 0)
+        self.waiting = dict.fromkeys(self.limits, 0)
+        self.queued = {}  # slot -> tasks still waiting for a pool slot (loop thread only)
+        self.pending = {}  # slot -> jobs submitted but not started yet
+        self.gens = {}  # slot -> cancel() calls so far; a job submitted before the last one is dropped
+        self.active = {}  # slot -> jobs running
+        self.sems = {}
+        self.sizes = {}
+        self.loop = None
+
+    def start(self):
+        with self.lock:
+            if self.loop is None:
+                ready = threading.Event()
+                threading.Thread(target=self._serve, args=(ready,), name="orchestrator", daemon=True).start()
+                ready.wait()
+        return self
+
+    def _serve(self, ready):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._resize()
+        ready.set()
+        self.loop.run_forever()
+
+    def _resize(self):
+        for kind, n in self.limits.items():
+            if self.sizes.get(kind) != n:
+                self.sems[kind], self.sizes[kind] = asyncio.Semaphore(n), n
+
+    def configure(self, **limits):
+        """New pool sizes. Jobs that already hold or wait for a slot keep the old pool."""
+        with self.lock:
+            for kind, n in limits.items():
+                self.limits[kind] = max(1, int(n))
+                self.running.setdefault(kind, 0)
+                self.waiting.setdefault(kind, 0)
+        if self.loop:
+            self.loop.call_soon_threadsafe(self._resize)
+
+    def submit(self, kind, fn, *args, slot=None, log=None, dropped=None):
+        """Run fn(*args) as a `kind` job and return a concurrent Future for it.
+
+        slot names the job for cancel() and busy(). log gets a line when the job
+        has to wait for a slot, and one for any exception fn lets through.
+        dropped is posted to the Tk channel when cancel() drops the job before
+        it started."""
+        self.start()
+        with self.lock:
+            gen = self.gens.get(slot, 0)
+            self.pending[slot] = self.pending.get(slot, 0) + 1
+        fut = asyncio.run_coroutine_threadsafe(self._run(kind, fn, args, slot, log, gen), self.loop)
+        if dropped:
+            fut.add_done_callback(lambda f: f.cancelled() and self.post(dropped))
+        return fut
+
+    def _count(self, table, kind, n):
+        with self.lock:
+            table[kind] += n
+
+    def _dropped(self, slot, gen):
+        with self.lock:
+            return self.gens.get(slot, 0) != gen
+
+    async def _run(self, kind, fn, args, slot, log, gen):
+        sem, task = self.sems[kind], asyncio.current_task()
+        if slot:
+            self.queued.setdefault(slot, []).append(task)
+        self._count(self.waiting, kind, 1)
+        try:
+            if self._dropped(slot, gen):
+                raise asyncio.CancelledError
+            if sem.locked() and log:
+                log(f"[INFO] ⏳ {slot or kind}: waiting for a free {kind} slot")
+            await sem.acquire()
+            if self._dropped(slot, gen):
+                sem.release()
+                raise asyncio.CancelledError
+        finally:
+            self._count(self.waiting, kind, -1)
+            self._count(self.pending, slot, -1)
+            if slot:
+                self.queued[slot].remove(task)
+        self._count(self.running, kind, 1)
+        if slot:
+            self.active[slot] = self.active.get(slot, 0) + 1
+        try:
+            return await self._thread(fn, args, slot or kind)
+        except Exception as e:
+            if log:
+                log(f"[ERROR] {slot or kind}: {e}")
+            raise
+        finally:
+            sem.release()
+            self._count(self.running, kind, -1)
+            if slot:
+                self.active[slot] -= 1
+            METRICS.inc("ytdl_orch_jobs")
+
+    def _thread(self, fn, args, name):
+        fut = self.loop.create_future()
+
+        def settle(res, err):
+            if fut.cancelled():
+                return
+            if err is None:
+                fut.set_result(res)
+            else:
+                fut.set_exception(err)
+
+        def target():
+            try:
+                res, err = fn(*args), None
+            except BaseException as e:
+                res, err = None, e
+            self.loop.call_soon_threadsafe(settle, res, err)
+        threading.Thread(target=target, name=f"job-{name}", daemon=True).start()
+        # a cancel that lands now must not pretend the running job stopped
+        return asyncio.shield(fut)
+
+    def cancel(self, slot):
+        """Drop slot's jobs that have not started yet; returns how many. Does not
+        wait for the loop, so the Tk thread can call it."""
+        with self.lock:
+            self.gens[slot] = self.gens.get(slot, 0) + 1
+            n = self.pending.get(slot, 0)
+        if n and self.loop:
+            self.loop.call_soon_threadsafe(self._drop, slot)
+        return n
+
+    def _drop(self, slot):
+        for t in list(self.queued.get(slot, ())):
+            t.cancel()
+
+    def busy(self, slot):
+        return bool(self.pending.get(slot) or self.active.get(slot))
+
+    def post(self, fn, *args):
+        """Queue fn(*args) to run on the Tk thread. Safe from any thread."""
+        self.events.put((fn, args))
+
+    def drain(self, budget=UI_DRAIN_BUDGET):
+        """Run posted callbacks on the calling (Tk) thread for at most budget
+        seconds. Returns True when callbacks are left over."""
+        end = time.monotonic() + budget
+        while time.monotonic() < end:
+            try:
+                fn, args = self.events.get_nowait()
+            except queue.Empty:
+                return False
+            try:
+                fn(*args)
+            except Exception:
+                traceback.print_exc()
+        return not self.events.empty()
+
+
+ORCH = Orchestrator()
+METRICS.gauge_fn("ytdl_orch_running", lambda: sum(ORCH.running.values()))
+METRICS.gauge_fn("ytdl_orch_waiting", lambda: sum(ORCH.waiting.values()))
+METRICS.gauge_fn("ytdl_ui_events_pending", ORCH.events.qsize)
+
+
+# ══════════════════════════════════════
+#  JOB TIMING
+# ══════════════════════════════════════
+
+JOB_PHASES = ("cookies", "extract", "download", "merge", "postprocess")
+
+
+class JobTimer:
+    """Monotonic per-phase timings and byte counts for one download job.
+
+    Fed by yt-dlp's progress and postprocessor hooks. Phase start/end are
+    seconds since the job started; a phase entered more than once (separate
+    video and audio downloads, several postprocessors) accumulates. The job's
+    CancelToken rides along so every download path can reach it.
+    """
+
+    def __init__(self, token=None):
+        self.token = token or CancelToken()
+        self.t0 = time.monotonic()
+        self.phases = {}
+        self._open = {}
+        self._pp_bytes = 0
+        self._done = False
+        self.coalesced = False
+        METRICS.inc("ytdl_jobs_started")
+        METRICS.inc("ytdl_active_workers")
+
+    def start(self, phase):
+        self._open.setdefault(phase, time.monotonic())
+
+    def stop(self, phase, nbytes=0):
+        t = self._open.pop(phase, None)
+        if t is None:
+            return
+        now = time.monotonic()
+        p = self.phases.setdefault(phase, {"start": round(t - self.t0, 3), "end": 0, "seconds": 0.0, "bytes": 0})
+        p["end"] = round(now - self.t0, 3)
+        p["seconds"] = round(p["seconds"] + now - t, 3)
+        p["bytes"] += nbytes or 0
+
+    def attach(self, opts):
+        self.token.attach(opts)
+        opts.setdefault("progress_hooks", []).extend([self.progress_hook, METRICS.progress_hook])
+        opts.setdefault("postprocessor_hooks", []).append(self.pp_hook)
+        return self
+
+    def load_cookies(self, ydl):
+        # yt-dlp opens the browser cookie DB lazily on the first request; pull it
+        # forward so it is timed on its own instead of inside extraction
+        self.start("cookies")
+        try:
+            ydl.cookiejar
+        finally:
+            self.stop("cookies")
+            self.start("extract")
+
+    def progress_hook(self, d):
+        st = d.get("status")
+        if st == "downloading":
+            self.stop("extract")
+            self.start("download")
+        elif st == "finished":
+            self.stop("extract")
+            if "download" in self._open:
+                self.stop("download", d.get("total_bytes") or d.get("downloaded_bytes"))
+
+    def pp_hook(self, d):
+        phase = "merge" if d.get("postprocessor") == "Merger" else "postprocess"
+        if d.get("status") == "started":
+            self.stop("extract")
+            info = d.get("info_dict") or {}
+            files = [f.get("filepath") for f in info.get("requested_formats") or []] \
+                if phase == "merge" else [info.get("filepath")]
+            self._pp_bytes = sum(os.path.getsize(f) for f in files if f and os.path.isfile(f))
+            self.start(phase)
+        elif d.get("status") == "finished":
+            self.stop(phase, self._pp_bytes)
+
+    def _end(self):
+        if not self._done:
+            self._done = True
+            METRICS.inc("ytdl_active_workers", -1)
+
+    def fail(self):
+        if not self._done:
+            METRICS.inc("ytdl_jobs_failed")
+        self._end()
+
+    def record(self):
+        """History fields: phases, total elapsed and throughput in bytes/s."""
+        for phase in list(self._open):
+            self.stop(phase)
+        elapsed = time.monotonic() - self.t0
+        dl = self.phases.get("download", {})
+        if not self._done:
+            if "extract" in self.phases:
+                METRICS.observe("ytdl_extract_seconds", self.phases["extract"]["seconds"])
+            pp = [self.phases[k]["seconds"] for k in ("merge", "postprocess") if k in self.phases]
+            if pp:
+                METRICS.observe("ytdl_postprocess_seconds", sum(pp))
+        self._end()
+        if self.coalesced:
+            return {"coalesced": True}
+        return {
+            "elapsed": round(elapsed, 3),
+            "phases": {k: self.phases[k] for k in JOB_PHASES if k in self.phases},
+            "throughput": round(dl["bytes"] / dl["seconds"]) if dl.get("seconds") else None,
+            "effective_throughput": round(dl.get("bytes", 0) / elapsed) if elapsed else None,
+        }
+
+
+# ══════════════════════════════════════
+#  PROFILING
+# ══════════════════════════════════════
+
+class Profiler:
+    """cProfile + stack sampling + tracemalloc for a job or a time window.
+
+    The starting thread and every thread started while active (job workers,
+    yt-dlp fragment threads, new thumbnail workers) get their own cProfile,
+    merged into <name>.prof (snakeviz, pstats, gprof2dot). Threads that were
+    already running, such as the Tk main loop when a job is profiled, are
+    covered by a sampler that writes collapsed stacks to <name>.folded
+    (speedscope, flamegraph.pl). Memory goes to <name>-memory.txt (top growth)
+    and <name>.tracemalloc (tracemalloc.Snapshot.load).
+    """
+
+    active = None
+    INTERVAL = 0.005
+
+    def __init__(self, out_dir, label):
+        self.base = os.path.join(out_dir, f"{datetime.now():%Y%m%d-%H%M%S}-{label}")
+        self.out_dir = out_dir
+        self.lock = threading.Lock()
+        self.profiles = []
+        self.samples = {}
+        self.stop_evt = threading.Event()
+
+    def start(self):
+        """Returns False when another profile is already running."""
+        with _profiler_lock:
+            if Profiler.active:
+                return False
+            Profiler.active = self
+        self.own_tracemalloc = not tracemalloc.is_tracing()
+        if self.own_tracemalloc:
+            tracemalloc.start(10)
+        self.mem0 = tracemalloc.take_snapshot()
+        # sampler first, so it is not itself wrapped in a cProfile
+        self.sampler = threading.Thread(target=self._sample, daemon=True)
+        self.sampler.start()
+        self.t0 = time.monotonic()
+        self.orig_run = threading.Thread.run
+        orig, profiles, lock = self.orig_run, self.profiles, self.lock
+
+        def run(thread):
+            prof = cProfile.Profile()
+            try:
+                prof.enable()
+            except ValueError:  # 3.12+: one cProfile per interpreter, the sampler covers it
+                return orig(thread)
+            try:
+                return orig(thread)
+            finally:
+                prof.disable()
+                with lock:
+                    profiles.append(prof)
+
+        threading.Thread.run = run
+        self.main_prof = cProfile.Profile()
+        try:
+            self.main_prof.enable()
+        except ValueError:
+            self.main_prof = None
+        return True
+
+    def _sample(self):
+        me = threading.get_ident()
+        while not self.stop_evt.wait(self.INTERVAL):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    co = frame.f_code
+                    stack.append(f"{co.co_name} ({os.path.basename(co.co_filename)}:{co.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)).replace(";", ":"))
+                key = ";".join(reversed(stack))
+                self.samples[key] = self.samples.get(key, 0) + 1
+
+    def stop(self):
+        """Stop and write the result files; returns their common path prefix."""
+        if self.main_prof:
+            self.main_prof.disable()
+        threading.Thread.run = self.orig_run
+        self.stop_evt.set()
+        self.sampler.join()
+        mem1 = tracemalloc.take_snapshot()
+        if self.own_tracemalloc:
+            tracemalloc.stop()
+        elapsed = time.monotonic() - self.t0
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        with self.lock:
+            profs = ([self.main_prof] if self.main_prof else []) + list(self.profiles)
+        if profs:
+            stats = pstats.Stats(profs[0])
+            for pr in profs[1:]:
+                stats.add(pr)
+            stats.dump_stats(self.base + ".prof")
+        with open(self.base + ".folded", "w", encoding="utf-8") as f:
+            for stack, n in sorted(self.samples.items()):
+                f.write(f"{stack} {n}\n")
+        mem1.dump(self.base + ".tracemalloc")
+        with open(self.base + "-memory.txt", "w", encoding="utf-8") as f:
+            traced = sum(st.size for st in mem1.statistics("filename"))
+            f.write(f"window {elapsed:.1f}s, traced now {fmt_size(traced)}\n\n")
+            for st in mem1.compare_to(self.mem0, "lineno")[:50]:
+                f.write(f"{st}\n")
+        with _profiler_lock:
+            Profiler.active = None
+        return self.base
+
+
+_profiler_lock = threading.Lock()
+
+
+# ══════════════════════════════════════
+#  URL KEYS  (offline dedup)
+# ══════════════════════════════════════
+
+YT_HOSTS = ("youtube.com", "youtu.be", "youtube-nocookie.com")
+YT_ID_RE = re.compile(r"^[\w-]{11}$")
+TRACKING_PARAMS = {"si", "feature", "pp", "t", "start", "index", "ab_channel", "fbclid", "gclid",
+                   "igshid", "ref", "ref_src", "s"}
+_url_ies = None
+
+
+def _norm_url(url):
+    """Lower-case host without www./m., no fragment, no tracking params, sorted query."""
+    try:
+        u = urllib.parse.urlsplit(url.strip())
+    except ValueError:  # e.g. an unbalanced "[" in a list line: keep it as it is
+        return url.strip()
+    host = (u.hostname or "").lower()
+    for pre in ("www.", "m."):
+        if host.startswith(pre):
+            host = host[len(pre):]
+    q = sorted((k, v) for k, v in urllib.parse.parse_qsl(u.query, keep_blank_values=True)
+               if k not in TRACKING_PARAMS and not k.startswith("utm_"))
+    return urllib.parse.urlunsplit(((u.scheme or "https").lower(), host, u.path.rstrip("/") or "/",
+                                    urllib.parse.urlencode(q), ""))
+
+
+def _youtube_key(url):
+    if YT_ID_RE.match(url.strip()):  # a bare video ID; IDs are case-sensitive, _norm_url is not
+        return "Youtube:" + url.strip()
+    try:
+        u = urllib.parse.urlsplit(url if "//" in url else "https://" + url)
+    except ValueError:
+        return None
+    host = (u.hostname or "").lower()
+    if not any(host == h or host.endswith("." + h) for h in YT_HOSTS):
+        return None
+    qs = urllib.parse.parse_qs(u.query)
+    parts = [p for p in u.path.split("/") if p]
+    vid = None
+    if host.endswith("youtu.be") and parts:
+        vid = parts[0]
+    elif qs.get("v"):
+        vid = qs["v"][0]
+    elif len(parts) >= 2 and parts[0] in ("shorts", "embed", "live", "v", "e"):
+        vid = parts[1]
+    if vid and YT_ID_RE.match(vid):
+        return "Youtube:" + vid
+    if qs.get("list"):
+        return "YoutubeTab:" + qs["list"][0]
+    return None
+
+
+@functools.lru_cache(maxsize=8192)
+def url_key(url, scan=True):
+    """Offline dedup key for a URL, no network.
+
+    'Youtube:<id>' for every youtu.be / watch / shorts / embed / live / music /
+    mobile form and bare IDs, 'YoutubeTab:<list>' for playlists, '<IE>:<id>' for other
+    sites yt-dlp recognizes (scan=True; ~5 ms the first time per URL) and
+    'url:<normalized url>' for the rest.
+    """
+    global _url_ies
+    key = _youtube_key(url)
+    if key or not scan:
+        return key or "url:" + _norm_url(url)
+    if _url_ies is None:
+        _url_ies = [ie for ie in yt_dlp.extractor.gen_extractor_classes() if ie.ie_key() != "Generic"]
+    for ie in _url_ies:
+        try:
+            if not ie.suitable(url):
+                continue
+        except ValueError:  # some suitable() parse the URL and choke on the same lines urlsplit does
+            break
+        try:
+            vid = ie.get_temp_id(url)
+        except Exception:
+            vid = None
+        return f"{ie.ie_key()}:{vid or _norm_url(url)}"
+    return "url:" + _norm_url(url)
+
+
+def canonical_url(url):
+    """Stable URL for a key: watch?v= for YouTube videos, the URL as given otherwise."""
+    key = url_key(url, scan=False)
+    if key.startswith("Youtube:"):
+        return "https://www.youtube.com/watch?v=" + key[8:]
+    if key.startswith("YoutubeTab:"):
+        return "https://www.youtube.com/playlist?list=" + key[11:]
+    return url.strip()
+
+
+class InFlight:
+    """Coalesces concurrent identical downloads: the first caller runs, callers
+    arriving with the same key meanwhile wait and share its result (or error).
+    A waiter whose leader was cancelled runs the job itself instead."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.jobs = {}
+
+    def run(self, key, fn):
+        while True:
+            with self.lock:
+                job = self.jobs.get(key)
+                leader = job is None
+                if leader:
+                    job = self.jobs[key] = {"done": threading.Event(), "res": None, "err": None}
+            if leader:
+                break
+            job["done"].wait()
+            if isinstance(job["err"], JobCancelled):
+                tok = CancelToken.current()
+                if not (tok and tok.cancelled):
+                    continue  # the leader's cancel, not ours
+            if job["err"]:
+                raise job["err"]
+            return job["res"]
+        try:
+            job["res"] = fn()
+            return job["res"]
+        except BaseException as e:
+            job["err"] = e
+            raise
+        finally:
+            with self.lock:
+                del self.jobs[key]
+            job["done"].set()
+
+
+INFLIGHT = InFlight()
+
+
+# ══════════════════════════════════════
+#  RETRIES  (job-level backoff + per-host circuit breaker)
+# ══════════════════════════════════════
+
+PERMANENT_ERRORS = ("video unavailable", "private video", "has been removed", "is not available",
+                    "unsupported url", "copyright", "members-only", "members only",
+                    "confirm your age", "account associated with this video has been terminated",
+                    "requested format is not available", "no video formats found",
+                    "ffmpeg not found", "no space left")
+THROTTLE_ERRORS = ("too many requests", "rate-limit", "rate limit", "not a bot")
+HTTP_STATUS_RE = re.compile(r"http error (\d{3})")
+
+
+def classify_error(err):
+    """'throttle', 'transient' or 'permanent' for the exception a job failed with.
+
+    Throttling (429, bot checks) should slow the whole host down, transient
+    errors (5xx, 403 from a stale format URL, timeouts, resets) are worth
+    another attempt later, and permanent ones (removed, private, 404, bad
+    URL) never succeed on retry. Unknown errors count as transient.
+    """
+    msg = str(err).lower()
+    m = HTTP_STATUS_RE.search(msg)
+    status = int(m.group(1)) if m else None
+    if status == 429 or any(t in msg for t in THROTTLE_ERRORS):
+        return "throttle"
+    if status in (400, 401, 404, 410) or any(t in msg for t in PERMANENT_ERRORS):
+        return "permanent"
+    return "transient"
+
+
+def retry_delay(err, attempt, retries=3, base=5.0, cap=300.0):
+    """Seconds to wait before retrying a job whose attempt number `attempt`
+    (0 = first) failed with err, or None when it should not be retried.
+    Exponential with equal jitter so workers that failed together do not
+    come back together."""
+    kind = classify_error(err)
+    if kind == "permanent" or attempt >= retries:
+        return None
+    d = min(cap, base * 2 ** (attempt + (kind == "throttle")))
+    return d / 2 + random.uniform(0, d / 2)
+
+
+def _inner_backoff(n):
+    """Sleep between yt-dlp's own HTTP/fragment retries inside one attempt."""
+    return min(8.0, 0.5 * 2 ** n)
+
+
+def url_host(url):
+    """Host a request for url goes to; every YouTube domain counts as one."""
+    host = (urllib.parse.urlsplit(url if "//" in url else "https://" + url).hostname or "").lower()
+    if any(host == h or host.endswith("." + h) for h in YT_HOSTS):
+        return "youtube.com"
+    return host[4:] if host.startswith("www.") else host
+
+
+class RetrySchedule:
+    """Failed items waiting for another attempt, soonest first."""
+
+    def __init__(self, retries=3, base=5.0):
+        self.retries = retries
+        self.base = base
+        self.heap = []
+        self.seq = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, item, attempt, delay=0.0):
+        heapq.heappush(self.heap, (time.monotonic() + delay, self.seq, attempt, item))
+        self.seq += 1
+
+    def reschedule(self, item, attempt, err):
+        """Put item back for attempt + 1 unless err is permanent or attempts are
+        used up; returns the delay, or None when the item has failed for good."""
+        delay = retry_delay(err, attempt, self.retries, self.base)
+        if delay is not None:
+            self.push(item, attempt + 1, delay)
+            METRICS.inc("ytdl_job_retries")
+        return delay
+
+    def pop(self):
+        """(attempt, item) for the first item that is due, or None."""
+        if self.heap and self.heap[0][0] <= time.monotonic():
+            _, _, attempt, item = heapq.heappop(self.heap)
+            return attempt, item
+        return None
+
+    def wait(self):
+        """Seconds until the next item is due (0 when one is, None when empty)."""
+        return max(0.0, self.heap[0][0] - time.monotonic()) if self.heap else None
+
+
+class CircuitBreaker:
+    """Per-host breaker shared by every worker in the process.
+
+    `threshold` throttling errors within `window` seconds open the breaker:
+    new jobs for that host wait `cooldown` seconds, then exactly one probe
+    job is let through (half-open). A probe that is throttled again reopens
+    the breaker for twice as long (up to `max_cooldown`); any other outcome
+    means the host is answering, so it closes and everyone resumes.
+    """
+
+    def __init__(self, threshold=3, window=60, cooldown=30, max_cooldown=600):
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cond = threading.Condition()
+        self.hosts = {}
+
+    def _host(self, host):
+        return self.hosts.setdefault(host, {"hits": deque(), "until": 0.0, "cooldown": self.cooldown,
+                                            "probe": False})
+
+    def state(self, host):
+        """'closed', 'open' or 'half-open'."""
+        with self.cond:
+            h = self.hosts.get(host)
+            if not h or not h["until"]:
+                return "closed"
+            return "open" if time.monotonic() < h["until"] else "half-open"
+
+    def paused_for(self, host):
+        """Seconds a new job for host would have to wait (0 when it may start)."""
+        with self.cond:
+            h = self.hosts.get(host)
+            if not h or not h["until"]:
+                return 0.0
+            return max(0.0, h["until"] - time.monotonic()) or (1.0 if h["probe"] else 0.0)
+
+    def open_hosts(self):
+        with self.cond:
+            return sum(1 for h in self.hosts.values() if h["until"])
+
+    def acquire(self, host, token=None):
+        """Block until a job for host may start; True when it is the probe."""
+        with self.cond:
+            while True:
+                h = self._host(host)
+                now = time.monotonic()
+                if not h["until"]:
+                    return False
+                if now >= h["until"] and not h["probe"]:
+                    h["probe"] = True
+                    return True
+                if token:
+                    token.check()
+                self.cond.wait(min(0.25, max(0.01, h["until"] - now)))
+
+    def record(self, host, outcome, probe=False):
+        """Feed a finished job's outcome ('ok' or a classify_error kind; None
+        for a cancelled job) back into host's breaker."""
+        with self.cond:
+            h = self._host(host)
+            now = time.monotonic()
+            if probe:
+                h["probe"] = False
+            if outcome == "throttle":
+                h["hits"].append(now)
+                while h["hits"] and h["hits"][0] < now - self.window:
+                    h["hits"].popleft()
+                if probe:
+                    h["cooldown"] = min(self.max_cooldown, h["cooldown"] * 2)
+                if probe or (not h["until"] and len(h["hits"]) >= self.threshold):
+                    h["until"] = now + h["cooldown"]
+                    METRICS.inc("ytdl_breaker_trips")
+            elif outcome is not None:
+                h["hits"].clear()
+                if probe:
+                    h["until"], h["cooldown"] = 0.0, self.cooldown
+            self.cond.notify_all()
+
+    @contextmanager
+    def slot(self, host, token=None):
+        """Run one job for host: waits while the breaker is open and records the outcome."""
+        probe = self.acquire(host, token)
+        try:
+            yield probe
+        except yt_dlp.utils.DownloadCancelled:
+            self.record(host, None, probe)
+            raise
+        except Exception as e:
+            self.record(host, classify_error(e), probe)
+            raise
+        self.record(host, "ok", probe)
+
+
+BREAKER = CircuitBreaker()
+METRICS.gauge_fn("ytdl_breaker_open", BREAKER.open_hosts)
+
+
+# ══════════════════════════════════════
+#  PROXY POOL
+# ══════════════════════════════════════
+
+PROXY_POLICIES = ("least-loaded", "round-robin")
+PROXY_ERRORS = ("proxyerror", "unable to connect to proxy", "cannot connect to proxy", "tunnel connection failed",
+                "http error 407", "proxy authentication required")
+NETWORK_ERRORS = ("connection refused", "timed out", "connection reset", "unable to connect",
+                  "network is unreachable", "remote end closed")
+
+
+def proxy_error(err):
+    """True when err is the proxy's own failure (ProxyError, CONNECT refused, 407)."""
+    e = err
+    while e is not None:
+        if isinstance(e, yt_dlp.networking.exceptions.ProxyError):
+            return True
+        e = e.__cause__ or (e.exc_info[1] if isinstance(e, yt_dlp.utils.DownloadError) and e.exc_info else None)
+    return any(t in str(err).lower() for t in PROXY_ERRORS)
+
+
+class ProxyPool:
+    """Proxies from the config, handed out one per job.
+
+    A background thread checks every proxy each `interval` seconds with a
+    request to `check_url` through it and keeps its latency. A proxy that
+    fails `max_failures` checks or jobs in a row with a connection-level
+    error is evicted until a later check passes. Each job reports its
+    bytes and download time, and the pool keeps a moving average of every
+    proxy's throughput. Both policies weight by it, so slow exits get
+    fewer jobs:
+
+    least-loaded  fewest jobs running per unit of relative speed
+    round-robin   smooth weighted round robin (nginx style)
+    """
+
+    def __init__(self, check_url="https://www.youtube.com/generate_204", interval=60, timeout=10,
+                 max_failures=3):
+        self.check_url = check_url
+        self.interval = interval
+        self.timeout = timeout
+        self.max_failures = max_failures
+        self.policy = "least-loaded"
+        self.lock = threading.Lock()
+        self.proxies = {}
+        self.wake = threading.Event()
+        self.checker = None
+        self.due = 0.0  # monotonic time of the next full round of checks
+        self.suspects = set()  # proxies a job failure put in doubt, until the checker has tried them
+
+    def configure(self, proxies, policy="least-loaded", check_url=None, interval=None):
+        """Replace the proxy list; stats of proxies that stay are kept."""
+        with self.lock:
+            self.policy = policy if policy in PROXY_POLICIES else "least-loaded"
+            self.check_url = check_url or self.check_url
+            self.interval = interval or self.interval
+            self.proxies = {p: self.proxies.get(p) or {
+                "active": 0, "jobs": 0, "fails": 0, "evicted": False, "latency": None,
+                "rate": None, "bytes": 0, "current": 0.0} for p in dict.fromkeys(proxies) if p}
+            self.due = 0.0
+            if self.proxies and not (self.checker and self.checker.is_alive()):
+                self.checker = threading.Thread(target=self._check_loop, daemon=True)
+                self.checker.start()
+        self.wake.set()
+        return self
+
+    def __bool__(self):
+        return bool(self.proxies)
+
+    def healthy(self):
+        with self.lock:
+            return sum(1 for st in self.proxies.values() if not st["evicted"])
+
+    def _speed(self, st, median):
+        """Throughput relative to the pool's median; unknown counts as median."""
+        if not st["rate"] or not median:
+            return 1.0
+        return min(10.0, max(0.1, st["rate"] / median))
+
+    def acquire(self, avoid=None):
+        """Reserve a proxy for one job, or None when none is healthy. Suspects and
+        proxies for which avoid(proxy) is true are only used when nothing else is left."""
+        with self.lock:
+            live = {p: st for p, st in self.proxies.items() if not st["evicted"]}
+            live = {p: st for p, st in live.items()
+                    if p not in self.suspects and not (avoid and avoid(p))} or live
+            if not live:
+                return None
+            rates = [st["rate"] for st in live.values() if st["rate"]]
+            median = statistics.median(rates) if rates else None
+            weight = {p: self._speed(st, median) for p, st in live.items()}
+            if self.policy == "round-robin":
+                for p, st in live.items():
+                    st["current"] += weight[p]
+                proxy = max(live, key=lambda p: live[p]["current"])
+                live[proxy]["current"] -= sum(weight.values())
+            else:
+                proxy = min(live, key=lambda p: ((live[p]["active"] + 1) / weight[p],
+                                                 live[p]["latency"] or 0))
+            live[proxy]["active"] += 1
+            live[proxy]["jobs"] += 1
+            return proxy
+
+    def release(self, proxy, error=None, nbytes=0, secs=0.0):
+        """Give back a proxy from acquire() with the job's outcome."""
+        with self.lock:
+            st = self.proxies.get(proxy)
+            if not st:
+                return
+            st["active"] = max(0, st["active"] - 1)
+            if error is None:
+                st["fails"] = 0
+                st["bytes"] += nbytes
+                if nbytes >= 256 * 1024 and secs > 0:  # small transfers say little about the exit
+                    rate = nbytes / secs
+                    st["rate"] = rate if st["rate"] is None else 0.7 * st["rate"] + 0.3 * rate
+            elif proxy_error(error):
+                self._failed(proxy, st)
+            elif any(t in str(error).lower() for t in NETWORK_ERRORS):
+                self.suspects.add(proxy)  # the proxy or the origin: a check through it decides
+                self.wake.set()
+
+    def _failed(self, proxy, st):
+        st["fails"] += 1
+        if st["fails"] >= self.max_failures and not st["evicted"]:
+            st["evicted"] = True
+            METRICS.inc("ytdl_proxy_evictions")
+
+    def check(self, proxy):
+        """One health check through proxy; True when it answered."""
+        t0 = None
+        try:
+            with yt_dlp.YoutubeDL({"proxy": proxy, "quiet": True, "no_warnings": True,
+                                   "socket_timeout": self.timeout}) as ydl:
+                t0 = time.monotonic()
+                ydl.urlopen(self.check_url).read(1)
+            ok = True
+        except yt_dlp.networking.exceptions.HTTPError as e:
+            ok = e.status < 500 and e.status != 407  # the target answered through the proxy
+        except Exception:
+            ok = False
+        with self.lock:
+            self.suspects.discard(proxy)
+            st = self.proxies.get(proxy)
+            if st is None:
+                return ok
+            if ok and t0:
+                lat = time.monotonic() - t0
+                st["latency"] = lat if st["latency"] is None else 0.7 * st["latency"] + 0.3 * lat
+                st["fails"], st["evicted"] = 0, False
+            else:
+                self._failed(proxy, st)
+        return ok
+
+    def _check_loop(self):
+        """Checks every proxy each interval, and the suspects as soon as a job reports one."""
+        _low_priority()
+        while True:
+            self.wake.clear()
+            with self.lock:
+                proxies = list(self.proxies)
+                if time.monotonic() >= self.due:
+                    self.due = time.monotonic() + self.interval
+                else:
+                    proxies = [p for p in proxies if p in self.suspects]
+                due = self.due
+            if not self.proxies:
+                return
+            if proxies:
+                with ThreadPoolExecutor(max_workers=min(8, len(proxies))) as ex:
+                    list(ex.map(self.check, proxies))
+            self.wake.wait(max(0.0, due - time.monotonic()))
+
+    def stats(self):
+        """{proxy: copy of its counters}, for the UI and benchmarks."""
+        with self.lock:
+            return {p: dict(st) for p, st in self.proxies.items()}
+
+
+PROXIES = ProxyPool()
+METRICS.gauge_fn("ytdl_proxies_healthy", PROXIES.healthy)
+
+
+# ══════════════════════════════════════
+#  COOKIE CACHE
+# ══════════════════════════════════════
+
+class _CookieLog(yt_dlp.cookies.YDLLogger):
+    """yt-dlp's cookie logger, noting which database file it read."""
+
+    db = None
+
+    def debug(self, message):
+        m = re.match(r'Extracting cookies from: "(.*)"', message)
+        if m:
+            self.db = m.group(1)
+        super().debug(message)
+
+
+def _cookie(domain, path, secure, expires, name, value):
+    return http.cookiejar.Cookie(0, name, value, None, False, domain, bool(domain), domain.startswith("."),
+                                 path, bool(path), secure, expires, False, None, None, {})
+
+
+def _browser_spec(browser, profile=None, keyring=None, container=None):
+    """A cookiesfrombrowser tuple checked and padded to 4 fields, as yt-dlp reads it."""
+    if browser not in yt_dlp.cookies.SUPPORTED_BROWSERS:
+        raise ValueError(f'unsupported browser: "{browser}"')
+    if keyring not in (None, *yt_dlp.cookies.SUPPORTED_KEYRINGS):
+        raise ValueError(f'unsupported keyring: "{keyring}"')
+    if profile is not None:
+        path = os.path.expandvars(os.path.expanduser(profile))
+        if os.path.sep in path or (os.path.altsep and os.path.altsep in path):
+            profile = path
+    return browser, profile, keyring, container
+
+
+class CookieCache:
+    """Browser cookie jars extracted once and shared by every YoutubeDL.
+
+    Reading a browser's cookies copies its database and, for Chromium
+    browsers, decrypts every value: hundreds of ms per YoutubeDL. A jar is
+    kept per browser spec and extracted again only when the database (or its
+    -wal / -journal) changes; a store whose file is not known is re-read
+    after `ttl` seconds. With `path` set the jars are also kept in that file
+    (owner-only permissions) so a restart does not extract either.
+    """
+
+    def __init__(self, path=None, ttl=600):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.jars = {}
+        self.loaded = False
+
+    @staticmethod
+    def _mtime(db):
+        times = [os.path.getmtime(f) for f in (db, db + "-wal", db + "-journal") if os.path.exists(f)]
+        return max(times) if times else None
+
+    def _valid(self, e):
+        if e["db"]:
+            return self._mtime(e["db"]) == e["mtime"]
+        return time.time() - e["at"] < self.ttl
+
+    def jar(self, spec, ydl=None):
+        """The cookie jar for a cookiesfrombrowser spec; concurrent callers share one extraction."""
+        key = json.dumps(list(spec) + [None] * (4 - len(spec)))
+        with self.lock:
+            if not self.loaded:
+                self._load()
+            e = self.jars.get(key)
+            if e and self._valid(e):
+                METRICS.inc("ytdl_cookie_cache_hits")
+                return e["jar"]
+            log = _CookieLog(ydl)
+            browser, profile, keyring, container = _browser_spec(*spec)
+            jar = yt_dlp.cookies.extract_cookies_from_browser(browser, profile, log, keyring=keyring,
+                                                             container=container)
+            METRICS.inc("ytdl_cookie_extractions")
+            self.jars[key] = {"jar": jar, "db": log.db, "mtime": log.db and self._mtime(log.db),
+                              "at": time.time()}
+            self._save()
+            return jar
+
+    def clear(self):
+        with self.lock:
+            self.jars.clear()
+            self._save()
+
+    def _load(self):
+        self.loaded = True
+        if not self.path:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        for key, e in saved.items():
+            jar = yt_dlp.cookies.YoutubeDLCookieJar()
+            for row in e.pop("cookies"):
+                jar.set_cookie(_cookie(*row))
+            self.jars[key] = dict(e, jar=jar)
+
+    def _save(self):
+        if not self.path:
+            return
+        data = {key: {"db": e["db"], "mtime": e["mtime"], "at": e["at"],
+                      "cookies": [[c.domain, c.path, c.secure, c.expires, c.name, c.value] for c in e["jar"]]}
+                for key, e in self.jars.items()}
+        tmp = self.path + ".tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+
+COOKIES = CookieCache()
+
+
+# ══════════════════════════════════════
+#  STAGING  (fast temp dir + atomic finalize)
+# ══════════════════════════════════════
+
+def atomic_move(src, dst):
+    """Move src to dst so that dst is either complete or absent: a rename on
+    the same volume, otherwise a copy to a hidden name beside dst and a rename."""
+    try:
+        os.replace(src, dst)
+        return dst
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    tmp = os.path.join(os.path.dirname(dst), f".{os.path.basename(dst)}.ytdl-move")
+    try:
+        (INTEGRITY.copy if INTEGRITY else shutil.copy2)(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    os.remove(src)
+    return dst
+
+
+class _AtomicShutil:
+    """shutil as seen by yt-dlp's MoveFiles postprocessor, with move() made atomic."""
+
+    move = staticmethod(atomic_move)
+
+    def __getattr__(self, name):
+        return getattr(shutil, name)
+
+
+yt_dlp.postprocessor.movefilesafterdownload.shutil = _AtomicShutil()
+
+
+class Staging:
+    """Fast local directory (SSD, tmpfs) for the temp files of downloads whose
+    destination may be slow: .part files, fragments, merge inputs and
+    post-processing output. yt-dlp writes them here through its `paths`
+    option and moves only the finished file to the destination.
+
+    A job is staged only if three things stay under `cap` bytes: what is
+    already in the directory, the space reserved by running jobs and the
+    job's estimated size. The volume must also have room. Otherwise the job
+    writes straight to its destination as before.
+    """
+
+    def __init__(self, path="", cap=0):
+        self.path = path
+        self.cap = cap
+        self.lock = threading.Lock()
+        self.reserved = 0
+
+    def __bool__(self):
+        return bool(self.path)
+
+    def used(self):
+        total = 0
+        for root, _, files in os.walk(self.path):
+            for f in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, f))
+                except OSError:
+                    pass
+        return total
+
+    def reserve(self, need):
+        """Reserve need bytes; False when the job should not be staged."""
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            free = shutil.disk_usage(self.path).free
+        except OSError:
+            return False
+        with self.lock:
+            # the headroom DISK waits for on every volume a video is written to
+            if need + self.reserved + DISK.margin > free or \
+                    (self.cap and self.used() + self.reserved + need > self.cap):
+                METRICS.inc("ytdl_staging_fallbacks")
+                return False
+            self.reserved += need
+        METRICS.inc("ytdl_staged_jobs")
+        return True
+
+    def release(self, need):
+        if need is not None:
+            with self.lock:
+                self.reserved -= need
+
+
+STAGING = Staging()
+
+
+class StagedJob:
+    """One job's staging, decided per video once its size is known (a match_filter)."""
+
+    def __init__(self, paths, inner=None):
+        self.paths = paths  # the job's yt-dlp `paths`, changed in place
+        self.inner = inner
+        self.need = None
+
+    def match_filter(self, info, incomplete=False):
+        if self.inner:
+            skip = self.inner(info, incomplete=incomplete)
+            if skip is not None:
+                return skip
+        if not incomplete:
+            self.release()
+            need = int(info_bytes(info) or 0)
+            if need and STAGING.reserve(need):  # unknown size: written straight to the destination
+                self.need = need
+                self.paths["temp"] = STAGING.path
+            else:
+                self.paths.pop("temp", None)
+        return None
+
+    def release(self):
+        STAGING.release(self.need)
+        self.need = None
+
+
+class CachedCookieYDL(yt_dlp.YoutubeDL):
+    """YoutubeDL whose browser cookies come from COOKIES instead of a fresh extraction."""
+
+    @functools.cached_property
+    def cookiejar(self):
+        spec = self.params.get("cookiesfrombrowser")
+        if not spec or self.params.get("cookiefile"):
+            return super().cookiejar
+        try:
+            return COOKIES.jar(spec, self)
+        except Exception as e:
+            self.report_warning(f"Could not read {spec[0]} cookies: {e}")
+            raise yt_dlp.cookies.CookieLoadError("failed to load cookies") from e
+
+
+# ══════════════════════════════════════
+#  INTEGRITY  (digests without a read-back)
+# ══════════════════════════════════════
+
+HASH_ALGOS = ("off", "sha256", "blake2b")
+HASH_BLOCK = 1024 * 1024
+
+
+class _HashingStream:
+    """A downloader's output file that hashes what is written to it."""
+
+    def __init__(self, f, h, owner):
+        self._f, self._h, self._owner = f, h, owner
+
+    def write(self, data):
+        self._h.update(data)
+        return self._f.write(data)
+
+    def close(self):
+        self._f.flush()
+        self._owner._written(os.fstat(self._f.fileno()), self._h.hexdigest())
+        self._f.close()
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+class Integrity:
+    """Digests of finished downloads, taken from the bytes as they are written or moved."""
+
+    def __init__(self, algo="off", max_items=256):
+        self.algo = algo
+        self.max_items = max_items
+        self.lock = threading.Lock()
+        self.hashed = {}  # (dev, ino) -> (size, mtime_ns, algo, hexdigest)
+        self.final = {}   # abspath -> "algo:hexdigest"
+
+    def __bool__(self):
+        return self.algo in hashlib.algorithms_available
+
+    def _put(self, d, key, value):
+        with self.lock:
+            d.pop(key, None)
+            d[key] = value
+            while len(d) > self.max_items:
+                del d[next(iter(d))]
+
+    def _written(self, st, digest):
+        self._put(self.hashed, (st.st_dev, st.st_ino), (st.st_size, st.st_mtime_ns, self.algo, digest))
+
+    def wrap(self, f, name, open_mode):
+        """Hashing stand-in for a downloader's output file; a resumed (append)
+        file has its existing bytes hashed first."""
+        h = hashlib.new(self.algo)
+        if "a" in open_mode:
+            with open(name, "rb") as old:
+                for block in iter(lambda: old.read(HASH_BLOCK), b""):
+                    h.update(block)
+        return _HashingStream(f, h, self)
+
+    def copy(self, src, dst):
+        """shutil.copy2 that hashes the data on its way through."""
+        h = hashlib.new(self.algo)
+        buf = memoryview(bytearray(HASH_BLOCK))
+        with open(src, "rb") as fi, open(dst, "wb") as fo:
+            while True:
+                n = fi.readinto(buf)
+                if not n:
+                    break
+                h.update(buf[:n])
+                fo.write(buf[:n])
+        shutil.copystat(src, dst)
+        self._written(os.stat(dst), h.hexdigest())
+        return dst
+
+    def digest(self, path):
+        """Digest of path, reusing one noted while it was written when it still matches."""
+        st = os.stat(path)
+        with self.lock:
+            hit = self.hashed.pop((st.st_dev, st.st_ino), None)
+        if hit and hit[:3] == (st.st_size, st.st_mtime_ns, self.algo):
+            METRICS.inc("ytdl_hash_streamed")
+            return hit[3]
+        h = hashlib.new(self.algo)
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK), b""):
+                h.update(block)
+        METRICS.inc("ytdl_hash_reads")
+        return h.hexdigest()
+
+    def finalize(self, path):
+        """yt-dlp post_hooks entry: runs once per video on its final file."""
+        if self and os.path.isfile(path):
+            self._put(self.final, os.path.abspath(path), f"{self.algo}:{self.digest(path)}")
+
+    def take(self, path):
+        """The "algo:hexdigest" noted for a final file, or None."""
+        with self.lock:
+            return self.final.pop(os.path.abspath(path), None) if path else None
+
+
+INTEGRITY = Integrity()
+
+_sanitize_open = yt_dlp.downloader.common.FileDownloader.sanitize_open
+
+
+def _hashed_open(self, filename, open_mode):
+    # every downloader opens its output through this method
+    f, name = _sanitize_open(self, filename, open_mode)
+    if INTEGRITY and open_mode in ("wb", "ab") and name != "-":
+        f = INTEGRITY.wrap(f, name, open_mode)
+    return f, name
+
+
+yt_dlp.downloader.common.FileDownloader.sanitize_open = _hashed_open
+
+
+# ══════════════════════════════════════
+#  CONTENT STORE  (dedup across folders)
+# ══════════════════════════════════════
+
+STORE_LINKS = ("auto", "hardlink", "reflink", "symlink")
+FICLONE = 0x40049409  # linux/fs.h
+
+
+def reflink(src, dst):
+    """Copy-on-write clone of src (Btrfs, XFS, bcachefs); raises OSError where unsupported."""
+    if not sys.platform.startswith("linux"):
+        raise OSError(errno.EOPNOTSUPP, "reflinks are only supported on Linux")
+    import fcntl
+    try:
+        with open(src, "rb") as fi, open(dst, "xb") as fo:
+            fcntl.ioctl(fo.fileno(), FICLONE, fi.fileno())
+    except OSError as e:
+        if e.errno != errno.EEXIST and os.path.exists(dst):
+            os.remove(dst)
+        raise
+
+
+class _StorePP(PostProcessor):
+    """"get" runs before the download and links a stored copy into place,
+    which yt-dlp then treats as already downloaded. "put" runs after the
+    final move and adds what was downloaded to the store."""
+
+    def __init__(self, ydl, store, sel, action):
+        super().__init__(ydl)
+        self.store, self.sel, self.action = store, sel, action
+
+    def run(self, info):
+        key = self.store.key(info, self.sel)
+        if self.action == "get":
+            path = info.get("_filename") or self._downloader.prepare_filename(info)
+            final = self._downloader.params.get("final_ext")
+            if final:
+                path = yt_dlp.utils.replace_extension(path, final, info.get("ext"))
+            if not os.path.exists(path) and self.store.get(key, path):
+                self.to_screen(f"Linked {path} from the content store")
+        elif info.get("filepath"):
+            self.store.put(key, info["filepath"])
+        return [], info
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive lock on path, held across processes (the file is created if missing)."""
+    with open(path, "a+b") as fh:
+        if os.name == "nt":
+            import msvcrt
+            while True:
+                try:
+                    fh.seek(0)
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after 10 s
+                    pass
+        else:
+            import fcntl
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+class ContentStore:
+    """Finished files by video ID and format, linked into every folder that asks for them."""
+
+    def __init__(self, path="", mode="auto"):
+        self.path = path
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.index = None
+
+    def __bool__(self):
+        return bool(self.path)
+
+    @staticmethod
+    def key(info, sel):
+        return hashlib.sha1(f"{info.get('extractor_key')}:{info.get('id')}:{sel}".encode()).hexdigest()[:24]
+
+    def attach(self, ydl, opts):
+        """Add the store's lookup and ingest steps to a YoutubeDL built from opts."""
+        audio = next((p.get("preferredcodec") for p in opts.get("postprocessors") or []
+                      if p.get("key") == "FFmpegExtractAudio"), None)
+        if audio and audio != "best":
+            ydl.params.setdefault("final_ext", audio)  # so yt-dlp sees a linked .mp3 as done
+        sel = json.dumps({k: opts.get(k) for k in ("format", "merge_output_format", "postprocessors")},
+                         sort_keys=True, default=str)
+        ydl.add_post_processor(_StorePP(ydl, self, sel, "get"), when="before_dl")
+        ydl.add_post_processor(_StorePP(ydl, self, sel, "put"), when="after_move")
+        return ydl
+
+    def _modes(self):
+        return ("hardlink", "reflink", "symlink") if self.mode == "auto" else (self.mode,)
+
+    @contextmanager
+    def _locked(self):
+        """The index as it is on disk, locked against other threads and processes
+        (a GUI, --worker, --store-gc) until the block ends; _save() to write it."""
+        with self.lock:
+            os.makedirs(self.path, exist_ok=True)
+            with file_lock(os.path.join(self.path, "index.lock")):
+                try:
+                    with open(os.path.join(self.path, "index.json"), encoding="utf-8") as f:
+                        self.index = json.load(f)
+                except (OSError, ValueError):
+                    self.index = {}
+                yield self.index
+
+    def _save(self):
+        tmp = os.path.join(self.path, "index.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.index, f)
+        os.replace(tmp, os.path.join(self.path, "index.json"))
+
+    def get(self, key, dst):
+        """Link the stored file for key at dst; the kind of link made, or None."""
+        with self._locked() as index:
+            entry = index.get(key)
+            if not entry:
+                return None
+            src = os.path.join(self.path, entry["file"])
+            if not os.path.isfile(src):
+                return None
+            os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+            for how in self._modes():
+                try:
+                    if how == "hardlink":
+                        os.link(src, dst)
+                    elif how == "reflink":
+                        reflink(src, dst)
+                    else:
+                        os.symlink(os.path.abspath(src), dst)
+                except OSError:
+                    continue
+                entry["links"][os.path.abspath(dst)] = how
+                self._save()
+                METRICS.inc("ytdl_store_hits")
+                return how
+        return None
+
+    def put(self, key, path):
+        """Add a finished download to the store, or note path as a link to the entry it came from."""
+        path = os.path.abspath(path)
+        with self._locked() as index:
+            entry = index.get(key)
+            if entry and os.path.isfile(os.path.join(self.path, entry["file"])):
+                how = self._refers(path, os.path.join(self.path, entry["file"]))
+                if how:
+                    entry["links"][path] = how
+                    self._save()
+                return
+            name = os.path.join(key[:2], key + os.path.splitext(path)[1])
+            dst = os.path.join(self.path, name)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            for how in self._modes():
+                try:
+                    if how == "hardlink":
+                        os.link(path, dst)
+                    elif how == "reflink":
+                        reflink(path, dst)
+                    else:  # the store keeps the data, the folder gets the link
+                        self._move_in(index, key, name, path, dst)
+                except OSError:
+                    if index.pop(key, None):
+                        self._save()
+                    continue
+                index[key] = {"file": name, "links": {path: how}}
+                self._save()
+                METRICS.inc("ytdl_store_added")
+                return
+
+    def _move_in(self, index, key, name, path, dst):
+        """Replace path with a symlink to dst, moving the file there. The index
+        entry is written and the link made before the move, and the file goes
+        back if the last step fails, so the video is never left unreferenced."""
+        tmp = path + ".ytdl-link"
+        os.symlink(dst, tmp)
+        index[key] = {"file": name, "links": {path: "symlink", tmp: "symlink"}}
+        self._save()
+        try:
+            atomic_move(path, dst)
+        except OSError:
+            os.remove(tmp)
+            raise
+        try:
+            os.replace(tmp, path)
+        except OSError:
+            atomic_move(dst, path)
+            os.remove(tmp)
+            raise
+
+    @staticmethod
+    def _refers(link, f):
+        """How link refers to the stored file f, or None."""
+        try:
+            if os.path.islink(link):
+                return "symlink" if os.path.realpath(link) == os.path.realpath(f) else None
+            if os.path.samefile(link, f):
+                return "hardlink"
+            # a reflink shares blocks but not the inode: same size is as close as it gets
+            return "reflink" if os.path.getsize(link) == os.path.getsize(f) else None
+        except OSError:
+            return None
+
+    @staticmethod
+    def _symlinks_in(dirs):
+        """{resolved target: [symlink paths]} for the symlinks directly in dirs."""
+        found = {}
+        for d in dirs:
+            try:
+                with os.scandir(d) as it:
+                    for de in it:
+                        if de.is_symlink():
+                            found.setdefault(os.path.realpath(de.path), []).append(de.path)
+            except OSError:
+                pass
+        return found
+
+    def gc(self):
+        """Remove entries no path links to any more, and files the index does
+        not know. An unknown file that a symlink in a known folder points to is
+        put back in the index; one with other hardlinks is left alone.
+        Returns (files removed, bytes freed)."""
+        removed = freed = 0
+        if not os.path.isdir(self.path):
+            return removed, freed
+        with self._locked() as index:
+            live = self._symlinks_in({os.path.dirname(l) for e in index.values() for l in e["links"]})
+            for key, entry in list(index.items()):
+                f = os.path.join(self.path, entry["file"])
+                entry["links"] = {l: how for l, how in entry["links"].items() if self._refers(l, f) == how}
+                if entry["links"] and os.path.isfile(f):
+                    continue
+                del index[key]
+                if os.path.isfile(f):
+                    freed += os.path.getsize(f)
+                    os.remove(f)
+                    removed += 1
+            known = {os.path.normpath(e["file"]) for e in index.values()}
+            for root, _, files in os.walk(self.path):
+                for name in files:
+                    f = os.path.join(root, name)
+                    rel = os.path.relpath(f, self.path)
+                    if root == self.path or rel in known:
+                        continue
+                    links = live.get(os.path.realpath(f))
+                    if links:
+                        index[os.path.splitext(name)[0]] = {"file": rel, "links": dict.fromkeys(links, "symlink")}
+                        continue
+                    st = os.stat(f)
+                    if st.st_nlink > 1:
+                        continue  # hardlinked from a folder the index lost track of
+                    freed += st.st_size
+                    os.remove(f)
+                    removed += 1
+            self._save()
+        return removed, freed
+
+
+STORE = ContentStore()
+
+
+# ══════════════════════════════════════
+#  SEARCH CACHE  (pages + lazy cursors)
+# ══════════════════════════════════════
+
+class SearchCache:
+    """Search result pages by (normalized query, page, page size), kept for `ttl` seconds.
+
+    Each query holds one lazy `ytsearchall:` cursor, so page N+1 continues
+    the result generator where page N stopped instead of re-running the
+    search, and any page already pulled is answered from memory."""
+
+    def __init__(self, ttl=600, max_queries=32):
+        self.ttl = ttl
+        self.max_queries = max_queries
+        self.lock = threading.Lock()
+        self.cursors = {}
+
+    @staticmethod
+    def norm(query):
+        return " ".join(query.casefold().split())
+
+    def _drop(self, q):
+        cur = self.cursors.pop(q, None)
+        if cur and cur["ydl"]:
+            cur["ydl"].close()
+
+    def _cursor(self, query):
+        q, now = self.norm(query), time.monotonic()
+        with self.lock:
+            cur = self.cursors.get(q)
+            if cur and now - cur["t"] > self.ttl:
+                self._drop(q)
+                cur = None
+            if cur is None:
+                while len(self.cursors) >= self.max_queries:
+                    self._drop(min(self.cursors, key=lambda k: self.cursors[k]["t"]))
+                cur = self.cursors[q] = {"t": now, "lock": threading.Lock(), "items": [],
+                                         "it": None, "done": False, "ydl": None}
+            return cur
+
+    def page(self, query, page, size, make_ydl, prefix="ytsearch"):
+        """(entries, more, hit) for one page; only the missing results are fetched."""
+        cur = self._cursor(query)
+        end = (page + 1) * size
+        with cur["lock"]:
+            hit = len(cur["items"]) > end or cur["done"]
+            try:
+                if not hit and cur["it"] is None:
+                    cur["ydl"] = make_ydl()
+                    res = cur["ydl"].extract_info(f"{prefix}all:{query}", download=False, process=False)
+                    cur["it"] = iter(res.get("entries") or [])
+                while not cur["done"] and len(cur["items"]) <= end:
+                    e = next(cur["it"], None)
+                    if e is None:
+                        cur["done"] = True
+                    else:
+                        cur["items"].append(e)
+            except BaseException:
+                # a generator that raised cannot resume; start over next time
+                with self.lock:
+                    if self.cursors.get(self.norm(query)) is cur:
+                        self._drop(self.norm(query))
+                raise
+            METRICS.inc("ytdl_search_cache_hits" if hit else "ytdl_search_cache_misses")
+            return cur["items"][page * size:end], len(cur["items"]) > end, hit
+
+
+SEARCH_CACHE = SearchCache()
+
+
+# ══════════════════════════════════════
+#  INFO CACHE  (idle prefetch)
+# ══════════════════════════════════════
+
+def _low_priority():
+    """Best effort: lower this thread's CPU priority (setpriority is per-thread on Linux)."""
+    if sys.platform.startswith("linux"):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+        except OSError:
+            pass
+
+
+class InfoCache:
+    """Unprocessed info dicts by url_key, so a download can skip extraction.
+
+    Entries expire after `ttl` seconds because format URLs are signed and go
+    stale. prefetch() warms URLs on at most `workers` low-priority threads;
+    while a download is running only one of them keeps going. A newer
+    prefetch() or cancel() drops the URLs that have not started yet."""
+
+    def __init__(self, ttl=1800, workers=2, max_items=200):
+        self.ttl = ttl
+        self.workers = workers
+        self.max_items = max_items
+        self.lock = threading.Lock()
+        self.infos = {}
+        self.pending = []
+        self.threads = 0
+
+    def _fresh(self, key):
+        hit = self.infos.get(key)
+        if hit and time.monotonic() - hit[0] > self.ttl:
+            del self.infos[key]
+            hit = None
+        return hit
+
+    def peek(self, url):
+        """The cached info itself (read-only, not counted as a hit), or None."""
+        with self.lock:
+            hit = self._fresh(url_key(url))
+        return hit[1] if hit else None
+
+    def get(self, url):
+        """A private copy of the cached info for url, or None."""
+        with self.lock:
+            hit = self._fresh(url_key(url))
+        if not hit:
+            return None
+        METRICS.inc("ytdl_info_cache_hits")
+        return copy.deepcopy(hit[1])
+
+    def fetch(self, ydl, url):
+        """extract_info(process=False) through the cache; concurrent callers share one request."""
+        key = url_key(url)
+
+        def run():
+            with self.lock:
+                hit = self._fresh(key)
+            if hit:
+                return hit[1]
+            raw = ydl.extract_info(url, download=False, process=False)
+            if raw and raw.get("_type", "video") == "video":
+                with self.lock:
+                    while len(self.infos) >= self.max_items:
+                        del self.infos[min(self.infos, key=lambda k: self.infos[k][0])]
+                    self.infos[key] = (time.monotonic(), raw)
+            return raw
+        return copy.deepcopy(INFLIGHT.run(("info", key), run))
+
+    def wrap(self, ydl):
+        """Route ydl.extract_info, including yt-dlp's own per-entry calls, through the cache."""
+        extract = ydl.extract_info
+
+        def extract_info(url, download=True, ie_key=None, extra_info=None, process=True,
+                         force_generic_extractor=False):
+            raw = self.get(url)
+            if raw is None:
+                return extract(url, download, ie_key, extra_info, process, force_generic_extractor)
+            return ydl.process_ie_result(raw, download, extra_info) if process else raw
+        ydl.extract_info = extract_info
+        return ydl
+
+    def prefetch(self, urls, make_ydl):
+        """Warm urls in order in the background, replacing any earlier prefetch."""
+        with self.lock:
+            self.pending = [(u, make_ydl) for u in urls if not self._fresh(url_key(u))]
+            while self.threads < min(self.workers, len(self.pending)):
+                self.threads += 1
+                threading.Thread(target=self._worker, args=(self.threads - 1,), daemon=True).start()
+
+    def cancel(self):
+        with self.lock:
+            self.pending.clear()
+
+    def _worker(self, n):
+        _low_priority()
+        while True:
+            with self.lock:
+                if not self.pending:
+                    self.threads -= 1
+                    return
+                yield_to_downloads = n > 0 and METRICS.values["ytdl_active_workers"] > 0
+                job = None if yield_to_downloads else self.pending.pop(0)
+            if job is None:
+                time.sleep(0.5)
+                continue
+            url, make_ydl = job
+            if BREAKER.state(url_host(url)) != "closed":
+                continue  # speculative: not worth adding to a throttled host's load
+            try:
+                with make_ydl() as ydl:
+                    self.fetch(ydl, url)
+                METRICS.inc("ytdl_info_prefetched")
+            except Exception as e:
+                BREAKER.record(url_host(url), classify_error(e))
+
+
+INFO_CACHE = InfoCache()
+
+
+def format_bytes(f, duration=0):
+    """A format's size: exact, approximate, or bitrate times duration (0 when unknown)."""
+    return f.get("filesize") or f.get("filesize_approx") or (f.get("tbr") or 0) * 125 * (duration or 0)
+
+
+def est_bytes(info, qual="Best Quality", audio=False):
+    """Rough download size from an unprocessed info dict: the largest audio
+    format, plus the largest video format within the quality's height cap."""
+    dur = info.get("duration") or 0
+
+    def size(f):
+        return format_bytes(f, dur)
+
+    fmts = info.get("formats") or []
+    cap = re.search(r"height<=(\d+)", QUALITY_MAP.get(qual, ""))
+    auds = [size(f) for f in fmts if f.get("vcodec") == "none"]
+    vids = [f for f in fmts if f.get("vcodec") != "none"
+            and (not cap or (f.get("height") or 0) <= int(cap.group(1)))]
+    best_a = max(auds, default=0)
+    if audio:
+        return best_a or max(map(size, vids), default=0) or info.get("filesize_approx")
+    best_v = max(vids, key=size, default=None)
+    if not best_v:
+        return info.get("filesize_approx")
+    total = size(best_v) + (best_a if best_v.get("acodec") == "none" else 0)
+    return total or info.get("filesize_approx")
+
+
+# ══════════════════════════════════════
+#  DISK SPACE  (preflight + low-space pause)
+# ══════════════════════════════════════
+
+def free_bytes(path):
+    """Free bytes on the volume of path, or of its nearest existing parent."""
+    path = os.path.abspath(path)
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return shutil.disk_usage(path).free
+
+
+def disk_full(err):
+    """True for ENOSPC, raised directly or reported in yt-dlp's error text."""
+    return getattr(err, "errno", None) == errno.ENOSPC or "no space left" in str(err).lower()
+
+
+def info_bytes(info):
+    """Expected size of the format(s) chosen in a processed info dict."""
+    dur = info.get("duration") or 0
+    return sum(f.get("filesize") or f.get("filesize_approx") or (f.get("tbr") or 0) * 125 * dur
+               for f in info.get("requested_formats") or [info])
+
+
+def preflight(urls, make_ydl, qual="Best Quality", audio=False, workers=4, limit=200):
+    """Estimated size of downloading urls: {bytes, largest, sized, unknown}.
+
+    Cached info is used where there is some; the rest is extracted on
+    `workers` threads into INFO_CACHE, so the downloads that follow skip
+    extraction. Only the first `limit` URLs are measured. URLs that were not
+    measured or have no size count at the average of the ones that were."""
+
+    def one(url):
+        info = INFO_CACHE.peek(url)
+        if info is None:
+            host = url_host(url)
+            if BREAKER.state(host) == "open":
+                return None
+            try:
+                with make_ydl() as ydl:
+                    info = INFO_CACHE.fetch(ydl, url)
+            except Exception as e:
+                BREAKER.record(host, classify_error(e))
+                return None
+        return est_bytes(info or {}, qual, audio)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        sizes = [b for b in ex.map(one, urls[:limit]) if b]
+    total = sum(sizes)
+    if sizes:
+        total += total / len(sizes) * (len(urls) - len(sizes))
+    return {"bytes": int(total), "largest": max(sizes, default=0),
+            "sized": len(sizes), "unknown": len(urls) - len(sizes)}
+
+
+class DiskGuard:
+    """Pauses jobs on a full disk instead of failing them.
+
+    filter() is a yt-dlp match_filter: right before each video's download it
+    waits until every volume the video is written to has its expected size
+    plus `margin` free. run() covers the disk filling up mid-download: it
+    waits for space and runs the job again, which resumes the .part files.
+    """
+
+    def __init__(self, margin=1024 ** 3, poll=10):
+        self.margin = margin
+        self.poll = poll
+
+    def short(self, dirs, need=0):
+        """(dir, free bytes) for the first of dirs with too little room, or None.
+        dirs may be a function returning them, for a job whose staging is decided per video."""
+        for d in dirs() if callable(dirs) else dirs:
+            try:
+                free = free_bytes(d)
+            except OSError:
+                continue
+            if free < need + self.margin:
+                return d, free
+        return None
+
+    def wait(self, dirs, need=0, token=None, log=None):
+        low = self.short(dirs, need)
+        if not low:
+            return
+        METRICS.inc("ytdl_disk_waits")
+        METRICS.inc("ytdl_disk_paused")
+        if log:
+            log(f"[WARN] 💾 {fmt_size(low[1])} free on {low[0]}; "
+                f"paused until {fmt_size(need + self.margin)} is free")
+        try:
+            while low:
+                if token:
+                    token.event.wait(self.poll)
+                    token.check()
+                else:
+                    time.sleep(self.poll)
+                low = self.short(dirs, need)
+        finally:
+            METRICS.inc("ytdl_disk_paused", -1)
+        if log:
+            log("[INFO] 💾 Disk space available again; resuming")
+
+    def filter(self, dirs, log=None, inner=None):
+        """A match_filter that waits for space; inner (the caller's filter) decides first."""
+        def match_filter(info, incomplete=False):
+            if inner:
+                skip = inner(info, incomplete=incomplete)
+                if skip is not None:
+                    return skip
+            if not incomplete:
+                self.wait(dirs, info_bytes(info), CancelToken.current(), log)
+            return None  # skips nothing itself
+        return match_filter
+
+    def run(self, fn, dirs, log=None):
+        while True:
+            try:
+                return fn()
+            except Exception as e:
+                token = CancelToken.current()
+                if not disk_full(e) or (token and token.cancelled):
+                    raise
+                if log:
+                    log(f"[WARN] 💾 Disk full during download: {e}")
+                self.wait(dirs, 256 * 1024 ** 2, token, log)
+
+
+DISK = DiskGuard()
+
+
+# ══════════════════════════════════════
+#  BATCH FILES  (streamed, resumable)
+# ══════════════════════════════════════
+
+def compact_key(url):
+    """64-bit hash of url_key, without the extractor scan (too slow for 100k+ lines)."""
+    key = url_key(url, scan=False)
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+
+
+class BatchFile:
+    """Streams URLs from a .txt, .csv or .jsonl list without loading it.
+
+    Duplicates (same video ID) are skipped on the fly via a set of 64-bit
+    keys. Progress is a byte offset saved to `<file>.ytdl-cursor` after every
+    job, so a stopped or crashed run picks up where it left off.
+    """
+
+    URL_KEYS = ("url", "webpage_url", "link", "href")
+
+    def __init__(self, path):
+        self.path = path
+        self.cursor_path = path + ".ytdl-cursor"
+        ext = os.path.splitext(path)[1].lower()
+        self.kind = "csv" if ext in (".csv", ".tsv") else "jsonl" if ext in (".jsonl", ".ndjson") else "txt"
+        self.delim = "\t" if ext == ".tsv" else ","
+        self.size = os.path.getsize(path)
+        self.seen = set()
+        self.col = None
+        self.stats = {"offset": 0, "done": 0, "failed": 0, "dupes": 0}
+        self.deferred = {}  # url -> next attempt, for URLs waiting for a retry
+        try:
+            with open(self.cursor_path) as f:
+                cur = json.load(f)
+            if cur.get("size") == self.size:
+                self.stats.update({k: cur[k] for k in self.stats if k in cur})
+                self.deferred = cur.get("deferred", {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def _url(self, line):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            return None
+        if self.kind == "jsonl":
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                return None
+            if isinstance(rec, str):
+                return rec
+            if isinstance(rec, dict):
+                url = next((rec[k] for k in self.URL_KEYS if rec.get(k)), None)
+                if not url and rec.get("id"):
+                    url = f"https://www.youtube.com/watch?v={rec['id']}"
+                return url
+            return None
+        if self.kind == "csv":
+            row = next(csv.reader([line], delimiter=self.delim), [])
+            if self.col is not None and self.col < len(row):
+                return row[self.col].strip() or None
+            return next((c.strip() for c in row if c.strip().startswith("http")), None)
+        return line
+
+    def _lines(self):
+        """(offset after the line, url or None), from the start of the file."""
+        with open(self.path, "rb") as fh:
+            pos = 0
+            for i, raw in enumerate(fh):
+                pos += len(raw)
+                line = raw.decode("utf-8", "replace").lstrip("\ufeff")
+                if i == 0 and self.kind == "csv":
+                    head = [c.strip().lower() for c in next(csv.reader([line], delimiter=self.delim), [])]
+                    self.col = next((head.index(k) for k in self.URL_KEYS if k in head), None)
+                    if self.col is not None:
+                        yield pos, None
+                        continue
+                yield pos, self._url(line)
+
+    def __iter__(self):
+        """URLs still to do, as (offset after the line, url); call commit() after each."""
+        start = self.stats["offset"]
+        for pos, url in self._lines():
+            if not url:
+                continue
+            key = compact_key(url)
+            dupe = key in self.seen
+            self.seen.add(key)
+            if pos <= start:
+                continue  # before the cursor: only rebuilding the seen set
+            if dupe:
+                self.stats["dupes"] += 1
+                continue
+            yield pos, url
+
+    def commit(self, pos, ok, url=None):
+        """Count a finished URL and move the cursor past pos (None: a retried URL,
+        the cursor is already past it)."""
+        if pos is not None:
+            self.stats["offset"] = pos
+        self.deferred.pop(url, None)
+        self.stats["done" if ok else "failed"] += 1
+        self._save()
+
+    def defer(self, pos, url, attempt):
+        """Move past a URL that will be retried later. It is kept in the cursor
+        file until commit(), so a resumed run retries it first."""
+        if pos is not None:
+            self.stats["offset"] = pos
+        self.deferred[url] = attempt
+        self._save()
+
+    def _save(self):
+        tmp = self.cursor_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(dict(self.stats, size=self.size, deferred=self.deferred), f)
+        os.replace(tmp, self.cursor_path)
+
+    def finish(self):
+        try:
+            os.remove(self.cursor_path)
+        except OSError:
+            pass
+
+    def preview(self, n=5):
+        """(approximate URL count, first n URLs) without keeping the list."""
+        count, sample = 0, []
+        for url in self.urls():
+            count += 1
+            if len(sample) < n:
+                sample.append(url)
+        return count, sample
+
+    def urls(self):
+        """Every URL in the file, duplicates included, ignoring the cursor."""
+        return (url for _, url in self._lines() if url)
+
+
+# ══════════════════════════════════════
+#  METADATA EXPORT  (no downloads)
+# ══════════════════════════════════════
+
+EXPORT_FIELDS = ("url", "id", "title", "channel", "duration", "view_count", "like_count", "upload_date",
+                 "est_size", "format_count", "formats", "error")
+
+
+def meta_record(url, info):
+    """The export row for an unprocessed info dict. formats lists each format's
+    id, ext, height, codecs and size (estimated from the bitrate when the site
+    gives none)."""
+    dur = info.get("duration")
+    fmts = [{"id": f.get("format_id"), "ext": f.get("ext"), "height": f.get("height"),
+             "vcodec": f.get("vcodec"), "acodec": f.get("acodec"),
+             "size": int(format_bytes(f, dur)) or None}
+            for f in info.get("formats") or []]
+    est = est_bytes(info)
+    return {"url": url, "id": info.get("id"), "title": info.get("title"),
+            "channel": info.get("channel") or info.get("uploader"), "duration": dur,
+            "view_count": info.get("view_count"), "like_count": info.get("like_count"),
+            "upload_date": info.get("upload_date"), "est_size": int(est) if est else None,
+            "format_count": len(fmts), "formats": fmts, "error": None}
+
+
+class MetadataExport:
+    """Metadata for many URLs, appended to a .jsonl or .csv file as each completes.
+
+    `workers` threads run extract_info(process=False) through INFO_CACHE, each
+    with a YoutubeDL of its own; nothing is downloaded. Every row is flushed
+    when it is written, so an interrupted export resumes by skipping the URLs
+    that already have a row (a line cut short by a crash is dropped). Transient
+    errors are retried with backoff; a URL that still fails gets a row with
+    its error, and throttling pauses the host through BREAKER. Resuming drops
+    the error rows so those URLs are tried again.
+    """
+
+    def __init__(self, path, workers=8, retries=3, backoff=5.0):
+        self.path = path
+        self.kind = "csv" if os.path.splitext(path)[1].lower() == ".csv" else "jsonl"
+        self.workers = max(1, workers)
+        self.retries = retries
+        self.backoff = backoff
+        self.lock = threading.Lock()
+        self.stats = {"done": 0, "failed": 0, "skipped": 0, "dupes": 0}
+        self.exported = self._load()
+
+    def _load(self):
+        """compact_keys of the URLs the file already has rows for. Rows with an
+        error are removed from the file instead, so the run retries them."""
+        try:
+            with open(self.path, "rb+") as fh:
+                end = pos = fh.seek(0, os.SEEK_END)
+                while pos:
+                    start = max(0, pos - 65536)
+                    fh.seek(start)
+                    nl = fh.read(pos - start).rfind(b"\n")
+                    if nl >= 0:
+                        pos = start + nl + 1
+                        break
+                    pos = start
+                if pos < end:
+                    fh.truncate(pos)  # the last row was cut short
+        except FileNotFoundError:
+            return set()
+        keys, failed = set(), 0
+        with open(self.path, encoding="utf-8", newline="") as fh:
+            for row in self._rows(fh):
+                if row.get("error"):
+                    failed += 1
+                elif row.get("url"):
+                    keys.add(compact_key(row["url"]))
+        if failed:
+            tmp = self.path + ".tmp"
+            with open(self.path, encoding="utf-8", newline="") as src, \
+                    open(tmp, "w", encoding="utf-8", newline="") as dst:
+                if self.kind == "csv":
+                    writer = csv.DictWriter(dst, EXPORT_FIELDS)
+                    writer.writeheader()
+                    writer.writerows(row for row in self._rows(src) if not row.get("error"))
+                else:
+                    dst.writelines(line for line in src if not (self._row(line) or {}).get("error"))
+            os.replace(tmp, self.path)
+        return keys
+
+    def _rows(self, fh):
+        if self.kind == "csv":
+            return csv.DictReader(fh)
+        return filter(None, map(self._row, fh))
+
+    @staticmethod
+    def _row(line):
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            return None
+        return row if isinstance(row, dict) else None
+
+    def _write(self, fh, writer, rec):
+        with self.lock:
+            if writer:
+                writer.writerow(dict(rec, formats=" ".join(
+                    f"{f['id']}/{f['ext']}/{f['height'] or ''}/{f['size'] or ''}" for f in rec["formats"])))
+            else:
+                fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            fh.flush()
+            self.stats["failed" if rec["error"] else "done"] += 1
+        METRICS.inc("ytdl_export_rows")
+        if rec["error"]:
+            METRICS.inc("ytdl_export_failed")
+
+    def _one(self, ydl, url, token):
+        """The row for url, or None when the export was cancelled."""
+        host = url_host(url)
+        for attempt in range(self.retries + 1):
+            try:
+                with BREAKER.slot(host, token):
+                    info = INFO_CACHE.fetch(ydl, url)
+                    if info and info.get("_type") in ("url", "url_transparent"):
+                        info = INFO_CACHE.fetch(ydl, info["url"])
+                if not info:
+                    raise Exception("yt-dlp returned None")
+                if info.get("_type", "video") != "video":
+                    return dict(dict.fromkeys(EXPORT_FIELDS), url=url, title=info.get("title"), formats=[],
+                                error=f"{info['_type']}, not a video")
+                return meta_record(url, info)
+            except yt_dlp.utils.DownloadCancelled:
+                return None
+            except Exception as e:
+                delay = retry_delay(e, attempt, self.retries, self.backoff)
+                if delay is None:
+                    return dict(dict.fromkeys(EXPORT_FIELDS), url=url, formats=[], error=str(e)[:300])
+                METRICS.inc("ytdl_job_retries")
+                if token and token.event.wait(delay):
+                    return None
+                if not token:
+                    time.sleep(delay)
+
+    def run(self, urls, make_ydl, token=None, progress=None):
+        """Export every URL of urls that has no row yet; returns the stats.
+        progress(row, stats) is called from a worker thread after every row.
+        Ctrl-C cancels token and lets the rows in flight finish."""
+        urls = iter(urls)
+        seen, errors = set(), []
+
+        def next_url():
+            with self.lock:
+                for url in urls:
+                    key = compact_key(url)
+                    if key in seen:
+                        self.stats["dupes"] += 1
+                        continue
+                    seen.add(key)
+                    if key in self.exported:
+                        self.stats["skipped"] += 1
+                        continue
+                    return url
+            return None
+
+        def worker(fh, writer):
+            try:
+                with token.bound() if token else nullcontext(), make_ydl() as ydl:
+                    while not (token and token.cancelled):
+                        url = next_url()
+                        if url is None:
+                            return
+                        rec = self._one(ydl, url, token)
+                        if rec is None:
+                            return
+                        self._write(fh, writer, rec)
+                        if progress:
+                            progress(rec, dict(self.stats))
+            except Exception as e:  # the file or the URL list, not one URL: stop the export
+                errors.append(e)
+                if token:
+                    token.cancel()
+
+        with open(self.path, "a", encoding="utf-8", newline="") as fh:
+            writer = None
+            if self.kind == "csv":
+                writer = csv.DictWriter(fh, EXPORT_FIELDS)
+                if not fh.tell():
+                    writer.writeheader()
+            threads = [threading.Thread(target=worker, args=(fh, writer), daemon=True)
+                       for _ in range(self.workers)]
+            for t in threads:
+                t.start()
+            try:
+                for t in threads:
+                    t.join()
+            except KeyboardInterrupt:
+                if not token:
+                    raise
+                token.cancel()
+                for t in threads:
+                    t.join(CANCEL_GRACE)
+        if errors:
+            raise errors[0]
+        return self.stats
+
+
+# ══════════════════════════════════════
+#  SHARED QUEUE  (several instances, one SQLite file)
+# ══════════════════════════════════════
+
+class SharedQueue:
+    """Job queue in a SQLite file that several GUI or headless instances share.
+
+    Workers claim one job at a time under a lease, renew it with heartbeats
+    while downloading, and a job whose lease runs out (worker killed, host
+    gone) is handed to the next worker that asks. Lease times are wall clock
+    so the hosts' clocks should agree to well within `lease` seconds. The
+    default rollback journal is kept because WAL does not work on network
+    shares.
+    """
+
+    JOBS = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY, url TEXT NOT NULL, qual TEXT, fmt TEXT, type TEXT,
+        sections TEXT NOT NULL DEFAULT '', keyframes INTEGER NOT NULL DEFAULT 0, source TEXT,
+        state TEXT NOT NULL DEFAULT 'pending', worker TEXT, lease_until REAL,
+        attempts INTEGER NOT NULL DEFAULT 0, error TEXT, added REAL, finished REAL, retry_at REAL,
+        UNIQUE (url, qual, fmt, type, sections));
+    """
+    SCHEMA = JOBS + """
+    CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, lease_until);
+    CREATE TABLE IF NOT EXISTS history (
+        id INTEGER PRIMARY KEY, job_id INTEGER, worker TEXT, record TEXT);
+    CREATE TABLE IF NOT EXISTS workers (
+        id TEXT PRIMARY KEY, last_seen REAL, done INTEGER DEFAULT 0, failed INTEGER DEFAULT 0);
+    """
+
+    def __init__(self, path, worker_id=None, lease=60, max_attempts=3):
+        self.path = path
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease = lease
+        self.max_attempts = max_attempts
+        with self._db() as db:
+            db.executescript(self.SCHEMA)
+        with self._db(write=True) as db:
+            cols = {r["name"] for r in db.execute("PRAGMA table_info(jobs)")}
+            if "retry_at" not in cols:
+                db.execute("ALTER TABLE jobs ADD COLUMN retry_at REAL")  # queue files from before retries
+            if "sections" not in cols:
+                # queue files from before sections: the unique key changes, so copy into a new table
+                old = ("id, url, qual, fmt, type, state, worker, lease_until, attempts, error, added, "
+                       "finished, retry_at")
+                db.execute("ALTER TABLE jobs RENAME TO jobs_old")
+                db.execute(self.JOBS)
+                db.execute(f"INSERT INTO jobs ({old}) SELECT {old} FROM jobs_old")
+                db.execute("DROP TABLE jobs_old")
+                db.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, lease_until)")
+
+    @contextmanager
+    def _db(self, write=False):
+        db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            if write:
+                db.execute("BEGIN IMMEDIATE")
+            yield db
+            if write:
+                db.execute("COMMIT")
+        except BaseException:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            raise
+        finally:
+            db.close()
+
+    def add(self, urls, qual, fmt, typ="Video", sections=None, keyframes=False, source=None):
+        """Queue URLs; ones already queued with the same options are skipped.
+        source is the channel or playlist a sync found them on."""
+        now = time.time()
+        with self._db(write=True) as db:
+            before = db.total_changes
+            db.executemany(
+                "INSERT OR IGNORE INTO jobs (url, qual, fmt, type, sections, keyframes, source, added) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ((canonical_url(u), qual, fmt, typ, sections or "", int(bool(keyframes)), source, now)
+                 for u in urls))
+            return db.total_changes - before
+
+    def claim(self):
+        """Lease the next job (expired leases first); None when nothing is left."""
+        now = time.time()
+        with self._db(write=True) as db:
+            db.execute("UPDATE jobs SET state = 'failed', error = 'lease expired too often' "
+                       "WHERE state = 'leased' AND lease_until < ? AND attempts >= ?",
+                       (now, self.max_attempts))
+            row = db.execute("SELECT * FROM jobs WHERE state = 'leased' AND lease_until < ? "
+                             "LIMIT 1", (now,)).fetchone() or \
+                db.execute("SELECT * FROM jobs WHERE state = 'pending' AND (retry_at IS NULL OR retry_at <= ?) "
+                           "ORDER BY id LIMIT 1", (now,)).fetchone()
+            if not row:
+                return None
+            db.execute("UPDATE jobs SET state = 'leased', worker = ?, lease_until = ?, "
+                       "attempts = attempts + 1 WHERE id = ?",
+                       (self.worker_id, now + self.lease, row["id"]))
+            self._seen(db)
+        return dict(row)
+
+    def heartbeat(self, job):
+        """Extend the lease; False once another worker has taken the job over."""
+        with self._db(write=True) as db:
+            cur = db.execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? "
+                             "AND state = 'leased'", (time.time() + self.lease, job["id"], self.worker_id))
+            self._seen(db)
+            return cur.rowcount == 1
+
+    @contextmanager
+    def leased(self, job):
+        """Heartbeat `job` from a background thread for the duration of the block."""
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.lease / 3):
+                if not self.heartbeat(job):
+                    break
+
+        t = threading.Thread(target=beat, daemon=True)
+        t.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            t.join()
+
+    def complete(self, job, record):
+        """Mark done and append to the common history (once, even if a reclaimed
+        job finishes twice)."""
+        with self._db(write=True) as db:
+            cur = db.execute("UPDATE jobs SET state = 'done', worker = ?, finished = ?, error = NULL "
+                             "WHERE id = ? AND state != 'done'", (self.worker_id, time.time(), job["id"]))
+            if cur.rowcount:
+                db.execute("INSERT INTO history (job_id, worker, record) VALUES (?, ?, ?)",
+                           (job["id"], self.worker_id, json.dumps(dict(record, worker=self.worker_id),
+                                                                  default=str)))
+                db.execute("UPDATE workers SET done = done + 1 WHERE id = ?", (self.worker_id,))
+            self._seen(db)
+
+    def fail(self, job, error, delay=0.0):
+        """Give the job back for another attempt in `delay` seconds, or fail it
+        for good (delay None, or after max_attempts)."""
+        with self._db(write=True) as db:
+            db.execute("UPDATE jobs SET state = CASE WHEN ? OR attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                       "error = ?, worker = NULL, lease_until = NULL, retry_at = ? WHERE id = ? AND worker = ?",
+                       (delay is None, self.max_attempts, str(error)[:500], time.time() + (delay or 0),
+                        job["id"], self.worker_id))
+            db.execute("UPDATE workers SET failed = failed + 1 WHERE id = ?", (self.worker_id,))
+
+    def release(self, job):
+        """Hand a job back untouched (cancelled here); the attempt is not counted."""
+        with self._db(write=True) as db:
+            db.execute("UPDATE jobs SET state = 'pending', attempts = MAX(attempts - 1, 0), worker = NULL, "
+                       "lease_until = NULL WHERE id = ? AND worker = ?", (job["id"], self.worker_id))
+
+    def next_retry(self):
+        """Seconds until the earliest job waiting out a retry delay, or None."""
+        with self._db() as db:
+            at = db.execute("SELECT MIN(retry_at) FROM jobs WHERE state = 'pending'").fetchone()[0]
+        return None if at is None else max(0.0, at - time.time())
+
+    def _seen(self, db):
+        db.execute("INSERT INTO workers (id, last_seen) VALUES (?, ?) "
+                   "ON CONFLICT (id) DO UPDATE SET last_seen = excluded.last_seen",
+                   (self.worker_id, time.time()))
+
+    def status(self):
+        """({state: count}, [worker rows])"""
+        with self._db() as db:
+            counts = dict(db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+            workers = [dict(r) for r in db.execute("SELECT * FROM workers ORDER BY last_seen DESC")]
+        return counts, workers
+
+    def history(self, since=0):
+        with self._db() as db:
+            return [(r["id"], json.loads(r["record"]))
+                    for r in db.execute("SELECT id, record FROM history WHERE id > ? ORDER BY id", (since,))]
+
+
+# ══════════════════════════════════════
+#  RECORDS  (compact, slotted)
+# ══════════════════════════════════════
+
+class _Record:
+    """Fixed-field record with __slots__ instead of a per-instance dict.
+
+    Records are built from yt-dlp's dicts at the boundary and keep only the
+    fields the app reads. The full info dict, with its hundreds of format
+    entries, can then be freed. Fields that are not given default to None,
+    or to the class's _defaults."""
+
+    __slots__ = ()
+    _defaults = {}
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.pop(name, self._defaults.get(name)))
+        if fields:
+            raise TypeError(f"{type(self).__name__}: unknown fields {', '.join(fields)}")
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{k}={getattr(self, k)!r}' for k in self.__slots__)})"
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__ if getattr(self, k) is not None}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(**{k: v for k, v in d.items() if k in cls.__slots__})
+
+
+class VideoInfo(_Record):
+    """What the Single page shows about the fetched video."""
+
+    __slots__ = ("id", "url", "title", "channel", "duration", "view_count", "like_count",
+                 "upload_date", "width", "height", "resolution", "filesize", "thumbnail", "formats",
+                 "chapters")
+
+    @classmethod
+    def from_info(cls, info):
+        """Keeps the FormatIndex of a processed info dict (see FormatIndex)."""
+        return cls(id=info.get("id"), url=info.get("webpage_url") or info.get("original_url"),
+                   title=info.get("title"), channel=info.get("channel") or info.get("uploader"),
+                   duration=info.get("duration"), view_count=info.get("view_count"),
+                   like_count=info.get("like_count"), upload_date=info.get("upload_date"),
+                   width=info.get("width"), height=info.get("height"), resolution=info.get("resolution"),
+                   filesize=info.get("filesize") or info.get("filesize_approx"),
+                   thumbnail=info.get("thumbnail"),
+                   formats=FormatIndex(info) if info.get("formats") else None,
+                   chapters=tuple((c.get("start_time") or 0, c.get("end_time"), c.get("title") or "")
+                                  for c in info.get("chapters") or ()) or None)
+
+    def clip_length(self, sections):
+        """Seconds the Sections text covers (see parse_sections); None when unknown."""
+        ranges, chapters = parse_sections(sections)
+        if not self.duration or not (ranges or chapters):
+            return None
+        spans = [(s, min(e, self.duration)) for s, e in ranges]
+        spans += [(s, e or self.duration) for s, e, t in self.chapters or ()
+                  if any(p.search(t) for p in chapter_patterns(chapters))]
+        return sum(max(0, e - s) for s, e in spans)
+
+
+class PlaylistEntry(_Record):
+    """One row of a fetched playlist (flat extraction)."""
+
+    __slots__ = ("id", "url", "title", "duration")
+
+    @classmethod
+    def from_entry(cls, e):
+        return cls(id=e.get("id"), url=e.get("url") or e.get("webpage_url") or "",
+                   title=e.get("title"), duration=e.get("duration"))
+
+
+class QueueItem(_Record):
+    """A download queue entry and its scheduling state."""
+
+    __slots__ = ("id", "url", "key", "title", "qual", "fmt", "type",
+                 "prio", "paused", "attempt", "retry_at", "size", "source", "sections", "keyframes")
+    _defaults = {"prio": 0, "paused": False, "attempt": 0, "retry_at": 0.0, "keyframes": False}
+
+
+class HistoryEntry(_Record):
+    """A finished download; JSON in the history file via to_dict/from_dict."""
+
+    __slots__ = ("title", "url", "timestamp", "format", "size", "duration", "status", "hash", "hashes",
+                 "elapsed", "phases", "throughput", "effective_throughput")
+
+
+# ══════════════════════════════════════
+#  FORMAT INDEX  (per-video quality preview)
+# ══════════════════════════════════════
+
+# codec prefixes each container takes as a stream copy; None takes anything
+CONTAINER_CODECS = {
+    "mp4": ("avc1", "avc3", "h264", "hev1", "hvc1", "av01", "vp9", "vp09", "mp4a", "opus", "mp3", "flac", "ac-3", "ec-3"),
+    "mkv": None,
+    "webm": ("vp8", "vp9", "vp09", "av01", "opus", "vorbis"),
+    "avi": ("avc1", "h264", "mp4a", "mp3", "ac-3"),
+    "mov": ("avc1", "avc3", "h264", "hev1", "hvc1", "mp4a", "mp3", "ac-3"),
+    "flv": ("avc1", "h264", "mp4a", "mp3"),
+    # FFmpegExtractAudio targets: source codecs it copies instead of re-encoding
+    "mp3": ("mp3",), "m4a": ("mp4a", "aac"), "aac": ("mp4a", "aac"), "opus": ("opus",),
+    "ogg": ("vorbis",), "flac": ("flac",), "wav": (),
+}
+PCM_RATE = 44100 * 2 * 2  # bytes/s of the 16-bit stereo WAV FFmpegExtractAudio writes
+
+
+def merge_format(cont):
+    """merge_output_format for a video container. FFmpegMerger only copies
+    streams, so a webm merge whose codecs webm can't hold (H.264, AAC) falls
+    back to mkv; yt-dlp takes the first container in the list the pair fits."""
+    return "webm/mkv" if cont == "webm" else cont
+
+
+@functools.lru_cache(maxsize=1)
+def _selector_ydl():
+    return yt_dlp.YoutubeDL({"quiet": True, "no_warnings": True}, auto_init=False)  # selection only
+
+
+@functools.lru_cache(maxsize=None)
+def format_selector(spec):
+    return _selector_ydl().build_format_selector(spec)
+
+
+def select_formats(formats, spec):
+    """The formats yt-dlp's selector picks for spec: one, or a video+audio pair."""
+    picked = _selector_ydl()._select_formats(formats, format_selector(spec))
+    return (picked[0].get("requested_formats") or [picked[0]]) if picked else []
+
+
+class FormatChoice(_Record):
+    """What one quality and container resolve to for one video."""
+
+    __slots__ = ("format_id", "resolution", "vcodec", "acodec", "ext", "size", "exact", "merge", "transcode",
+                 "incompatible")
+
+
+class FormatIndex:
+    """Every quality × container pick for one video, resolved once.
+
+    Built from the processed info dict with yt-dlp's own format selector
+    and the specs in QUALITY_MAP, so each entry holds the formats a download
+    with the same options would take. Looking up a combination afterwards
+    is a dict read, with no extraction or selection.
+    """
+
+    __slots__ = ("duration", "choices")
+
+    def __init__(self, info):
+        self.duration = info.get("duration") or 0
+        self.choices = {}
+        formats = info.get("formats") or []
+        for qual in VIDEO_QUALITIES:
+            picked = select_formats(formats, QUALITY_MAP[qual])
+            for cont in VIDEO_FORMATS:
+                self.choices[(qual, cont)] = self._choice(picked, cont)
+        picked = select_formats(formats, "bestaudio/best")
+        for cont in AUDIO_FORMATS:
+            self.choices[("Audio Only", cont)] = self._choice(picked, cont, audio=True)
+
+    def _size(self, f):
+        return f.get("filesize") or f.get("filesize_approx") or (f.get("tbr") or 0) * 125 * self.duration
+
+    def _choice(self, picked, cont, audio=False):
+        if not picked:
+            return None
+        vid = next((f for f in picked if f.get("vcodec") not in (None, "none")), None)
+        aud = next((f for f in reversed(picked) if f.get("acodec") not in (None, "none")), None)
+        codecs = [c for c in ((vid or {}).get("vcodec"), (aud or {}).get("acodec")) if c and c != "none"]
+        fits = lambda ok: ok is None or all(c.startswith(ok) for c in codecs)
+        merge = incompatible = False
+        if audio:
+            codecs = codecs[-1:]
+            ext = cont
+            transcode = not any(c.startswith(CONTAINER_CODECS[cont]) for c in codecs)
+        else:
+            merge, transcode = len(picked) > 1, False
+            ext = picked[0].get("ext")
+            if merge:  # a stream copy: the first container the codecs fit, else the merge fails
+                ext = next((c for c in merge_format(cont).split("/") if fits(CONTAINER_CODECS.get(c))), cont)
+                incompatible = not fits(CONTAINER_CODECS.get(ext))
+        return FormatChoice(
+            format_id="+".join(str(f.get("format_id")) for f in picked),
+            resolution=None if audio else (vid or picked[0]).get("resolution"),
+            vcodec=None if audio else (vid or {}).get("vcodec"), acodec=(aud or {}).get("acodec"),
+            ext=ext, size=sum(self._size(f) for f in picked) or None,
+            exact=all(f.get("filesize") for f in picked), merge=merge, transcode=transcode,
+            incompatible=incompatible)
+
+    def get(self, qual, cont, abr=192):
+        """The FormatChoice for qual ("Audio Only" for audio) and container; None
+        when nothing matches. Re-encoded audio is sized from abr (kbps)."""
+        c = self.choices.get((qual, cont))
+        if c and qual == "Audio Only" and c.transcode and self.duration:
+            rate = PCM_RATE if cont == "wav" else PCM_RATE * 0.6 if cont == "flac" else abr * 125
+            c = FormatChoice(**dict(c.to_dict(), size=rate * self.duration, exact=False))
+        return c
+
+
+# ══════════════════════════════════════
+#  SECTIONS  (download part of a video)
+# ══════════════════════════════════════
+
+def parse_sections(text):
+    """(ranges, chapters) from a Sections field such as "1:02:00-1:07:00, 2:10:00-, Q&A".
+
+    Time ranges come back in seconds; an open end runs to the end of the
+    video. Any other part is a chapter title to match. Raises ValueError
+    for a range that does not parse or ends before it starts."""
+    ranges, chapters = [], []
+    for part in filter(None, (p.strip() for p in (text or "").split(","))):
+        m = re.fullmatch(r"([\d:.]*)\s*-\s*([\d:.]*)", part)
+        if not m or not any(m.groups()):
+            chapters.append(part)
+            continue
+        start = yt_dlp.utils.parse_duration(m[1]) if m[1] else 0
+        end = yt_dlp.utils.parse_duration(m[2]) if m[2] else float("inf")
+        if start is None or end is None or end <= start:
+            raise ValueError(f"Bad section {part!r}: use start-end, like 1:02:00-1:07:00")
+        ranges.append((start, end))
+    return ranges, chapters
+
+
+def chapter_patterns(chapters):
+    return [re.compile(re.escape(c), re.IGNORECASE) for c in chapters]
+
+
+def clip_opts(opts, sections, keyframes=False):
+    """opts that fetch only the given sections (see parse_sections) through
+    yt-dlp's download_ranges. ffmpeg then reads just the byte ranges or
+    fragments the sections need. Cuts land on the nearest keyframes unless
+    keyframes is set, which re-encodes around the cuts to make them exact.
+    Each section is saved as its own file."""
+    ranges, chapters = parse_sections(sections)
+    if not (ranges or chapters):
+        return opts
+    opts["download_ranges"] = yt_dlp.utils.download_range_func(chapter_patterns(chapters), ranges)
+    opts["force_keyframes_at_cuts"] = bool(keyframes)
+    tmpl = opts.get("outtmpl")
+    if isinstance(tmpl, str) and tmpl.endswith(".%(ext)s"):
+        opts["outtmpl"] = tmpl[:-8] + " [%(section_start)d-%(section_end|end)d].%(ext)s"
+    return opts
+
+
+# ══════════════════════════════════════
+#  SOURCE SYNC  (only what is new on a channel)
+# ══════════════════════════════════════
+
+class SourceSync:
+    """The videos already downloaded from each channel or playlist, so a sync reads only the newest.
+    Videos a sync offered that never downloaded stay pending and are offered again."""
+
+    def __init__(self, path=SYNC_FILE, stop_after=3):
+        self.path = path
+        self.stop_after = stop_after
+        self.lock = threading.Lock()
+        self.sources = None
+
+    @staticmethod
+    def key(url):
+        return url_key(url, scan=False)
+
+    def _load(self):
+        if self.sources is None:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self.sources = {k: dict(e, seen=set(e["seen"])) for k, e in json.load(f).items()}
+            except (OSError, ValueError, KeyError):
+                self.sources = {}
+        return self.sources
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({k: dict(e, seen=sorted(e["seen"])) for k, e in self.sources.items()}, f)
+        os.replace(tmp, self.path)
+
+    def scan(self, ydl, url):
+        """(title, new PlaylistEntries newest first, entries read, first sync)
+        for the source at url. ydl should extract flat."""
+        skey = self.key(url)
+        with self.lock:
+            src = self._load().get(skey)
+            seen, count = (set(src["seen"]), src.get("count")) if src else (set(), None)
+            pending = dict(src.get("pending") or {}) if src else {}
+        info = ydl.extract_info(url, download=False, process=False)
+        total = info.get("playlist_count")
+        grown = total - count if total is not None and count is not None else 0
+        new, keys, run, read = [], set(), 0, 0
+        for e in info.get("entries") or ():
+            if not e:
+                continue
+            read += 1
+            entry = PlaylistEntry.from_entry(e)
+            if not entry.url.startswith("http"):
+                entry.url = f"https://www.youtube.com/watch?v={entry.url or entry.id}"
+            key = self.key(entry.url)
+            if key in seen:
+                run += 1
+                if run >= self.stop_after and len(new) >= grown:
+                    break
+            elif key not in keys:
+                run = 0
+                keys.add(key)
+                new.append(entry)
+        # offered by an earlier sync but not downloaded (failed, skipped or still queued):
+        # those sit below the stop boundary now, so the walk above no longer reaches them
+        new += [PlaylistEntry(url=p["url"], title=p.get("title")) for key, p in pending.items()
+                if key not in keys and key not in seen]
+        METRICS.inc("ytdl_sync_scanned", read)
+        METRICS.inc("ytdl_sync_new", len(new))
+        title = info.get("title") or url
+        with self.lock:
+            entry = self._load().setdefault(skey, {"url": url, "seen": set()})
+            entry.update(title=title, count=total, last_sync=time.time())
+            entry.setdefault("pending", {}).update(
+                (self.key(e.url), {"url": e.url, "title": e.title}) for e in new)
+            self._save()
+        return title, new, read, src is None
+
+    def mark(self, url, video_urls):
+        """Record video_urls as downloaded from the source at url."""
+        with self.lock:
+            entry = self._load().setdefault(self.key(url), {"url": url, "seen": set()})
+            keys = {self.key(u) for u in video_urls}
+            entry["seen"].update(keys)
+            for key in keys:
+                entry.get("pending", {}).pop(key, None)
+            self._save()
+
+
+SYNC = SourceSync()
+
+
 class App(ctk.CTk):
 
     def __init__(self):
         super().__init__()
 
         self.cfg = self._load_json(CONFIG_FILE, DEFAULT_CONFIG)
-        self.history = self._load_json(HISTORY_FILE, [])
+        self.history = [HistoryEntry.from_dict(e) for e in self._load_json(HISTORY_FILE, [])]
 
         ctk.set_appearance_mode(self.cfg.get("theme", "dark"))
         ctk.set_default_color_theme(self.cfg.get("color_theme", "blue"))
@@ -174,12 +3569,45 @@ class App(ctk.CTk):
         self.download_queue = []
         self.queue_widgets = []
         self.dl_counter = 0
-        self.current_info = {}
+        self.current_info = None
         self.last_clip = ""
         self.is_downloading = False
-        self.cancel_flag = False
+        self.tokens = {}
+        self.q_running = None
+        self.q_active = False
+        self.q_ctl = {}
+        self.q_drag = None
+        self.metrics_srv = None
+        self.profile_jobs = False
+        self.profile_dir = None
+        self.sq_stop = False
+        self.batch_file = None
+        self.ba_stop = False
+        self.srch_q = None
+        self.srch_page = 0
+        self.srch_rows = 0
+        self.srch_more = None
+        self.srch_busy = False
+        self.cur_page = None
+        self.pl_urls = []
+        SEARCH_CACHE.ttl = self.cfg.get("search_cache_ttl", 600)
+        BREAKER.threshold = self.cfg.get("breaker_threshold", 3)
+        BREAKER.cooldown = self.cfg.get("breaker_cooldown", 30)
+        self._apply_proxies()
+        self._apply_cookie_cache()
+        self._apply_staging()
+        self._apply_disk_guard()
+        self._apply_integrity()
+        self._apply_store()
+        self._apply_ffmpeg()
+        self._apply_orchestrator()
+        INFO_CACHE.ttl = self.cfg.get("info_cache_ttl", 1800)
+        INFO_CACHE.workers = self.cfg.get("prefetch_workers", 2)
+        METRICS.gauge_fn("ytdl_queue_depth", lambda: len(self.download_queue))
 
         self._build_ui()
+        self._apply_metrics()
+        self._drain_ui()
 
         if self.cfg.get("clipboard_monitor"):
             self._poll_clipboard()
@@ -215,7 +3643,7 @@ class App(ctk.CTk):
         self._save_json(CONFIG_FILE, self.cfg)
 
     def _save_hist(self):
-        self._save_json(HISTORY_FILE, self.history[-500:])
+        self._save_json(HISTORY_FILE, [e.to_dict() for e in self.history[-500:]])
 
     def log(self, msg):
         def _do():
@@ -225,10 +3653,7 @@ class App(ctk.CTk):
                 self.log_box.insert("end", f"[{ts}] {msg}\n")
                 self.log_box.see("end")
                 self.log_box.configure(state="disabled")
-        try:
-            self.after(0, _do)
-        except Exception:
-            print(msg)
+        self._ui(_do)
 
     # ══════════════════════════════════════
     #  UI BUILD
@@ -305,6 +3730,9 @@ class App(ctk.CTk):
         self.status_lbl.grid(row=12, column=0, padx=20, pady=(0, 15), sticky="ew")
 
     def _show(self, name):
+        if name != self.cur_page:
+            INFO_CACHE.cancel()  # prefetches were for the view being left
+            self.cur_page = name
         for k, b in self.nav_btns.items():
             b.configure(
                 fg_color=("gray75", "gray25") if k == name else "transparent",
@@ -330,10 +3758,13 @@ class App(ctk.CTk):
             "no_warnings": False,
             "logger": YTLogger(self.log),
             "socket_timeout": 30,
-            "retries": 10,
+            # short inner retries: a job that keeps failing goes back to the
+            # retry scheduler instead of holding its worker (see RETRIES)
+            "retries": 3,
             "fragment_retries": 10,
-            "extractor_retries": 5,
+            "extractor_retries": 2,
             "file_access_retries": 5,
+            "retry_sleep_functions": {"http": _inner_backoff, "fragment": _inner_backoff},
             "concurrent_fragment_downloads": self.cfg.get("concurrent_fragments", 8),
             "buffersize": self.cfg.get("buffer_size", 1024) * 1024,
             "http_chunk_size": 10485760,
@@ -363,7 +3794,7 @@ class App(ctk.CTk):
         if self.cfg.get("use_cookies") and self.cfg.get("cookies_browser", "none") != "none":
             opts["cookiesfrombrowser"] = (self.cfg["cookies_browser"],)
         
-        # Proxy
+        # Proxy (download jobs get their own from the pool in _extract)
         if self.cfg.get("proxy"):
             opts["proxy"] = self.cfg["proxy"]
         
@@ -374,9 +3805,247 @@ class App(ctk.CTk):
         # Geo
         if self.cfg.get("geo_bypass"):
             opts["geo_bypass"] = True
+
+        # Integrity: digest of every final file for the history
+        if INTEGRITY:
+            opts.setdefault("post_hooks", []).append(INTEGRITY.finalize)
         
         return opts  # ← THIS IS INSIDE THE METHOD
 
+    def _ydl(self, opts):
+        """Build a YoutubeDL; swaps in the chunk-parallel audio extractor when enabled.
+        Browser cookies come from the shared COOKIES cache."""
+        if not self.cfg.get("parallel_audio"):
+            ydl = CachedCookieYDL(opts)
+        else:
+            opts = dict(opts)
+            pps = opts.pop("postprocessors", [])
+            ydl = CachedCookieYDL(opts)
+            for pp in pps:
+                pp = dict(pp)
+                key, when = pp.pop("key"), pp.pop("when", "post_process")
+                if key == "FFmpegExtractAudio":
+                    cls = ParallelExtractAudioPP
+                    pp["min_duration"] = self.cfg.get("parallel_audio_min_duration", 600)
+                else:
+                    cls = get_postprocessor(key)
+                ydl.add_post_processor(cls(ydl, **pp), when=when)
+        if STORE and not opts.get("download_ranges"):  # one ID, several clips: nothing to share
+            STORE.attach(ydl, opts)
+        tok = CancelToken.current()
+        ydl = tok.watch(ydl) if tok else ydl
+        if PROXIES and opts.get("proxy") in PROXIES.proxies:
+            return ydl  # cached infos were extracted from our own IP; their stream URLs are bound to it
+        return INFO_CACHE.wrap(ydl)
+
+    def _extract(self, opts, url, timer):
+        """extract_info(download=True), shared with any identical download already
+        running. With a proxy pool the job runs through a proxy of its own, and
+        throttling is tracked per host and proxy."""
+        key = (url_key(url), json.dumps({k: opts.get(k) for k in (
+            "format", "merge_output_format", "postprocessors", "outtmpl", "download_ranges",
+            "force_keyframes_at_cuts")}, sort_keys=True, default=repr))
+        host = url_host(url)
+
+        def run():
+            # only the job that downloads gets here; the ones sharing its result take no
+            # proxy, staging room or breaker slot
+            timer.coalesced = False
+            proxy = PROXIES.acquire(lambda p: BREAKER.state(f"{host} via {p}") == "open") if PROXIES else None
+            job_opts, job_host = (dict(opts, proxy=proxy), f"{host} via {proxy}") if proxy else (opts, host)
+            job_opts, staged = self._staged(job_opts)
+            job_opts, dirs = self._guarded(job_opts)
+
+            def attempt():
+                with self._ydl(job_opts) as ydl:
+                    timer.load_cookies(ydl)
+                    return ydl.extract_info(url, download=True)
+            wait = BREAKER.paused_for(job_host)
+            if wait:
+                self.log(f"[WARN] ⏸ {job_host} is throttling; waiting {wait:.0f}s before {url}")
+            try:
+                with BREAKER.slot(job_host, timer.token):
+                    info = DISK.run(attempt, dirs, self.log)
+            except Exception as e:
+                PROXIES.release(proxy, e)
+                raise
+            finally:
+                if staged:
+                    staged.release()
+            if proxy:
+                # extraction through download end: the first buffer of the transfer
+                # arrives before the download phase opens
+                ph = timer.phases
+                dl = ph.get("download")
+                secs = dl["end"] - ph.get("extract", dl)["start"] if dl else 0
+                PROXIES.release(proxy, None, dl["bytes"] if dl else 0, secs)
+            return info
+        timer.coalesced = True
+        return run_job(timer.token, INFLIGHT.run, key, run)
+
+    def _staged(self, opts):
+        """opts whose videos stage their temp files when there is room for their
+        size, and the StagedJob to release() afterwards (None when not staged)."""
+        tmpl = opts.get("outtmpl")
+        if not STAGING or not isinstance(tmpl, str) or opts.get("paths"):
+            return opts, None
+        home = os.path.dirname(tmpl.split("%(")[0])
+        job = StagedJob({"home": home}, opts.get("match_filter"))
+        return dict(opts, outtmpl=os.path.relpath(tmpl, home), paths=job.paths,
+                    match_filter=job.match_filter), job
+
+    def _guarded(self, opts):
+        """opts whose videos wait for disk space before downloading, and the
+        directories they are written to (destination, staging)."""
+        paths = opts.get("paths") or {}
+        tmpl = opts.get("outtmpl")
+        home = paths.get("home") or (os.path.dirname(tmpl.split("%(")[0]) if isinstance(tmpl, str)
+                                     else self.cfg["download_path"])
+
+        def dirs():
+            # the staging volume counts only for a video StagedJob did stage (it set temp)
+            return [home] + ([paths["temp"]] if paths.get("temp") else [])
+        return dict(opts, match_filter=DISK.filter(dirs, self.log, opts.get("match_filter"))), dirs
+
+    def _apply_disk_guard(self):
+        DISK.margin = int(self.cfg.get("min_free_gb", 1) * 1024 ** 3)
+
+    def _apply_integrity(self):
+        INTEGRITY.algo = self.cfg.get("integrity_hash", "off")
+
+    def _apply_store(self):
+        STORE.path = os.path.expanduser(self.cfg.get("store_dir") or "")
+        STORE.mode = self.cfg.get("store_link", "auto")
+
+    def _apply_ffmpeg(self):
+        """Put the configured ffmpeg's folder on PATH: yt-dlp looks for ffmpeg
+        there alone when it picks the downloader for sections."""
+        loc = self._get_base_opts().get("ffmpeg_location")
+        if loc and os.path.exists(loc):
+            loc = loc if os.path.isdir(loc) else os.path.dirname(loc)
+            if loc not in os.environ.get("PATH", "").split(os.pathsep):
+                os.environ["PATH"] = loc + os.pathsep + os.environ.get("PATH", "")
+
+    def _apply_orchestrator(self):
+        ORCH.configure(fetch=self.cfg.get("fetch_workers", 4), download=self.cfg.get("download_workers", 4))
+
+    def _submit(self, kind, fn, *args, slot=None, dropped=None):
+        """Run fn(*args) as an orchestrator job (see Orchestrator.submit)."""
+        return ORCH.submit(kind, fn, *args, slot=slot, log=self.log, dropped=dropped)
+
+    def _ui(self, fn, *args):
+        """Run fn(*args) on the Tk thread soon. Workers use this instead of touching widgets."""
+        ORCH.post(fn, *args)
+
+    def _drain_ui(self):
+        more = ORCH.drain()
+        self.after(1 if more else UI_TICK_MS, self._drain_ui)
+
+    def _store_gc(self):
+        def run():
+            n, freed = STORE.gc()
+            self.log(f"[INFO] 🧹 Content store: {n} unreferenced files removed"
+                     + (f", {fmt_size(freed)} freed" if freed else ""))
+        if STORE:
+            self._submit("io", run)
+
+    def _preflight(self, urls, qual, audio, out, label):
+        """Estimate the run's size and time and show them on label; asks before
+        starting a run that does not fit the destination. Returns the summary
+        ("" when there is none), or None when the user backs out."""
+        if not self.cfg.get("preflight", True) or not urls:
+            return ""
+        self._ui(lambda: label.configure(text=f"📐 Estimating the size of {len(urls)} videos…"))
+        est = preflight(urls, lambda: self._ydl(self._get_base_opts(single=True)), qual, audio,
+                        self.cfg.get("preflight_workers", 4), INFO_CACHE.max_items)
+        if not est["sized"]:
+            return ""
+        free = free_bytes(out)
+        rates = [h.effective_throughput for h in self.history[-20:] if h.effective_throughput]
+        text = f"📐 {'≈' if est['unknown'] else ''}{fmt_size(est['bytes'])} for {len(urls)} videos"
+        if rates:
+            rate = statistics.median(rates)
+            text += f" • ~{fmt_dur(est['bytes'] / rate)} at {fmt_size(rate)}/s"
+        text += f" • {fmt_size(free)} free"
+        self.log(f"[INFO] {text}")
+        self._ui(lambda: label.configure(text=text))
+        if STAGING:
+            room = free_bytes(STAGING.path)
+            room = min(room, STAGING.cap) if STAGING.cap else room
+            if est["largest"] > room:
+                self.log(f"[WARN] Staging has room for {fmt_size(room)}; videos larger than that "
+                         f"are written straight to {out}")
+        if est["bytes"] + DISK.margin <= free:
+            return text
+        answer, done = {}, threading.Event()
+        self._ui(lambda: (answer.update(ok=messagebox.askyesno(
+            "Low disk space",
+            f"This run needs about {fmt_size(est['bytes'])} but only {fmt_size(free)} is free on "
+            f"{out}.\n\nStart anyway? Downloads pause when space runs low and continue once "
+            f"space is freed.")), done.set()))
+        done.wait()
+        return text if answer["ok"] else None
+
+    def _apply_staging(self):
+        STAGING.path = os.path.expanduser(self.cfg.get("staging_dir") or "")
+        STAGING.cap = int(self.cfg.get("staging_cap_gb", 20) * 1024 ** 3)
+
+    def _apply_cookie_cache(self):
+        path = os.path.abspath(COOKIE_CACHE_FILE) if self.cfg.get("cookie_cache_disk") else None
+        if not path and COOKIES.path and os.path.exists(COOKIES.path):
+            os.remove(COOKIES.path)  # turned off: do not leave decrypted cookies behind
+        COOKIES.path, COOKIES.ttl = path, self.cfg.get("cookie_cache_ttl", 600)
+        COOKIES.loaded = COOKIES.loaded and bool(path)
+
+    def _apply_proxies(self):
+        PROXIES.configure(self.cfg.get("proxy_pool") or [], self.cfg.get("proxy_policy", "least-loaded"),
+                          self.cfg.get("proxy_check_url"), self.cfg.get("proxy_check_interval"))
+
+    def _apply_metrics(self):
+        """Start, stop or move the metrics endpoint to match the config."""
+        want = self.cfg.get("metrics_port", 9464) if self.cfg.get("metrics_enabled") else None
+        if self.metrics_srv and (want is None or self.metrics_srv.httpd.server_address[1] != want):
+            self.metrics_srv.stop()
+            self.metrics_srv = None
+        if want is not None and not self.metrics_srv:
+            try:
+                self.metrics_srv = MetricsServer(want)
+                self.log(f"[INFO] 📈 Metrics at {self.metrics_srv.url}")
+            except OSError as e:
+                self.log(f"[ERROR] Metrics endpoint on port {want}: {e}")
+
+    def _profiled(self, fn, label):
+        """Wrap a job thread target so the whole job runs under the Profiler."""
+        if not (self.profile_jobs or self.cfg.get("profile_jobs")):
+            return fn
+
+        def run(*args):
+            prof = Profiler(self.profile_dir or self.cfg.get("profile_dir") or PROFILE_DIR, label)
+            if not prof.start():
+                return fn(*args)
+            try:
+                return fn(*args)
+            finally:
+                self.log(f"[INFO] 🩺 Profile written: {prof.stop()}.*")
+        return run
+
+    def _profile_now(self):
+        try:
+            seconds = max(1.0, float(self.s_prof_secs.get()))
+        except ValueError:
+            seconds = 30
+        self._profile_window(seconds)
+
+    def _profile_window(self, seconds):
+        """Profile everything, Tk loop included, for the next `seconds`."""
+        prof = Profiler(self.profile_dir or self.cfg.get("profile_dir") or PROFILE_DIR, "window")
+        if not prof.start():
+            self.log("[WARN] A profile is already running")
+            return
+        self.log(f"[INFO] 🩺 Profiling for {seconds:g}s…")
+        self.after(int(seconds * 1000),
+                   lambda: self.log(f"[INFO] 🩺 Profile written: {prof.stop()}.*"))
+
     # ══════════════════════════════════════
     #  HELPERS
     # ══════════════════════════════════════
@@ -425,16 +4094,69 @@ class App(ctk.CTk):
         st = "disabled" if is_audio else "normal"
         self.qual_menu.configure(state=st)
         self.vfmt_menu.configure(state=st)
+        self._show_preview()
+
+    def _show_preview(self, *_):
+        """What the current options resolve to, from the fetched video's FormatIndex."""
+        index = self.current_info and self.current_info.formats
+        if not index:
+            self.fmt_preview.configure(text="— fetch info to preview")
+            return
+        audio = self.dl_type.get() == "Audio Only"
+        c = index.get("Audio Only" if audio else self.qual_var.get(),
+                      self.afmt.get() if audio else self.vfmt.get(), int(self.abr.get()))
+        if not c:
+            self.fmt_preview.configure(text="⚠ No format matches these options")
+            return
+        codecs = " + ".join(x for x in (c.vcodec, c.acodec) if x)
+        parts = [f"#{c.format_id}", c.resolution, codecs, f".{c.ext}",
+                 ("" if c.exact else "≈ ") + fmt_size(c.size)]
+        if c.merge:
+            parts.append("merged" if c.ext == self.vfmt.get() else f"merged into .{c.ext}")
+        if c.transcode:
+            parts.append(f"⚠ re-encoded for {c.ext}")
+        if c.incompatible:
+            parts.append(f"⚠ codecs don't fit {c.ext}, the merge will fail")
+        try:
+            clip = self.current_info.clip_length(self.clip_var.get())
+        except ValueError:
+            clip = None
+            parts.append("⚠ sections don't parse")
+        if clip is not None and c.size:
+            parts[4] = f"≈ {fmt_size(c.size * clip / self.current_info.duration)}"
+            parts.append(f"✂ {fmt_dur(clip)} of {fmt_dur(self.current_info.duration)}")
+        self.fmt_preview.configure(text=" • ".join(p for p in parts if p))
+
+    def _add_chapter(self, choice):
+        """Append the picked chapter's title to the Sections field."""
+        self.chap_menu.set("＋ Chapter")
+        title = choice.split("  ", 1)[-1]
+        cur = self.clip_var.get().strip()
+        self.clip_var.set(f"{cur}, {title}" if cur else title)
 
     def _cancel_download(self):
-        self.cancel_flag = True
-        self.log("[INFO] ⛔ Cancel requested")
+        self._cancel("single")
         self.prog_stat.configure(text="⛔ Cancelling…")
 
-    def _add_hist(self, info):
-        if not info:
-            return
-        self.history.append({
+    def _token(self, slot):
+        """A fresh CancelToken for the job about to run in slot (single, batch, queue, ...)."""
+        tok = self.tokens[slot] = CancelToken(self.cfg.get("cancel_partial", "keep"))
+        return tok
+
+    def _cancel(self, slot, keep_partial=False):
+        if ORCH.cancel(slot):
+            self.log(f"[INFO] ⛔ Cancelled ({slot}) before it started")
+        tok = self.tokens.get(slot)
+        if tok and not tok.cancelled:
+            self.log(f"[INFO] ⛔ Cancel requested ({slot})")
+            if keep_partial:
+                tok.partial = "keep"
+            tok.cancel()
+
+    @staticmethod
+    def _hist_record(info, timing=None):
+        """The compact history entry for a finished download's info dict."""
+        rec = {
             "title": info.get("title", "Unknown"),
             "url": info.get("webpage_url") or info.get("original_url", ""),
             "timestamp": datetime.now().isoformat(),
@@ -442,7 +4164,26 @@ class App(ctk.CTk):
             "size": info.get("filesize") or info.get("filesize_approx"),
             "duration": info.get("duration"),
             "status": "completed",
-        })
+        }
+        files = [d.get("filepath") for d in info.get("requested_downloads") or [info]]
+        digests = {os.path.basename(f): INTEGRITY.take(f) for f in files if f}
+        rec["hash"] = next(iter(digests.values()), None)
+        if len(digests) > 1:  # one file per section
+            rec["hashes"] = digests
+        rec.update(timing or {})
+        return HistoryEntry.from_dict(rec)
+
+    def _add_hist(self, info, timing=None):
+        """Record a finished download. Called on the worker thread, so only the
+        compact entry, not the info dict, waits on the Tk queue."""
+        if not info or (timing or {}).get("coalesced"):
+            return  # the download it joined writes the entry
+        rec = self._hist_record(info, timing)
+        self._ui(lambda: self._append_hist(rec))
+
+    def _append_hist(self, rec):
+        self.history.append(rec)
+        METRICS.inc("ytdl_jobs_completed")
         self._save_hist()
         self._refresh_hist()
 
@@ -560,8 +4301,29 @@ class App(ctk.CTk):
                            values=["320", "256", "192", "128", "96"]).grid(
             row=3, column=3, padx=15, pady=5, sticky="ew")
 
+        ctk.CTkLabel(of, text="Will get:").grid(row=4, column=0, padx=15, pady=5, sticky="w")
+        self.fmt_preview = ctk.CTkLabel(of, text="— fetch info to preview", anchor="w", justify="left",
+                                        text_color=("gray40", "gray60"))
+        self.fmt_preview.grid(row=4, column=1, columnspan=3, padx=15, pady=5, sticky="w")
+
+        ctk.CTkLabel(of, text="Sections:").grid(row=5, column=0, padx=15, pady=5, sticky="w")
+        cf = ctk.CTkFrame(of, fg_color="transparent")
+        cf.grid(row=5, column=1, columnspan=3, padx=15, pady=5, sticky="ew")
+        cf.grid_columnconfigure(0, weight=1)
+        self.clip_var = ctk.StringVar()
+        ctk.CTkEntry(cf, textvariable=self.clip_var, height=32,
+                     placeholder_text="whole video — or 1:02:00-1:07:00, 2:10:00-, a chapter title").grid(
+            row=0, column=0, sticky="ew")
+        self.chap_menu = ctk.CTkOptionMenu(cf, values=["＋ Chapter"], width=120, state="disabled",
+                                           command=self._add_chapter)
+        self.chap_menu.grid(row=0, column=1, padx=(8, 0))
+        self.ck_keyframes = ctk.BooleanVar(value=self.cfg.get("clip_keyframes", False))
+        ctk.CTkCheckBox(cf, text="Exact cuts", variable=self.ck_keyframes).grid(row=0, column=2, padx=(8, 0))
+        for var in (self.qual_var, self.vfmt, self.afmt, self.abr, self.clip_var):
+            var.trace_add("write", self._show_preview)
+
         ck = ctk.CTkFrame(of, fg_color="transparent")
-        ck.grid(row=4, column=0, columnspan=4, padx=15, pady=(8, 12), sticky="ew")
+        ck.grid(row=6, column=0, columnspan=4, padx=15, pady=(8, 12), sticky="ew")
         self.ck_thumb = ctk.BooleanVar(value=self.cfg["embed_thumbnail"])
         self.ck_esub = ctk.BooleanVar(value=self.cfg["embed_subtitles"])
         self.ck_sthumb = ctk.BooleanVar(value=False)
@@ -725,11 +4487,17 @@ class App(ctk.CTk):
         self.pl_stat = ctk.CTkLabel(p, text="Ready", text_color=("gray50", "gray60"))
         self.pl_stat.grid(row=7, column=0, padx=30, pady=5, sticky="w")
 
-        ctk.CTkButton(p, text="⬇️  Download Playlist", height=50, width=220,
+        bf = ctk.CTkFrame(p, fg_color="transparent")
+        bf.grid(row=8, column=0, padx=25, pady=(10, 25), sticky="w")
+        ctk.CTkButton(bf, text="⬇️  Download Playlist", height=50, width=220,
                        font=ctk.CTkFont(size=15, weight="bold"),
                        fg_color="#e74c3c", hover_color="#c0392b",
-                       command=self._start_playlist).grid(
-            row=8, column=0, padx=25, pady=(10, 25), sticky="w")
+                       command=self._start_playlist).pack(side="left")
+        self.pl_sync_btn = ctk.CTkButton(bf, text="🔄 Sync new", height=50, width=140,
+                                          command=self._start_sync)
+        self.pl_sync_btn.pack(side="left", padx=(10, 0))
+        ctk.CTkButton(bf, text="⛔ Cancel", height=50, width=100, fg_color=("gray55", "gray30"),
+                       command=lambda: self._cancel("playlist")).pack(side="left", padx=(10, 0))
 
     # ══════════════════════════════════════
     #  PAGE: BATCH
@@ -765,6 +4533,14 @@ class App(ctk.CTk):
                        fg_color=("gray55", "gray30"),
                        command=lambda: self.batch_txt.delete("1.0", "end")).pack(
             side="left", padx=5)
+        ctk.CTkButton(br, text="📄 Stream File", width=120, height=34,
+                       command=self._pick_batch_file).pack(side="left", padx=5)
+        self.ba_file_lbl = ctk.CTkLabel(br, text="", font=ctk.CTkFont(size=11),
+                                         text_color=("gray50", "gray60"))
+        self.ba_file_lbl.pack(side="left", padx=10)
+        self.ba_file_x = ctk.CTkButton(br, text="✕", width=30, height=30,
+                                        fg_color=("gray55", "gray30"),
+                                        command=lambda: self._set_batch_file(None))
 
         of = ctk.CTkFrame(p)
         of.grid(row=3, column=0, padx=25, pady=8, sticky="ew")
@@ -788,18 +4564,56 @@ class App(ctk.CTk):
         self.ba_log = ctk.CTkTextbox(p, height=180, font=ctk.CTkFont(family="Consolas", size=11))
         self.ba_log.grid(row=6, column=0, padx=25, pady=8, sticky="ew")
 
-        ctk.CTkButton(p, text="⬇️  Start Batch", height=50, width=200,
+        bf = ctk.CTkFrame(p, fg_color="transparent")
+        bf.grid(row=7, column=0, padx=25, pady=(10, 25), sticky="w")
+        ctk.CTkButton(bf, text="⬇️  Start Batch", height=50, width=200,
                        font=ctk.CTkFont(size=15, weight="bold"),
                        fg_color="#e74c3c", hover_color="#c0392b",
-                       command=self._start_batch).grid(
-            row=7, column=0, padx=25, pady=(10, 25), sticky="w")
+                       command=self._start_batch).pack(side="left")
+        ctk.CTkButton(bf, text="⏹ Stop", height=50, width=90, fg_color=("gray55", "gray30"),
+                       command=self._stop_batch).pack(side="left", padx=(10, 0))
+        ctk.CTkButton(bf, text="🌐 Push to Shared Queue", height=50, width=200,
+                       command=self._push_batch_shared).pack(side="left", padx=10)
+        ctk.CTkButton(bf, text="🧾 Export Metadata", height=50, width=170,
+                       command=self._start_export).pack(side="left")
 
     def _load_batch_file(self):
         f = filedialog.askopenfilename(filetypes=[("Text", "*.txt"), ("All", "*.*")])
         if f:
+            if os.path.getsize(f) > 256 * 1024:
+                self._set_batch_file(f)  # too big for the text widget
+                return
             with open(f) as fh:
                 self.batch_txt.insert("end", fh.read())
 
+    def _pick_batch_file(self):
+        f = filedialog.askopenfilename(filetypes=[("URL lists", "*.txt *.csv *.tsv *.jsonl *.ndjson"),
+                                                  ("All", "*.*")])
+        if f:
+            self._set_batch_file(f)
+
+    def _set_batch_file(self, path):
+        """Switch the batch page to streaming `path` (None: back to the text box)."""
+        self.batch_file = path
+        if not path:
+            self.ba_file_lbl.configure(text="")
+            self.ba_file_x.pack_forget()
+            self.batch_txt.configure(state="normal")
+            return
+        self.batch_txt.configure(state="disabled")
+        self.ba_file_x.pack(side="left")
+        self.ba_file_lbl.configure(text=f"📄 {os.path.basename(path)} — counting…")
+
+        def count():
+            bf = BatchFile(path)
+            n, sample = bf.preview()
+            resume = f" • resumes after {bf.stats['done']} done" if bf.stats["offset"] else ""
+            self._ui(lambda: self.ba_file_lbl.configure(
+                text=f"📄 {os.path.basename(path)} — {n:,} URLs{resume}"))
+            self._ui(lambda: (self.ba_log.delete("1.0", "end"),
+                                   self.ba_log.insert("end", "Sample:\n" + "\n".join(sample) + "\n")))
+        self._submit("io", count)
+
     # ══════════════════════════════════════
     #  PAGE: QUEUE
     # ══════════════════════════════════════
@@ -808,7 +4622,7 @@ class App(ctk.CTk):
         p = ctk.CTkFrame(self.main, corner_radius=0, fg_color="transparent")
         self.pages["queue"] = p
         p.grid_columnconfigure(0, weight=1)
-        p.grid_rowconfigure(2, weight=1)
+        p.grid_rowconfigure(3, weight=1)
 
         ctk.CTkLabel(p, text="⏳  Download Queue",
                      font=ctk.CTkFont(size=24, weight="bold")).grid(
@@ -822,11 +4636,37 @@ class App(ctk.CTk):
         ctk.CTkButton(cf, text="🗑️ Clear", width=100, height=38,
                        fg_color=("gray55", "gray30"),
                        command=self._clear_queue).pack(side="left", padx=5)
+        self.q_sjf = ctk.BooleanVar(value=self.cfg.get("queue_sjf", False))
+        ctk.CTkCheckBox(cf, text="Smallest first", variable=self.q_sjf,
+                        command=self._toggle_sjf).pack(side="left", padx=15)
+        ctk.CTkLabel(cf, text="☰ drag to reorder", font=ctk.CTkFont(size=11),
+                     text_color=("gray50", "gray60")).pack(side="left", padx=5)
         self.q_cnt = ctk.CTkLabel(cf, text="0 items", font=ctk.CTkFont(size=13))
         self.q_cnt.pack(side="right", padx=15)
 
+        sf = ctk.CTkFrame(p, fg_color="transparent")
+        sf.grid(row=2, column=0, padx=25, pady=(0, 4), sticky="ew")
+        ctk.CTkLabel(sf, text="🌐 Shared:").pack(side="left", padx=5)
+        self.sq_path = ctk.CTkEntry(sf, width=280, height=34, placeholder_text="path/to/jobs.db on a shared drive")
+        self.sq_path.pack(side="left", padx=5)
+        self.sq_path.insert(0, self.cfg.get("shared_queue_path", ""))
+        ctk.CTkButton(sf, text="…", width=34, height=34,
+                       command=self._browse_shared).pack(side="left")
+        ctk.CTkButton(sf, text="⤴ Push", width=80, height=34,
+                       command=self._push_queue_shared).pack(side="left", padx=5)
+        ctk.CTkButton(sf, text="▶ Work", width=80, height=34, fg_color="#27ae60", hover_color="#2ecc71",
+                       command=self._work_shared).pack(side="left", padx=5)
+        ctk.CTkButton(sf, text="⏹", width=34, height=34, fg_color=("gray55", "gray30"),
+                       command=lambda: (setattr(self, "sq_stop", True), self._cancel("shared"))).pack(side="left")
+        ctk.CTkButton(sf, text="🔄", width=34, height=34, fg_color=("gray55", "gray30"),
+                       command=self._refresh_shared).pack(side="left", padx=5)
+        self.sq_stat = ctk.CTkLabel(sf, text="", font=ctk.CTkFont(size=11),
+                                     text_color=("gray50", "gray60"))
+        self.sq_stat.pack(side="left", padx=10)
+        self._refresh_shared()
+
         self.q_scroll = ctk.CTkScrollableFrame(p)
-        self.q_scroll.grid(row=2, column=0, padx=25, pady=10, sticky="nsew")
+        self.q_scroll.grid(row=3, column=0, padx=25, pady=10, sticky="nsew")
         self.q_scroll.grid_columnconfigure(0, weight=1)
 
     # ══════════════════════════════════════
@@ -880,6 +4720,15 @@ class App(ctk.CTk):
         self.srch_scroll.grid(row=3, column=0, padx=20, pady=(0, 15), sticky="nsew")
         self.srch_scroll.grid_columnconfigure(0, weight=1)
 
+        # load the next page when the results are scrolled to the bottom
+        bar_set = self.srch_scroll._scrollbar.set
+
+        def on_scroll(lo, hi):
+            bar_set(lo, hi)
+            if float(lo) > 0 and float(hi) >= 0.999:
+                self._search_more()
+        self.srch_scroll._parent_canvas.configure(yscrollcommand=on_scroll)
+
     # ══════════════════════════════════════
     #  PAGE: HISTORY
     # ══════════════════════════════════════
@@ -888,7 +4737,7 @@ class App(ctk.CTk):
         p = ctk.CTkFrame(self.main, corner_radius=0, fg_color="transparent")
         self.pages["history"] = p
         p.grid_columnconfigure(0, weight=1)
-        p.grid_rowconfigure(2, weight=1)
+        p.grid_rowconfigure(3, weight=1)
 
         ctk.CTkLabel(p, text="📜  Download History",
                      font=ctk.CTkFont(size=24, weight="bold")).grid(
@@ -908,8 +4757,13 @@ class App(ctk.CTk):
         self.hist_cnt = ctk.CTkLabel(hc, text=f"{len(self.history)} items")
         self.hist_cnt.pack(side="right", padx=15)
 
+        self.hist_stats = ctk.CTkLabel(p, text="", justify="left", anchor="w",
+                                        font=ctk.CTkFont(family="Consolas", size=11),
+                                        text_color=("gray40", "gray65"))
+        self.hist_stats.grid(row=2, column=0, padx=30, pady=(0, 4), sticky="w")
+
         self.hist_scroll = ctk.CTkScrollableFrame(p)
-        self.hist_scroll.grid(row=2, column=0, padx=25, pady=8, sticky="nsew")
+        self.hist_scroll.grid(row=3, column=0, padx=25, pady=8, sticky="nsew")
         self.hist_scroll.grid_columnconfigure(0, weight=1)
         self._refresh_hist()
 
@@ -952,7 +4806,13 @@ class App(ctk.CTk):
 
         ctk.CTkLabel(gf, text="  %(title)s %(id)s %(channel)s %(ext)s",
                      font=ctk.CTkFont(size=10), text_color=("gray50", "gray60")).grid(
-            row=3, column=0, columnspan=2, padx=15, pady=(0, 12), sticky="w")
+            row=3, column=0, columnspan=2, padx=15, pady=(0, 5), sticky="w")
+
+        ctk.CTkLabel(gf, text="Integrity hash (saved in history):").grid(
+            row=4, column=0, padx=15, pady=(5, 12), sticky="w")
+        self.s_hash = ctk.CTkOptionMenu(gf, values=list(HASH_ALGOS), width=120)
+        self.s_hash.grid(row=4, column=1, padx=15, pady=(5, 12), sticky="w")
+        self.s_hash.set(self.cfg.get("integrity_hash", "off"))
 
         # Defaults
         df = ctk.CTkFrame(p)
@@ -1009,11 +4869,75 @@ class App(ctk.CTk):
         self.s_buf.insert(0, str(self.cfg.get("buffer_size", 1024)))
 
         ctk.CTkLabel(spf, text="Speed Limit (KB/s, 0=∞):").grid(
-            row=4, column=0, padx=15, pady=(5, 12), sticky="w")
+            row=4, column=0, padx=15, pady=5, sticky="w")
         self.s_speed = ctk.CTkEntry(spf, width=100, height=36)
-        self.s_speed.grid(row=4, column=1, padx=15, pady=(5, 12), sticky="w")
+        self.s_speed.grid(row=4, column=1, padx=15, pady=5, sticky="w")
         self.s_speed.insert(0, str(self.cfg.get("speed_limit", 0)))
 
+        self.s_par_audio = ctk.BooleanVar(value=self.cfg.get("parallel_audio", False))
+        ctk.CTkCheckBox(spf, text=f"Parallel audio transcoding ({os.cpu_count() or 1} cores, mp3/aac/opus)",
+                        variable=self.s_par_audio).grid(
+            row=5, column=0, columnspan=2, padx=15, pady=3, sticky="w")
+        ctk.CTkLabel(spf, text="Parallel when longer than (min):").grid(
+            row=6, column=0, padx=15, pady=5, sticky="w")
+        self.s_par_min = ctk.CTkEntry(spf, width=100, height=36)
+        self.s_par_min.grid(row=6, column=1, padx=15, pady=5, sticky="w")
+        self.s_par_min.insert(0, str(self.cfg.get("parallel_audio_min_duration", 600) // 60))
+
+        ctk.CTkLabel(spf, text="Prefetch info for top results (0=off):").grid(
+            row=7, column=0, padx=15, pady=5, sticky="w")
+        self.s_prefetch = ctk.CTkEntry(spf, width=100, height=36)
+        self.s_prefetch.grid(row=7, column=1, padx=15, pady=5, sticky="w")
+        self.s_prefetch.insert(0, str(self.cfg.get("prefetch_count", 5)))
+
+        self.s_cancel_del = ctk.BooleanVar(value=self.cfg.get("cancel_partial", "keep") == "delete")
+        ctk.CTkCheckBox(spf, text="Delete partial files of cancelled downloads (otherwise they resume)",
+                        variable=self.s_cancel_del).grid(
+            row=8, column=0, columnspan=2, padx=15, pady=3, sticky="w")
+        ctk.CTkLabel(spf, text="Retry failed downloads (times, 0=off):").grid(
+            row=9, column=0, padx=15, pady=5, sticky="w")
+        self.s_retries = ctk.CTkEntry(spf, width=100, height=36)
+        self.s_retries.grid(row=9, column=1, padx=15, pady=5, sticky="w")
+        self.s_retries.insert(0, str(self.cfg.get("job_retries", 3)))
+        ctk.CTkLabel(spf, text="Staging dir (fast local disk, empty=off):").grid(
+            row=10, column=0, padx=15, pady=5, sticky="w")
+        self.s_stage = ctk.CTkEntry(spf, height=36, placeholder_text="e.g. /dev/shm/ytdl or D:\\ytdl-temp")
+        self.s_stage.grid(row=10, column=1, padx=15, pady=5, sticky="ew")
+        self.s_stage.insert(0, self.cfg.get("staging_dir", ""))
+        ctk.CTkLabel(spf, text="Staging size cap (GB):").grid(
+            row=11, column=0, padx=15, pady=5, sticky="w")
+        self.s_stage_cap = ctk.CTkEntry(spf, width=100, height=36)
+        self.s_stage_cap.grid(row=11, column=1, padx=15, pady=5, sticky="w")
+        self.s_stage_cap.insert(0, str(self.cfg.get("staging_cap_gb", 20)))
+        ctk.CTkLabel(spf, text="Pause downloads below free space (GB):").grid(
+            row=12, column=0, padx=15, pady=5, sticky="w")
+        self.s_min_free = ctk.CTkEntry(spf, width=100, height=36)
+        self.s_min_free.grid(row=12, column=1, padx=15, pady=5, sticky="w")
+        self.s_min_free.insert(0, str(self.cfg.get("min_free_gb", 1)))
+        self.s_preflight = ctk.BooleanVar(value=self.cfg.get("preflight", True))
+        ctk.CTkCheckBox(spf, text="Estimate size and time before batch and playlist runs",
+                        variable=self.s_preflight).grid(
+            row=13, column=0, columnspan=2, padx=15, pady=3, sticky="w")
+        ctk.CTkLabel(spf, text="Content store (dedup, empty=off):").grid(
+            row=14, column=0, padx=15, pady=5, sticky="w")
+        self.s_store = ctk.CTkEntry(spf, height=36, placeholder_text="e.g. ~/Videos/.ytdl-store")
+        self.s_store.grid(row=14, column=1, padx=15, pady=5, sticky="ew")
+        self.s_store.insert(0, self.cfg.get("store_dir", ""))
+        ctk.CTkLabel(spf, text="Link stored videos as:").grid(
+            row=15, column=0, padx=15, pady=5, sticky="w")
+        stf = ctk.CTkFrame(spf, fg_color="transparent")
+        stf.grid(row=15, column=1, padx=15, pady=5, sticky="w")
+        self.s_store_link = ctk.CTkOptionMenu(stf, values=list(STORE_LINKS), width=120)
+        self.s_store_link.pack(side="left")
+        self.s_store_link.set(self.cfg.get("store_link", "auto"))
+        ctk.CTkButton(stf, text="🧹 Clean up store", width=140, height=32,
+                       command=self._store_gc).pack(side="left", padx=10)
+        ctk.CTkLabel(spf, text="Downloads running at once (batch, queue, …):").grid(
+            row=16, column=0, padx=15, pady=(5, 12), sticky="w")
+        self.s_dl_workers = ctk.CTkEntry(spf, width=100, height=36)
+        self.s_dl_workers.grid(row=16, column=1, padx=15, pady=(5, 12), sticky="w")
+        self.s_dl_workers.insert(0, str(self.cfg.get("download_workers", 4)))
+
         # Network
         nf = ctk.CTkFrame(p)
         nf.grid(row=r, column=0, padx=25, pady=8, sticky="ew"); r += 1
@@ -1025,9 +4949,18 @@ class App(ctk.CTk):
         self.s_proxy = ctk.CTkEntry(nf, height=36, placeholder_text="socks5://127.0.0.1:1080")
         self.s_proxy.grid(row=1, column=1, padx=15, pady=5, sticky="ew")
         self.s_proxy.insert(0, self.cfg.get("proxy", ""))
+        ctk.CTkLabel(nf, text="Proxy pool:").grid(row=2, column=0, padx=15, pady=5, sticky="w")
+        self.s_proxy_pool = ctk.CTkEntry(nf, height=36,
+                                         placeholder_text="one per job, space separated (overrides Proxy)")
+        self.s_proxy_pool.grid(row=2, column=1, padx=15, pady=5, sticky="ew")
+        self.s_proxy_pool.insert(0, " ".join(self.cfg.get("proxy_pool") or []))
+        ctk.CTkLabel(nf, text="Pool policy:").grid(row=3, column=0, padx=15, pady=5, sticky="w")
+        self.s_proxy_policy = ctk.CTkOptionMenu(nf, values=list(PROXY_POLICIES), width=160)
+        self.s_proxy_policy.grid(row=3, column=1, padx=15, pady=5, sticky="w")
+        self.s_proxy_policy.set(self.cfg.get("proxy_policy", "least-loaded"))
         self.s_geo = ctk.BooleanVar(value=self.cfg["geo_bypass"])
         ctk.CTkCheckBox(nf, text="Geo Bypass", variable=self.s_geo).grid(
-            row=2, column=0, columnspan=2, padx=15, pady=(5, 12), sticky="w")
+            row=4, column=0, columnspan=2, padx=15, pady=(5, 12), sticky="w")
 
         # Cookies
         cf = ctk.CTkFrame(p)
@@ -1041,8 +4974,12 @@ class App(ctk.CTk):
             row=1, column=0, padx=15, pady=5, sticky="w")
         ctk.CTkLabel(cf, text="Browser:").grid(row=2, column=0, padx=15, pady=5, sticky="w")
         self.s_cookies_browser = ctk.CTkOptionMenu(cf, values=BROWSER_LIST, width=160)
-        self.s_cookies_browser.grid(row=2, column=1, padx=15, pady=(5, 12), sticky="w")
+        self.s_cookies_browser.grid(row=2, column=1, padx=15, pady=5, sticky="w")
         self.s_cookies_browser.set(self.cfg.get("cookies_browser", "none"))
+        self.s_cookie_disk = ctk.BooleanVar(value=self.cfg.get("cookie_cache_disk", False))
+        ctk.CTkCheckBox(cf, text=f"Keep extracted cookies between runs ({COOKIE_CACHE_FILE}, owner-only)",
+                        variable=self.s_cookie_disk).grid(
+            row=3, column=0, columnspan=2, padx=15, pady=(5, 12), sticky="w")
 
         # Post-processing
         ppf = ctk.CTkFrame(p)
@@ -1068,6 +5005,35 @@ class App(ctk.CTk):
         self.s_slang.grid(row=5, column=1, padx=15, pady=(8, 12), sticky="w")
         self.s_slang.insert(0, self.cfg["subtitle_lang"])
 
+        # Monitoring
+        mf = ctk.CTkFrame(p)
+        mf.grid(row=r, column=0, padx=25, pady=8, sticky="ew"); r += 1
+        mf.grid_columnconfigure(1, weight=1)
+        ctk.CTkLabel(mf, text="📈 Monitoring",
+                     font=ctk.CTkFont(size=14, weight="bold")).grid(
+            row=0, column=0, columnspan=2, padx=15, pady=(12, 8), sticky="w")
+        self.s_metrics = ctk.BooleanVar(value=self.cfg.get("metrics_enabled", False))
+        ctk.CTkCheckBox(mf, text="Prometheus / OpenMetrics endpoint (localhost only)",
+                        variable=self.s_metrics).grid(
+            row=1, column=0, columnspan=2, padx=15, pady=3, sticky="w")
+        ctk.CTkLabel(mf, text="Metrics Port:").grid(row=2, column=0, padx=15, pady=5, sticky="w")
+        self.s_metrics_port = ctk.CTkEntry(mf, width=100, height=36)
+        self.s_metrics_port.grid(row=2, column=1, padx=15, pady=5, sticky="w")
+        self.s_metrics_port.insert(0, str(self.cfg.get("metrics_port", 9464)))
+        self.s_prof_jobs = ctk.BooleanVar(value=self.cfg.get("profile_jobs", False))
+        ctk.CTkCheckBox(mf, text="Profile every download job (cProfile + tracemalloc, slower)",
+                        variable=self.s_prof_jobs).grid(
+            row=3, column=0, columnspan=2, padx=15, pady=3, sticky="w")
+        pwf = ctk.CTkFrame(mf, fg_color="transparent")
+        pwf.grid(row=4, column=0, columnspan=2, padx=15, pady=(5, 12), sticky="w")
+        self.s_prof_secs = ctk.CTkEntry(pwf, width=60, height=36)
+        self.s_prof_secs.insert(0, "30")
+        ctk.CTkButton(pwf, text="🩺 Profile now for", width=150, height=36,
+                       command=self._profile_now).pack(side="left")
+        self.s_prof_secs.pack(side="left", padx=8)
+        ctk.CTkLabel(pwf, text=f"seconds  →  {self.cfg.get('profile_dir') or PROFILE_DIR}/",
+                     text_color=("gray50", "gray60")).pack(side="left")
+
         ctk.CTkButton(p, text="💾  Save Settings", height=50, width=180,
                        font=ctk.CTkFont(size=15, weight="bold"),
                        fg_color="#27ae60", hover_color="#2ecc71",
@@ -1089,15 +5055,17 @@ class App(ctk.CTk):
         self.status_lbl.configure(text="⏳ Fetching…")
         self.fetch_btn.configure(state="disabled", text="⏳ Fetching…")
 
-        threading.Thread(target=self._t_fetch, args=(url,), daemon=True).start()
+        self._submit("fetch", self._t_fetch, url, slot="fetch")
 
     def _t_fetch(self, url):
         try:
             opts = self._get_base_opts(single=True)  # ← noplaylist=True
             opts["skip_download"] = True
 
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                info = ydl.extract_info(url, download=False)
+            with self._ydl(opts) as ydl:
+                info = INFO_CACHE.fetch(ydl, url)
+                if info:
+                    info = ydl.process_ie_result(info, download=False)
 
             if not info:
                 raise Exception("yt-dlp returned None")
@@ -1109,37 +5077,36 @@ class App(ctk.CTk):
                     # Re-fetch full info for the single video
                     vid_url = entries[0].get("webpage_url") or entries[0].get("url", "")
                     if vid_url:
-                        with yt_dlp.YoutubeDL(opts) as ydl2:
+                        with self._ydl(opts) as ydl2:
                             info = ydl2.extract_info(vid_url, download=False)
                     else:
                         info = entries[0]
                 else:
                     raise Exception("Empty playlist / no entries found")
 
-            self.current_info = info
-            self.log(f"[INFO] ✅ {info.get('title', '?')}")
-            self.after(0, lambda: self._display_info(info))
+            self.current_info = info = VideoInfo.from_info(info)
+            self.log(f"[INFO] ✅ {info.title or '?'}")
+            self._ui(lambda: self._display_info(info))
 
         except Exception as e:
             self.log(f"[ERROR] {e}")
             self.log(traceback.format_exc())
             if "Sign in" in str(e):
                 self.log("[HINT] Enable cookies in Settings → Cookies")
-            self.after(0, lambda: self._fetch_error(str(e)))
+            self._ui(lambda: self._fetch_error(str(e)))
 
     def _display_info(self, info):
         self.fetch_btn.configure(state="normal", text="ℹ️  Fetch Info")
         self.status_lbl.configure(text="✅ Ready")
         self.prog_stat.configure(text="✅ Video info loaded — ready to download!")
 
-        self.info_labels["title"].configure(text=info.get("title", "Unknown"))
-        self.info_labels["channel"].configure(
-            text=info.get("channel") or info.get("uploader") or "?")
-        self.info_labels["duration"].configure(text=fmt_dur(info.get("duration")))
-        self.info_labels["views"].configure(text=fmt_num(info.get("view_count")))
-        self.info_labels["likes"].configure(text=fmt_num(info.get("like_count")))
+        self.info_labels["title"].configure(text=info.title or "Unknown")
+        self.info_labels["channel"].configure(text=info.channel or "?")
+        self.info_labels["duration"].configure(text=fmt_dur(info.duration))
+        self.info_labels["views"].configure(text=fmt_num(info.view_count))
+        self.info_labels["likes"].configure(text=fmt_num(info.like_count))
 
-        ud = info.get("upload_date", "")
+        ud = info.upload_date or ""
         if ud:
             try:
                 ud = datetime.strptime(ud, "%Y%m%d").strftime("%B %d, %Y")
@@ -1147,17 +5114,19 @@ class App(ctk.CTk):
                 pass
         self.info_labels["upload_date"].configure(text=ud or "?")
 
-        w, h = info.get("width"), info.get("height")
+        w, h = info.width, info.height
         self.info_labels["resolution"].configure(
-            text=f"{w}×{h}" if w and h else info.get("resolution", "?"))
+            text=f"{w}×{h}" if w and h else info.resolution or "?")
 
-        fs = info.get("filesize") or info.get("filesize_approx")
-        self.info_labels["filesize"].configure(text=fmt_size(fs))
+        self.info_labels["filesize"].configure(text=fmt_size(info.filesize))
+        self.chap_menu.configure(values=["＋ Chapter"] + [f"{fmt_dur(s)}  {t}" for s, _, t in info.chapters or ()],
+                                 state="normal" if info.chapters else "disabled")
+        self._show_preview()
 
-        thumb = info.get("thumbnail")
+        thumb = info.thumbnail
         if thumb:
             def set_thumb(img):
-                self.after(0, lambda: self.thumb_lbl.configure(image=img, text=""))
+                self._ui(lambda: self.thumb_lbl.configure(image=img, text=""))
             load_thumbnail(thumb, (320, 180), set_thumb)
         else:
             self.thumb_lbl.configure(text="No thumbnail", image=None if hasattr(ctk.CTkLabel, 'image') else "")
@@ -1183,9 +5152,13 @@ class App(ctk.CTk):
         if self.is_downloading:
             messagebox.showinfo("Busy", "Download in progress.")
             return
+        try:
+            parse_sections(self.clip_var.get())
+        except ValueError as e:
+            messagebox.showwarning("Sections", str(e))
+            return
 
         self.is_downloading = True
-        self.cancel_flag = False
         self.dl_btn.configure(state="disabled", text="⏳ Downloading…")
         self.prog_bar.set(0)
         self.prog_pct.configure(text="0 %")
@@ -1196,9 +5169,11 @@ class App(ctk.CTk):
         self.status_lbl.configure(text="⬇️ Downloading")
 
         self.log(f"[INFO] ⬇️ Starting: {url}")
-        threading.Thread(target=self._t_download, args=(url,), daemon=True).start()
+        self._submit("download", self._profiled(self._t_download, "single"), url,
+                     slot="single", dropped=self._dl_cancelled)
 
     def _t_download(self, url):
+        timer = JobTimer(self._token("single"))
         try:
             out = self.out_e.get().strip() or self.cfg["download_path"]
             os.makedirs(out, exist_ok=True)
@@ -1208,6 +5183,7 @@ class App(ctk.CTk):
             opts = self._get_base_opts(single=True)
             opts["outtmpl"] = os.path.join(out, self.cfg["filename_template"])
             opts["progress_hooks"] = [self._progress_hook]
+            timer.attach(opts)
 
             if is_audio:
                 opts["format"] = "bestaudio/best"
@@ -1222,7 +5198,7 @@ class App(ctk.CTk):
             else:
                 q = QUALITY_MAP.get(self.qual_var.get(), "bestvideo+bestaudio/best")
                 opts["format"] = q
-                opts["merge_output_format"] = self.vfmt.get()
+                opts["merge_output_format"] = merge_format(self.vfmt.get())
                 if self.ck_esub.get():
                     opts.setdefault("postprocessors", []).append(
                         {"key": "FFmpegEmbedSubtitle"})
@@ -1240,31 +5216,26 @@ class App(ctk.CTk):
                     {"key": "SponsorBlock"},
                     {"key": "ModifyChapters", "remove_sponsor_segments": ["sponsor"]},
                 ])
+            clip_opts(opts, self.clip_var.get(), self.ck_keyframes.get())
 
             self.log(f"[INFO] Format: {opts.get('format')}")
             if opts.get("external_downloader"):
                 self.log("[INFO] ⚡ Using aria2c for fast download!")
 
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-
-            if self.cancel_flag:
-                self.after(0, self._dl_cancelled)
-            else:
-                self.after(0, lambda: self._dl_ok(info))
+            info = self._extract(opts, url, timer)
+            self._add_hist(info, timer.record())
+            self._ui(self._dl_ok)
 
         except Exception as e:
-            if "cancelled" in str(e).lower():
-                self.after(0, self._dl_cancelled)
+            timer.fail()
+            if timer.token.cancelled:
+                self._ui(self._dl_cancelled)
             else:
                 self.log(f"[ERROR] {e}")
                 self.log(traceback.format_exc())
-                self.after(0, lambda: self._dl_err(str(e)))
+                self._ui(lambda: self._dl_err(str(e)))
 
     def _progress_hook(self, d):
-        if self.cancel_flag:
-            raise yt_dlp.utils.DownloadError("Cancelled by user")
-
         st = d.get("status", "")
         if st == "downloading":
             total = d.get("total_bytes") or d.get("total_bytes_estimate", 0)
@@ -1274,24 +5245,24 @@ class App(ctk.CTk):
 
             if total and total > 0:
                 frac = min(done / total, 1.0)
-                self.after(0, lambda f=frac: self.prog_bar.set(f))
-                self.after(0, lambda f=frac: self.prog_pct.configure(text=f"{f * 100:.1f} %"))
+                self._ui(lambda f=frac: self.prog_bar.set(f))
+                self._ui(lambda f=frac: self.prog_pct.configure(text=f"{f * 100:.1f} %"))
             if speed:
-                self.after(0, lambda s=speed: self.prog_speed.configure(
+                self._ui(lambda s=speed: self.prog_speed.configure(
                     text=f"Speed: {fmt_size(s)}/s"))
             if eta is not None:
-                self.after(0, lambda e=eta: self.prog_eta.configure(text=f"ETA: {fmt_dur(e)}"))
+                self._ui(lambda e=eta: self.prog_eta.configure(text=f"ETA: {fmt_dur(e)}"))
 
-            self.after(0, lambda d=done, t=total: self.prog_size.configure(
+            self._ui(lambda d=done, t=total: self.prog_size.configure(
                 text=f"{fmt_size(d)} / {fmt_size(t)}"))
-            self.after(0, lambda: self.prog_stat.configure(text="⬇️ Downloading…"))
+            self._ui(lambda: self.prog_stat.configure(text="⬇️ Downloading…"))
 
         elif st == "finished":
-            self.after(0, lambda: self.prog_bar.set(1))
-            self.after(0, lambda: self.prog_pct.configure(text="100 %"))
-            self.after(0, lambda: self.prog_stat.configure(text="🔧 Post-processing…"))
+            self._ui(lambda: self.prog_bar.set(1))
+            self._ui(lambda: self.prog_pct.configure(text="100 %"))
+            self._ui(lambda: self.prog_stat.configure(text="🔧 Post-processing…"))
 
-    def _dl_ok(self, info):
+    def _dl_ok(self):
         self.is_downloading = False
         self.prog_bar.set(1)
         self.prog_pct.configure(text="100 %")
@@ -1300,8 +5271,6 @@ class App(ctk.CTk):
         self.prog_stat.configure(text="✅ Download complete!")
         self.dl_btn.configure(state="normal", text="⬇️  Download Now")
         self.status_lbl.configure(text="✅ Complete")
-        if info:
-            self._add_hist(info)
         self.log("[INFO] ✅ Complete!")
         messagebox.showinfo("Done", "Download completed! 🎉")
 
@@ -1333,7 +5302,7 @@ class App(ctk.CTk):
             return
         self.pl_fetch_btn.configure(state="disabled", text="⏳…")
         self.pl_stat.configure(text="⏳ Fetching…")
-        threading.Thread(target=self._t_pl_fetch, args=(url,), daemon=True).start()
+        self._submit("fetch", self._t_pl_fetch, url, slot="playlist-fetch")
 
     def _t_pl_fetch(self, url):
         try:
@@ -1341,53 +5310,73 @@ class App(ctk.CTk):
             opts["extract_flat"] = "in_playlist"
             opts["skip_download"] = True
 
-            with yt_dlp.YoutubeDL(opts) as ydl:
+            with self._ydl(opts) as ydl:
                 info = ydl.extract_info(url, download=False)
 
-            entries = list(info.get("entries", []))
+            entries = [PlaylistEntry.from_entry(e) for e in info.get("entries") or [] if e]
             self.pl_entries = entries
-            self.after(0, lambda: self._show_pl(info, entries))
+            title = info.get("title", "Playlist")
+            self._ui(lambda: self._show_pl(title, entries))
         except Exception as e:
-            self.after(0, lambda: self.pl_fetch_btn.configure(state="normal", text="🔍 Fetch"))
-            self.after(0, lambda: self.pl_stat.configure(text=f"❌ {str(e)[:80]}"))
-            self.after(0, lambda: messagebox.showerror("Error", str(e)))
+            self._ui(lambda: self.pl_fetch_btn.configure(state="normal", text="🔍 Fetch"))
+            self._ui(lambda: self.pl_stat.configure(text=f"❌ {str(e)[:80]}"))
+            self._ui(lambda: messagebox.showerror("Error", str(e)))
 
-    def _show_pl(self, info, entries):
+    def _show_pl(self, title, entries):
         self.pl_fetch_btn.configure(state="normal", text="🔍 Fetch")
-        self.pl_info_lbl.configure(text=f"📋 {info.get('title', 'Playlist')} • {len(entries)} videos")
+        self.pl_info_lbl.configure(text=f"📋 {title} • {len(entries)} videos")
 
         for w in self.pl_scroll.winfo_children():
             w.destroy()
         self.pl_cbs.clear()
+        self.pl_urls = []
 
+        seen = set()
         for i, e in enumerate(entries):
-            if not e: continue
-            var = ctk.BooleanVar(value=True)
+            key = url_key(e.url or e.id, scan=False) if e.url or e.id else None
+            dup = key is not None and key in seen
+            seen.add(key)
+            var = ctk.BooleanVar(value=not dup)
             self.pl_cbs.append(var)
+            self.pl_urls.append(e.url)
             f = ctk.CTkFrame(self.pl_scroll, fg_color="transparent")
             f.grid(row=i, column=0, sticky="ew", padx=5, pady=1)
             f.grid_columnconfigure(1, weight=1)
-            ctk.CTkCheckBox(f, text="", variable=var, width=28).grid(row=0, column=0, padx=5)
-            ctk.CTkLabel(f, text=f"{i + 1}. {(e.get('title') or '?')[:65]}",
+            ctk.CTkCheckBox(f, text="", variable=var, width=28,
+                            command=self._pl_prefetch).grid(row=0, column=0, padx=5)
+            ctk.CTkLabel(f, text=f"{i + 1}. {(e.title or '?')[:65]}" + ("  ↺ duplicate" if dup else ""),
                          font=ctk.CTkFont(size=12), anchor="w").grid(
                 row=0, column=1, padx=5, sticky="w")
-            ctk.CTkLabel(f, text=fmt_dur(e.get("duration")),
+            ctk.CTkLabel(f, text=fmt_dur(e.duration),
                          font=ctk.CTkFont(size=11), text_color=("gray50", "gray60"),
                          width=65).grid(row=0, column=2, padx=5)
 
         self.pl_stat.configure(text=f"✅ {len(entries)} videos loaded")
+        self._pl_prefetch()
 
     def _pl_sel_all(self):
         for v in self.pl_cbs: v.set(True)
+        self._pl_prefetch()
 
     def _pl_desel_all(self):
         for v in self.pl_cbs: v.set(False)
+        INFO_CACHE.cancel()
+
+    def _pl_prefetch(self):
+        self._prefetch_infos([u for u, v in zip(self.pl_urls, self.pl_cbs) if v.get() and u])
+
+    def _prefetch_infos(self, urls):
+        """Warm full info for the first prefetch_count urls while the user decides."""
+        n = self.cfg.get("prefetch_count", 5)
+        if n > 0:
+            urls = [u if u.startswith("http") else f"https://www.youtube.com/watch?v={u}" for u in urls]
+            INFO_CACHE.prefetch(urls[:n], lambda: self._ydl(self._get_base_opts(single=True)))
 
     def _start_playlist(self):
         url = self.pl_url.get().strip()
         if not url: return
         self.pl_stat.configure(text="⏳ Downloading…")
-        threading.Thread(target=self._t_pl_dl, args=(url,), daemon=True).start()
+        self._submit("download", self._profiled(self._t_pl_dl, "playlist"), url, slot="playlist")
 
     def _t_pl_dl(self, url):
         try:
@@ -1398,7 +5387,7 @@ class App(ctk.CTk):
             sel = [i + 1 for i, v in enumerate(self.pl_cbs) if v.get()]
 
             if self.pl_cbs and not sel:
-                self.after(0, lambda: messagebox.showwarning("Playlist", "No videos selected!"))
+                self._ui(lambda: messagebox.showwarning("Playlist", "No videos selected!"))
                 return
 
             def hook(d):
@@ -1406,11 +5395,12 @@ class App(ctk.CTk):
                     t = d.get("total_bytes") or d.get("total_bytes_estimate", 0)
                     dn = d.get("downloaded_bytes", 0)
                     if t:
-                        self.after(0, lambda f=dn / t: self.pl_prog.set(min(f, 1.0)))
+                        self._ui(lambda f=dn / t: self.pl_prog.set(min(f, 1.0)))
 
             opts = self._get_base_opts()
             opts["outtmpl"] = os.path.join(out, "%(playlist_title)s", "%(title)s.%(ext)s")
-            opts["progress_hooks"] = [hook]
+            opts["progress_hooks"] = [hook, METRICS.progress_hook]
+            token = self._token("playlist").attach(opts)
 
             if fmt in AUDIO_FORMATS:
                 opts["format"] = "bestaudio/best"
@@ -1421,32 +5411,159 @@ class App(ctk.CTk):
                 }]
             else:
                 opts["format"] = q
-                opts["merge_output_format"] = fmt
+                opts["merge_output_format"] = merge_format(fmt)
 
             if sel:
                 opts["playlist_items"] = ",".join(map(str, sel))
 
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                ydl.download([url])
+            urls = [u if u.startswith("http") else f"https://www.youtube.com/watch?v={u}"
+                    for u, v in zip(self.pl_urls, self.pl_cbs) if v.get() and u]
+            if self._preflight(urls, self.pl_q.get(), fmt in AUDIO_FORMATS, out, self.pl_stat) is None:
+                self._ui(lambda: self.pl_stat.configure(text="Ready"))
+                return
 
-            self.after(0, lambda: self.pl_prog.set(1))
-            self.after(0, lambda: self.pl_stat.configure(text="✅ Complete!"))
-            self.after(0, lambda: messagebox.showinfo("Done", "Playlist finished! 🎉"))
+            def dl():
+                with self._ydl(opts) as ydl:
+                    ydl.download([url])
+            host, proxy = url_host(url), PROXIES.acquire() if PROXIES else None
+            if proxy:
+                opts["proxy"], host = proxy, f"{host} via {proxy}"
+            opts, staged = self._staged(opts)
+            opts, dirs = self._guarded(opts)
+            try:
+                with BREAKER.slot(host, token):
+                    run_job(token, DISK.run, dl, dirs, self.log)
+            except Exception as e:
+                PROXIES.release(proxy, e)
+                raise
+            finally:
+                if staged:
+                    staged.release()
+            PROXIES.release(proxy)
+
+            self._ui(lambda: self.pl_prog.set(1))
+            self._ui(lambda: self.pl_stat.configure(text="✅ Complete!"))
+            self._ui(lambda: messagebox.showinfo("Done", "Playlist finished! 🎉"))
+        except JobCancelled:
+            self._ui(lambda: self.pl_stat.configure(text="⛔ Cancelled"))
         except Exception as e:
-            self.after(0, lambda: self.pl_stat.configure(text=f"❌ {str(e)[:80]}"))
-            self.after(0, lambda: messagebox.showerror("Error", str(e)))
+            self._ui(lambda: self.pl_stat.configure(text=f"❌ {str(e)[:80]}"))
+            self._ui(lambda: messagebox.showerror("Error", str(e)))
+
+    def _start_sync(self):
+        url = self.pl_url.get().strip()
+        if not url: return
+        self.pl_sync_btn.configure(state="disabled", text="⏳…")
+        self.pl_stat.configure(text="🔄 Checking for new videos…")
+        self._submit("fetch", self._t_sync, url, slot="sync")
+
+    def _sync_scan(self, url):
+        """SYNC.scan over a flat extraction of url."""
+        SYNC.stop_after = self.cfg.get("sync_stop_after", 3)
+        opts = self._get_base_opts()
+        opts["extract_flat"] = "in_playlist"
+        opts["skip_download"] = True
+        with self._ydl(opts) as ydl:
+            return SYNC.scan(ydl, url)
+
+    def _t_sync(self, url):
+        try:
+            t0 = time.monotonic()
+            title, new, read, first = self._sync_scan(url)
+            secs = time.monotonic() - t0
+            if first and new:
+                answer, done = {}, threading.Event()
+                self._ui(lambda: (answer.update(ok=messagebox.askyesno(
+                    "First sync",
+                    f"{title} has not been synced before and has {len(new)} videos.\n\n"
+                    f"Queue all of them? Choose No to only remember them, so later syncs "
+                    f"queue just what is added from now on.")), done.set()))
+                done.wait()
+                if not answer["ok"]:
+                    SYNC.mark(url, [e.url for e in new])
+                    new = []
+            self._ui(lambda: self._queue_sync(url, title, new, read, secs))
+        except Exception as e:
+            self._ui(lambda: self.pl_sync_btn.configure(state="normal", text="🔄 Sync new"))
+            self._ui(lambda: self.pl_stat.configure(text=f"❌ {str(e)[:80]}"))
+            self._ui(lambda: messagebox.showerror("Error", str(e)))
+
+    def _queue_sync(self, url, title, new, read, secs):
+        """Queue a sync's new videos oldest first; each is marked seen once downloaded."""
+        self.pl_sync_btn.configure(state="normal", text="🔄 Sync new")
+        fmt = self.pl_f.get()
+        typ = "Audio Only" if fmt in AUDIO_FORMATS else "Video"
+        added = sum(self._queue_add(QueueItem(url=e.url, title=e.title or e.url, qual=self.pl_q.get(),
+                                              fmt=fmt, type=typ, source=url))
+                    for e in reversed(new))
+        self.pl_stat.configure(text=f"🔄 {title}: {len(new)} new, {read} checked in {secs:.1f}s"
+                               + (f", {added} queued" if added else ""))
+        self.log(f"[INFO] 🔄 Sync {title}: {len(new)} new of {read} entries read ({secs:.1f}s)")
+        if added:
+            self._run_queue()
 
     # ══════════════════════════════════════
     #  BATCH
     # ══════════════════════════════════════
 
     def _start_batch(self):
+        self.ba_stop = False
+        if self.batch_file:
+            self._submit("download", self._profiled(self._t_batch_file, "batch"), self.batch_file,
+                         slot="batch")
+            return
         txt = self.batch_txt.get("1.0", "end").strip()
         urls = [u.strip() for u in txt.splitlines() if u.strip() and not u.startswith("#")]
         if not urls:
             messagebox.showwarning("Input", "Add URLs!")
             return
-        threading.Thread(target=self._t_batch, args=(urls,), daemon=True).start()
+        uniq = list({compact_key(u): u for u in reversed(urls)}.values())[::-1]  # no extractor scan on Tk
+        if len(uniq) < len(urls):
+            self.log(f"[INFO] Batch: {len(urls) - len(uniq)} duplicate URLs skipped")
+            urls = uniq
+        self._submit("download", self._profiled(self._t_batch, "batch"), urls, slot="batch")
+
+    def _stop_batch(self):
+        self.ba_stop = True
+        self._cancel("batch")
+        self._cancel("export")
+
+    def _start_export(self):
+        """Metadata for the batch URLs, or the streamed file, into a .jsonl or .csv."""
+        if self.batch_file:
+            src = self.batch_file
+        else:
+            txt = self.batch_txt.get("1.0", "end").strip()
+            src = [u.strip() for u in txt.splitlines() if u.strip() and not u.startswith("#")]
+            if not src:
+                messagebox.showwarning("Input", "Add URLs!")
+                return
+        path = filedialog.asksaveasfilename(title="Export metadata to", defaultextension=".jsonl",
+                                            filetypes=[("JSON Lines", "*.jsonl"), ("CSV", "*.csv")])
+        if path:
+            self._submit("fetch", self._profiled(self._t_export, "export"), src, path, slot="export")
+
+    def _export_ydl(self):
+        return self._ydl(dict(self._get_base_opts(single=True), skip_download=True))
+
+    def _retry_schedule(self):
+        return RetrySchedule(self.cfg.get("job_retries", 3), self.cfg.get("retry_backoff", 5))
+
+    def _next_job(self, todo, retry):
+        """(attempt, item) from the retries that are due, else from the todo
+        iterator; waits for a retry when todo is used up. None when all are done
+        or the batch is stopped."""
+        while not self.ba_stop:
+            due = retry.pop()
+            if due:
+                return due
+            item = next(todo, None)
+            if item is not None:
+                return 0, item
+            if not retry:
+                return None
+            time.sleep(min(0.5, retry.wait()))
+        return None
 
     def _t_batch(self, urls):
         total, ok, fail = len(urls), 0, 0
@@ -1454,39 +5571,166 @@ class App(ctk.CTk):
         os.makedirs(out, exist_ok=True)
         q = QUALITY_MAP.get(self.ba_q.get(), "bestvideo+bestaudio/best")
         fmt = self.ba_f.get()
-
-        for idx, url in enumerate(urls):
-            self.after(0, lambda i=idx: self.ba_stat.configure(
-                text=f"⏳ {i + 1}/{total}…"))
-            self.after(0, lambda i=idx: self.ba_prog.set(i / total))
+        est = self._preflight(urls, self.ba_q.get(), fmt in AUDIO_FORMATS, out, self.ba_stat)
+        if est is None:
+            self._ui(lambda: self.ba_stat.configure(text="Ready"))
+            return
+        if est:
+            self._ui(lambda: self.ba_log.insert("end", est + "\n"))
+        todo, retry = iter(enumerate(urls)), self._retry_schedule()
+
+        while True:
+            job = self._next_job(todo, retry)
+            if job is None:
+                break
+            attempt, (idx, url) = job
+            self._ui(lambda n=ok + fail, r=len(retry): self.ba_stat.configure(
+                text=f"⏳ {n + 1}/{total}…" + (f" ({r} waiting to retry)" if r else "")))
+            self._ui(lambda n=ok + fail: self.ba_prog.set(n / total))
             try:
-                opts = self._get_base_opts(single=True)
-                opts["outtmpl"] = os.path.join(out, "%(title)s.%(ext)s")
-                if fmt in AUDIO_FORMATS:
-                    opts["format"] = "bestaudio/best"
-                    opts["postprocessors"] = [{
-                        "key": "FFmpegExtractAudio",
-                        "preferredcodec": fmt, "preferredquality": "192"}]
-                else:
-                    opts["format"] = q
-                    opts["merge_output_format"] = fmt
-
-                with yt_dlp.YoutubeDL(opts) as ydl:
-                    info = ydl.extract_info(url, download=True)
-                    t = info.get("title", url) if info else url
-                self.after(0, lambda t=t: self.ba_log.insert("end", f"✅ {t}\n"))
-                self.after(0, lambda: self.ba_log.see("end"))
-                if info: self.after(0, lambda i=info: self._add_hist(i))
+                info, tm = self._batch_one(url, out, q, fmt)
+                t = info.get("title", url) if info else url
+                self._ui(lambda t=t: self.ba_log.insert("end", f"✅ {t}\n"))
+                self._ui(lambda: self.ba_log.see("end"))
+                self._add_hist(info, tm)
                 ok += 1
             except Exception as e:
-                fail += 1
-                self.after(0, lambda u=url, e=str(e): self.ba_log.insert(
-                    "end", f"❌ {u}: {e[:80]}\n"))
-                self.after(0, lambda: self.ba_log.see("end"))
+                if self.ba_stop:
+                    break
+                delay = retry.reschedule((idx, url), attempt, e)
+                if delay is None:
+                    fail += 1
+                    line = f"❌ {url}: {str(e)[:80]}\n"
+                else:
+                    line = f"↻ {url}: retry {attempt + 1} in {delay:.0f}s ({str(e)[:60]})\n"
+                self._ui(lambda l=line: self.ba_log.insert("end", l))
+                self._ui(lambda: self.ba_log.see("end"))
+
+        self._ui(lambda: self.ba_prog.set(1))
+        self._ui(lambda: self.ba_stat.configure(text=f"✅ {ok} ok, {fail} failed / {total}"))
+        self._ui(lambda: messagebox.showinfo("Batch", f"✅ {ok} done\n❌ {fail} failed"))
 
-        self.after(0, lambda: self.ba_prog.set(1))
-        self.after(0, lambda: self.ba_stat.configure(text=f"✅ {ok} ok, {fail} failed / {total}"))
-        self.after(0, lambda: messagebox.showinfo("Batch", f"✅ {ok} done\n❌ {fail} failed"))
+    def _batch_one(self, url, out, q, fmt):
+        """Download one URL with the batch options; returns (info, timing)."""
+        timer = JobTimer(self._token("batch"))
+        try:
+            opts = self._get_base_opts(single=True)
+            opts["outtmpl"] = os.path.join(out, "%(title)s.%(ext)s")
+            timer.attach(opts)
+            if fmt in AUDIO_FORMATS:
+                opts["format"] = "bestaudio/best"
+                opts["postprocessors"] = [{
+                    "key": "FFmpegExtractAudio",
+                    "preferredcodec": fmt, "preferredquality": "192"}]
+            else:
+                opts["format"] = q
+                opts["merge_output_format"] = merge_format(fmt)
+
+            info = self._extract(opts, url, timer)
+        except Exception:
+            timer.fail()
+            raise
+        return info, timer.record()
+
+    def _t_batch_file(self, path):
+        """Batch over a streamed URL file; only counts and failures reach the UI."""
+        out = self.out_e.get().strip() if hasattr(self, "out_e") else self.cfg["download_path"]
+        os.makedirs(out, exist_ok=True)
+        q = QUALITY_MAP.get(self.ba_q.get(), "bestvideo+bestaudio/best")
+        fmt = self.ba_f.get()
+        bf = BatchFile(path)
+        st = bf.stats
+        self._ui(lambda: self.ba_log.delete("1.0", "end"))
+        if st["offset"]:
+            self.log(f"[INFO] 📄 Resuming {path} after {st['done']} done / {st['failed']} failed")
+
+        retry, todo = self._retry_schedule(), iter(bf)
+        for url, attempt in bf.deferred.items():
+            retry.push((None, url), attempt)  # left waiting by the last run: due now
+        while True:
+            job = self._next_job(todo, retry)
+            if job is None:
+                break
+            attempt, (pos, url) = job
+            try:
+                info, tm = self._batch_one(url, out, q, fmt)
+                self._add_hist(info, tm)
+                bf.commit(pos, True, url)
+            except Exception as e:
+                if self.ba_stop:
+                    break  # not committed: a resume starts with this URL again
+                delay = retry.reschedule((None, url), attempt, e)
+                if delay is None:
+                    bf.commit(pos, False, url)
+                    line = f"❌ {url}: {str(e)[:80]}\n"
+                else:
+                    bf.defer(pos, url, attempt + 1)
+                    line = f"↻ {url}: retry {attempt + 1} in {delay:.0f}s\n"
+                self._ui(lambda l=line: (
+                    self.ba_log.insert("end", l),
+                    self.ba_log.delete("1.0", "end-500l"),
+                    self.ba_log.see("end")))
+            self._ui(lambda s=dict(st), r=len(retry), f=st["offset"] / max(bf.size, 1): (
+                self.ba_prog.set(f),
+                self.ba_stat.configure(text=f"⏳ {s['done']:,} ok • {s['failed']:,} failed • "
+                                            f"{s['dupes']:,} duplicates skipped • {r:,} waiting to retry • "
+                                            f"{f * 100:.1f} %")))
+        if not self.ba_stop:
+            bf.finish()
+            self._ui(lambda: self.ba_prog.set(1))
+        self._ui(lambda: self.ba_stat.configure(
+            text=f"✅ {st['done']:,} ok, {st['failed']:,} failed, {st['dupes']:,} duplicates skipped"))
+        self._ui(lambda: messagebox.showinfo(
+            "Batch", f"✅ {st['done']:,} done\n❌ {st['failed']:,} failed"))
+
+    def _t_export(self, src, path):
+        """Metadata export of src (a URL list or a URL file) into path; only
+        counts and failed URLs reach the UI. Exporting to the same file again
+        resumes it."""
+        exp = MetadataExport(path, self.cfg.get("export_workers", 8), self.cfg.get("job_retries", 3),
+                             self.cfg.get("retry_backoff", 5))
+        if isinstance(src, str):
+            bf = BatchFile(src)
+            total, urls = bf.preview(0)[0], bf.urls()
+        else:
+            total, urls = len(src), src
+        name = os.path.basename(path)
+        if exp.exported:
+            self.log(f"[INFO] 🧾 {name} already has {len(exp.exported):,} URLs; exporting the rest")
+        self._ui(lambda: self.ba_log.delete("1.0", "end"))
+        t0 = time.monotonic()
+
+        def progress(rec, st):
+            n = st["done"] + st["failed"]
+            rate = n / max(time.monotonic() - t0, 1e-9) * 60
+            f = (n + st["skipped"] + st["dupes"]) / max(total, 1)
+            if rec["error"]:
+                line = f"❌ {rec['url']}: {rec['error'][:80]}\n"
+                self._ui(lambda: (self.ba_log.insert("end", line),
+                                  self.ba_log.delete("1.0", "end-500l"),
+                                  self.ba_log.see("end")))
+            self._ui(lambda: (
+                self.ba_prog.set(min(f, 1)),
+                self.ba_stat.configure(text=f"🧾 {st['done']:,} exported • {st['failed']:,} failed • "
+                                            f"{st['skipped']:,} already in {name} • {rate:.0f} URLs/min")))
+
+        tok = self._token("export")
+        try:
+            st = exp.run(urls, self._export_ydl, tok, progress)
+        except Exception as e:
+            self.log(f"[ERROR] Metadata export to {path}: {e}")
+            self._ui(lambda: self.ba_stat.configure(text=f"❌ Export failed: {str(e)[:80]}"))
+            return
+        secs = time.monotonic() - t0
+        text = (f"{st['done']:,} exported, {st['failed']:,} failed, {st['skipped']:,} already in {name} "
+                f"in {fmt_dur(secs)}")
+        self.log(f"[INFO] 🧾 {text}")
+        if tok.cancelled:
+            self._ui(lambda: self.ba_stat.configure(text=f"⛔ {text} — export to {name} again to resume"))
+            return
+        self._ui(lambda: (self.ba_prog.set(1), self.ba_stat.configure(text=f"✅ {text}")))
+        self._ui(lambda: messagebox.showinfo(
+            "Export", f"✅ {st['done']:,} exported\n❌ {st['failed']:,} failed\n\n{path}"))
 
     # ══════════════════════════════════════
     #  QUEUE
@@ -1495,132 +5739,477 @@ class App(ctk.CTk):
     def _enqueue_single(self):
         url = self.url_e.get().strip()
         if not url: return
+        try:
+            parse_sections(self.clip_var.get())
+        except ValueError as e:
+            messagebox.showwarning("Sections", str(e))
+            return
+        self._queue_add(QueueItem(
+            url=url,
+            title=(self.current_info and self.current_info.title) or f"Video #{self.dl_counter + 1}",
+            qual=self.qual_var.get(),
+            fmt=self.afmt.get() if self.dl_type.get() == "Audio Only" else self.vfmt.get(),
+            type=self.dl_type.get(),
+            sections=self.clip_var.get().strip() or None,
+            keyframes=self.ck_keyframes.get(),
+        ))
+
+    def _queue_add(self, item):
+        """Append to the queue unless the same video is already queued in that format
+        (and sections)."""
+        item.key = url_key(item.url, scan=False)  # Tk thread: no extractor scan
+        if any(it.key == item.key and it.fmt == item.fmt and it.sections == item.sections
+               for it in self.download_queue):
+            self.log(f"[INFO] Already queued: {item.title}")
+            self.status_lbl.configure(text="↺ Already queued")
+            return False
         self.dl_counter += 1
-        item = {
-            "id": self.dl_counter, "url": url,
-            "title": self.current_info.get("title", f"Video #{self.dl_counter}"),
-            "qual": self.qual_var.get(),
-            "fmt": self.afmt.get() if self.dl_type.get() == "Audio Only" else self.vfmt.get(),
-            "type": self.dl_type.get(),
-        }
+        item.id = self.dl_counter
         self.download_queue.append(item)
         self._add_q_widget(item)
         self.q_cnt.configure(text=f"{len(self.download_queue)} items")
+        return True
 
     def _add_q_widget(self, item):
         f = ctk.CTkFrame(self.q_scroll)
         f.grid(row=len(self.queue_widgets), column=0, sticky="ew", padx=5, pady=3)
-        f.grid_columnconfigure(1, weight=1)
+        f.grid_columnconfigure(2, weight=1)
+        handle = ctk.CTkLabel(f, text="☰", width=24, cursor="fleur", font=ctk.CTkFont(size=16),
+                              text_color=("gray50", "gray60"))
+        handle.grid(row=0, column=0, padx=(10, 0), pady=10)
+        handle.bind("<ButtonPress-1>", lambda e: setattr(self, "q_drag", item))
+        handle.bind("<ButtonRelease-1>", self._q_drop)
         sl = ctk.CTkLabel(f, text="⏳", width=30, font=ctk.CTkFont(size=16))
-        sl.grid(row=0, column=0, padx=10, pady=10)
-        ctk.CTkLabel(f, text=item["title"][:50], font=ctk.CTkFont(size=13),
-                     anchor="w").grid(row=0, column=1, padx=5, pady=10, sticky="w")
-        ctk.CTkLabel(f, text=f'{item["qual"]} • {item["fmt"]}',
-                     font=ctk.CTkFont(size=11), text_color=("gray50", "gray60")).grid(
-            row=0, column=2, padx=10)
+        sl.grid(row=0, column=1, padx=10, pady=10)
+        ctk.CTkLabel(f, text=item.title[:50], font=ctk.CTkFont(size=13),
+                     anchor="w").grid(row=0, column=2, padx=5, pady=10, sticky="w")
+        meta = ctk.CTkLabel(f, text=self._q_meta(item),
+                            font=ctk.CTkFont(size=11), text_color=("gray50", "gray60"))
+        meta.grid(row=0, column=3, padx=10)
+        size = ctk.CTkLabel(f, text="", width=70, font=ctk.CTkFont(size=11),
+                            text_color=("gray50", "gray60"))
+        size.grid(row=0, column=4, padx=5)
+        prio = ctk.CTkButton(f, text=Q_PRIO[item.prio], width=80, height=34,
+                             fg_color=("gray60", "gray30"), command=lambda: self._q_prio(item))
+        prio.grid(row=0, column=5, padx=5)
+        pause = ctk.CTkButton(f, text="⏸", width=34, height=34, fg_color=("gray60", "gray30"),
+                              command=lambda: self._q_pause(item))
+        pause.grid(row=0, column=6, padx=5)
+        ctk.CTkButton(f, text="✂", width=34, height=34, fg_color=("gray60", "gray30"),
+                       command=lambda: self._q_clip(item)).grid(row=0, column=7, padx=5)
         ctk.CTkButton(f, text="✕", width=34, height=34, fg_color=("gray60", "gray30"),
-                       command=lambda: self._rm_q(f, item)).grid(row=0, column=3, padx=10)
+                       command=lambda: self._rm_q(f, item)).grid(row=0, column=8, padx=10)
         self.queue_widgets.append((f, sl, item))
+        self.q_ctl[item.id] = {"size": size, "prio": prio, "pause": pause, "meta": meta}
+        self._q_size(item)
+        if self.cfg.get("queue_sjf"):
+            self._prefetch_queue()
+
+    def _q_status(self, item, text):
+        for f, sl, it in self.queue_widgets:
+            if it.id == item.id:
+                self._ui(lambda s=sl: s.configure(text=text)); break
+
+    def _q_size(self, item):
+        """Estimated size from the info cache; None until the info is known."""
+        if item.size is None:
+            info = INFO_CACHE.peek(item.url)
+            if info:
+                audio = item.type == "Audio Only" or item.fmt in AUDIO_FORMATS
+                item.size = est_bytes(info, item.qual, audio) or 0
+                ctl = self.q_ctl.get(item.id)
+                if ctl:
+                    self._ui(lambda l=ctl["size"], n=item.size: l.configure(
+                        text=f"~{fmt_size(n)}" if n else "?"))
+        return item.size
+
+    def _q_next(self):
+        """The item to run next: highest priority, then (with Smallest first) the
+        smallest known size, then queue order. Paused items and failed ones
+        still waiting out their retry delay are skipped."""
+        sjf = self.cfg.get("queue_sjf")
+        now = time.monotonic()
+        ready = [(i, it) for i, it in enumerate(self.download_queue)
+                 if not it.paused and it.retry_at <= now]
+        if not ready:
+            return None
+
+        def key(entry):
+            i, it = entry
+            size = (self._q_size(it) or float("inf")) if sjf else 0
+            return -it.prio, size, i
+        return min(ready, key=key)[1]
+
+    @staticmethod
+    def _q_meta(item):
+        return f"{item.qual} • {item.fmt}" + (f" • ✂ {item.sections[:30]}" if item.sections else "")
+
+    def _q_clip(self, item):
+        """Set the sections a queued item downloads; empty for the whole video."""
+        text = ctk.CTkInputDialog(title="Sections", text=(
+            "Parts to download, e.g. 1:02:00-1:07:00, 2:10:00-, or chapter titles.\n"
+            "Leave empty for the whole video.")).get_input()
+        if text is None:
+            return
+        try:
+            parse_sections(text)
+        except ValueError as e:
+            messagebox.showwarning("Sections", str(e))
+            return
+        item.sections = text.strip() or None
+        self.q_ctl[item.id]["meta"].configure(text=self._q_meta(item))
+
+    def _q_prio(self, item):
+        item.prio = {0: 1, 1: -1, -1: 0}[item.prio]
+        self.q_ctl[item.id]["prio"].configure(text=Q_PRIO[item.prio])
+
+    def _q_pause(self, item):
+        item.paused = not item.paused
+        self.q_ctl[item.id]["pause"].configure(text="▶" if item.paused else "⏸")
+        if item.paused and item is self.q_running:
+            self._cancel("queue", keep_partial=True)  # whatever cancel_partial says: resume continues
+        self._q_status(item, "⏸" if item.paused else "⏳")
+        if not item.paused:
+            self._wake_queue()
+
+    def _q_drop(self, e):
+        """Move the dragged row to where the mouse was released."""
+        item, self.q_drag = self.q_drag, None
+        if not item:
+            return
+        rows = [(f, it) for f, _, it in self.queue_widgets if it is not item]
+        pos = sum(1 for f, _ in rows if f.winfo_rooty() + f.winfo_height() / 2 < e.y_root)
+        row = next(w for w in self.queue_widgets if w[2] is item)
+        self.queue_widgets.remove(row)
+        self.queue_widgets.insert(pos, row)
+        order = {it.id: i for i, (_, _, it) in enumerate(self.queue_widgets)}
+        self.download_queue.sort(key=lambda it: order.get(it.id, 0))
+        self._q_regrid()
+
+    def _q_regrid(self):
+        for i, (f, _, _) in enumerate(self.queue_widgets):
+            f.grid(row=i, column=0, sticky="ew", padx=5, pady=3)
+
+    def _toggle_sjf(self):
+        self.cfg["queue_sjf"] = self.q_sjf.get()
+        self._save_cfg()
+        if self.cfg["queue_sjf"]:
+            self._prefetch_queue()
+
+    def _prefetch_queue(self):
+        """Sizes for Smallest first come from the info cache, so warm it for the whole queue."""
+        urls = [it.url for it in self.download_queue if it.size is None]
+        if urls:
+            INFO_CACHE.prefetch(urls, lambda: self._ydl(self._get_base_opts(single=True)))
 
     def _rm_q(self, frame, item):
+        if item is self.q_running:
+            self._cancel("queue")
         if item in self.download_queue: self.download_queue.remove(item)
+        self.queue_widgets = [w for w in self.queue_widgets if w[2] is not item]
+        self.q_ctl.pop(item.id, None)
         frame.destroy()
+        self._q_regrid()
         self.q_cnt.configure(text=f"{len(self.download_queue)} items")
 
     def _clear_queue(self):
+        self._cancel("queue")
         self.download_queue.clear()
         for w in self.q_scroll.winfo_children(): w.destroy()
         self.queue_widgets.clear()
+        self.q_ctl.clear()
         self.q_cnt.configure(text="0 items")
 
     def _run_queue(self):
         if not self.download_queue:
             messagebox.showinfo("Queue", "Empty!")
             return
-        threading.Thread(target=self._t_queue, daemon=True).start()
+        self._wake_queue()
+
+    def _wake_queue(self):
+        """Start a queue pass unless one is running (it picks up new and reordered items itself)."""
+        if self.download_queue and not self.q_active:
+            self.q_active = True
+            self._submit("download", self._profiled(self._t_queue, "queue"), slot="queue",
+                         dropped=lambda: setattr(self, "q_active", False))
 
     def _t_queue(self):
+        self.q_active = True
+        try:
+            self._t_queue_loop()
+        finally:
+            self._ui(self._queue_idle)
+
+    def _queue_idle(self):
+        """A queue pass ended. Only paused and retry-waiting items can be left; the
+        download slot is free until one is resumed or the earliest retry is due."""
+        self.q_active = False
+        if not self.download_queue:
+            messagebox.showinfo("Queue", "All done! 🎉")
+            return
+        self.q_cnt.configure(text=f"{len(self.download_queue)} items (waiting)")
+        if self._q_next():  # resumed while the pass was ending
+            self._wake_queue()
+            return
+        due = [it.retry_at for it in self.download_queue if not it.paused]
+        if due:
+            self.after(int(max(0, min(due) - time.monotonic()) * 1000) + 50, self._wake_queue)
+
+    def _t_queue_loop(self):
         while self.download_queue:
-            item = self.download_queue[0]
+            item = self._q_next()
+            if item is None:
+                return
             for f, sl, it in self.queue_widgets:
-                if it["id"] == item["id"]:
-                    self.after(0, lambda s=sl: s.configure(text="⬇️")); break
+                if it.id == item.id:
+                    self._ui(lambda s=sl: s.configure(text="⬇️")); break
 
+            timer = JobTimer(self._token("queue"))
+            self.q_running = item
             try:
-                out = self.cfg["download_path"]
-                os.makedirs(out, exist_ok=True)
-                opts = self._get_base_opts(single=True)
-                opts["outtmpl"] = os.path.join(out, "%(title)s.%(ext)s")
-                q = QUALITY_MAP.get(item["qual"], "bestvideo+bestaudio/best")
-                fmt = item["fmt"]
-                if item["type"] == "Audio Only" or fmt in AUDIO_FORMATS:
-                    opts["format"] = "bestaudio/best"
-                    opts["postprocessors"] = [{
-                        "key": "FFmpegExtractAudio",
-                        "preferredcodec": fmt if fmt in AUDIO_FORMATS else "mp3",
-                        "preferredquality": "192"}]
-                else:
-                    opts["format"] = q
-                    opts["merge_output_format"] = fmt
-
-                with yt_dlp.YoutubeDL(opts) as ydl:
-                    info = ydl.extract_info(item["url"], download=True)
-                    if info: self.after(0, lambda i=info: self._add_hist(i))
+                info = self._dl_item(item, timer)
+                self._add_hist(info, timer.record())
+                if item.source:
+                    SYNC.mark(item.source, [item.url])
 
                 for f, sl, it in self.queue_widgets:
-                    if it["id"] == item["id"]:
-                        self.after(0, lambda s=sl: s.configure(text="✅")); break
-            except Exception:
-                for f, sl, it in self.queue_widgets:
-                    if it["id"] == item["id"]:
-                        self.after(0, lambda s=sl: s.configure(text="❌")); break
-
-            self.download_queue.pop(0)
-            self.after(0, lambda: self.q_cnt.configure(
+                    if it.id == item.id:
+                        self._ui(lambda s=sl: s.configure(text="✅")); break
+            except Exception as e:
+                timer.fail()
+                self.q_running = None
+                if item.paused and timer.token.cancelled:
+                    self._q_status(item, "⏸")
+                    continue  # stays queued; resuming picks up the .part file
+                attempt = item.attempt
+                delay = None if timer.token.cancelled else retry_delay(
+                    e, attempt, self.cfg.get("job_retries", 3), self.cfg.get("retry_backoff", 5))
+                if delay is not None:
+                    item.attempt, item.retry_at = attempt + 1, time.monotonic() + delay
+                    METRICS.inc("ytdl_job_retries")
+                    self.log(f"[WARN] ↻ {item.title}: retry {attempt + 1} in {delay:.0f}s ({e})")
+                    self._q_status(item, "↻")
+                    continue  # stays queued (.part kept) until its retry time
+                self._q_status(item, "⛔" if timer.token.cancelled else "❌")
+
+            self.q_running = None
+            if item in self.download_queue:
+                self.download_queue.remove(item)
+            self._ui(lambda: self.q_cnt.configure(
                 text=f"{len(self.download_queue)} items"))
 
-        self.after(0, lambda: messagebox.showinfo("Queue", "All done! 🎉"))
+    def _dl_item(self, item, timer):
+        """Download one queue item ({url, qual, fmt, type}); returns the info dict."""
+        out = self.cfg["download_path"]
+        os.makedirs(out, exist_ok=True)
+        opts = self._get_base_opts(single=True)
+        opts["outtmpl"] = os.path.join(out, "%(title)s.%(ext)s")
+        timer.attach(opts)
+        q = QUALITY_MAP.get(item.qual, "bestvideo+bestaudio/best")
+        fmt = item.fmt
+        if item.type == "Audio Only" or fmt in AUDIO_FORMATS:
+            opts["format"] = "bestaudio/best"
+            opts["postprocessors"] = [{
+                "key": "FFmpegExtractAudio",
+                "preferredcodec": fmt if fmt in AUDIO_FORMATS else "mp3",
+                "preferredquality": "192"}]
+        else:
+            opts["format"] = q
+            opts["merge_output_format"] = merge_format(fmt)
+        clip_opts(opts, item.sections, item.keyframes)
+
+        return self._extract(opts, item.url, timer)
 
     # ══════════════════════════════════════
-    #  SEARCH  (YouTube-style with thumbnails)
+    #  SHARED QUEUE
     # ══════════════════════════════════════
 
-    def _do_search(self):
-        query = self.srch_e.get().strip()
-        if not query: return
+    def _run_shared_job(self, sq, job):
+        """Download a claimed job under its lease; returns its history entry, or None."""
+        timer = JobTimer(self._token("shared"))
         try:
-            mx = int(self.srch_max.get())
-        except ValueError:
-            mx = 15
-
-        self.srch_btn.configure(state="disabled", text="⏳…")
-        self.srch_stat.configure(text=f"🔍 Searching: {query}…")
-        for w in self.srch_scroll.winfo_children(): w.destroy()
-        threading.Thread(target=self._t_search, args=(query, mx), daemon=True).start()
-
-    def _t_search(self, query, mx):
+            with sq.leased(job):
+                info = self._dl_item(QueueItem(url=job["url"], title=job["url"], qual=job["qual"],
+                                               fmt=job["fmt"], type=job["type"], sections=job["sections"] or None,
+                                               keyframes=bool(job["keyframes"])), timer)
+        except Exception as e:
+            timer.fail()
+            if timer.token.cancelled:
+                sq.release(job)
+                self.log(f"[INFO] ⛔ {job['url']}: cancelled, handed back")
+                return None
+            delay = retry_delay(e, job["attempts"], sq.max_attempts - 1, self.cfg.get("retry_backoff", 5))
+            sq.fail(job, e, delay)
+            self.log(f"[ERROR] {job['url']}: {e}" + (f" (retry in {delay:.0f}s)" if delay is not None else ""))
+            return None
+        rec = self._hist_record(info or {"webpage_url": job["url"]}, timer.record())
+        sq.complete(job, rec.to_dict())
+        if job["source"]:
+            SYNC.mark(job["source"], [job["url"]])
+        return rec
+
+    def _shared(self):
+        path = self.sq_path.get().strip()
+        if not path:
+            messagebox.showwarning("Shared Queue", "Choose a shared queue file first")
+            return None
+        if path != self.cfg.get("shared_queue_path"):
+            self.cfg["shared_queue_path"] = path
+            self._save_cfg()
         try:
-            opts = self._get_base_opts()
-            opts["extract_flat"] = True
-            opts["skip_download"] = True
-
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                res = ydl.extract_info(f"ytsearch{mx}:{query}", download=False)
+            return SharedQueue(path)
+        except sqlite3.Error as e:
+            messagebox.showerror("Shared Queue", str(e))
+            return None
+
+    def _browse_shared(self):
+        f = filedialog.asksaveasfilename(defaultextension=".db", confirmoverwrite=False,
+                                          filetypes=[("SQLite", "*.db"), ("All", "*.*")])
+        if f:
+            self.sq_path.delete(0, "end")
+            self.sq_path.insert(0, f)
+            self._refresh_shared()
 
-            entries = [e for e in res.get("entries", []) if e]
-            self.after(0, lambda: self._render_search(entries))
-        except Exception as e:
-            self.after(0, lambda: self.srch_btn.configure(state="normal", text="🔍 Search"))
-            self.after(0, lambda: self.srch_stat.configure(text=f"❌ {str(e)[:80]}"))
+    def _push_shared(self, items):
+        sq = self._shared()
+        if not sq or not items:
+            return
+        groups = {}
+        for it in items:
+            groups.setdefault((it.qual, it.fmt, it.type, it.sections, it.keyframes, it.source), []).append(it.url)
+        n = sum(sq.add(urls, *key) for key, urls in groups.items())
+        self.log(f"[INFO] 🌐 {n} new jobs pushed to {sq.path}")
+        self._refresh_shared()
+
+    def _push_queue_shared(self):
+        if self.download_queue:
+            self._push_shared(list(self.download_queue))
+            self._clear_queue()
+
+    def _push_batch_shared(self):
+        txt = self.batch_txt.get("1.0", "end").strip()
+        urls = [u.strip() for u in txt.splitlines() if u.strip() and not u.startswith("#")]
+        typ = "Audio Only" if self.ba_f.get() in AUDIO_FORMATS else "Video"
+        self._push_shared([QueueItem(url=u, qual=self.ba_q.get(), fmt=self.ba_f.get(), type=typ)
+                           for u in urls])
+
+    def _refresh_shared(self):
+        path = self.sq_path.get().strip()
+        if not path or not os.path.exists(path):
+            self.sq_stat.configure(text="")
+            return
+        try:
+            counts, workers = SharedQueue(path).status()
+        except sqlite3.Error as e:
+            self.sq_stat.configure(text=f"❌ {e}")
+            return
+        alive = sum(1 for w in workers if time.time() - w["last_seen"] < 120)
+        self.sq_stat.configure(text=" • ".join(f"{k} {v}" for k, v in sorted(counts.items()))
+                               + f"  |  {alive} workers")
 
-    def _render_search(self, entries):
-        self.srch_btn.configure(state="normal", text="🔍 Search")
-        self.srch_stat.configure(text=f"✅ {len(entries)} results found")
+    def _work_shared(self):
+        sq = self._shared()
+        if not sq:
+            return
+        self.sq_stop = False
+        self._submit("download", self._profiled(self._t_shared, "shared"), sq, slot="shared")
+
+    def _t_shared(self, sq):
+        self.log(f"[INFO] 🌐 Working shared queue {sq.path} as {sq.worker_id}")
+        done = 0
+        while not self.sq_stop:
+            job = sq.claim()
+            if not job:
+                wait = sq.next_retry()
+                if wait is None:
+                    break
+                time.sleep(min(wait, 5))  # only jobs waiting out a retry delay are left
+                continue
+            self._ui(lambda j=job: self.sq_stat.configure(text=f"⬇️ {j['url'][:60]}"))
+            res = self._run_shared_job(sq, job)
+            if res:
+                done += 1
+                self._ui(lambda r=res: self._append_hist(r))
+        self.log(f"[INFO] 🌐 Shared queue: {done} jobs done by this instance")
+        self._ui(self._refresh_shared)
 
-        for w in self.srch_scroll.winfo_children():
-            w.destroy()
+    # ══════════════════════════════════════
+    #  SEARCH  (YouTube-style with thumbnails)
+    # ══════════════════════════════════════
 
-        for i, e in enumerate(entries):
+    def _do_search(self):
+        query = self.srch_e.get().strip()
+        if not query: return
+        try:
+            mx = max(1, int(self.srch_max.get()))
+        except ValueError:
+            mx = 15
+
+        self.srch_q = (query, mx)
+        self.srch_btn.configure(state="disabled", text="⏳…")
+        self.srch_stat.configure(text=f"🔍 Searching: {query}…")
+        for w in self.srch_scroll.winfo_children(): w.destroy()
+        self.srch_rows, self.srch_more = 0, None
+        self.srch_busy = True
+        self._submit("fetch", self._t_search, query, mx, 0, slot="search")
+
+    def _search_more(self):
+        if self.srch_busy or not self.srch_more or not self.srch_q:
+            return
+        self.srch_busy = True
+        self.srch_more.configure(state="disabled", text="⏳ Loading…")
+        query, mx = self.srch_q
+        self._submit("fetch", self._t_search, query, mx, self.srch_page + 1, slot="search")
+
+    def _search_opts(self):
+        opts = self._get_base_opts()
+        opts["extract_flat"] = True
+        opts["skip_download"] = True
+        return opts
+
+    def _t_search(self, query, mx, page=0):
+        try:
+            t0 = time.monotonic()
+            entries, more, hit = SEARCH_CACHE.page(query, page, mx, lambda: self._ydl(self._search_opts()))
+            secs = time.monotonic() - t0
+            self._ui(lambda: self._render_search(entries, query, mx, page, more, hit, secs))
+        except Exception as e:
+            def _fail(msg=str(e)[:80]):
+                self.srch_busy = False
+                self.srch_btn.configure(state="normal", text="🔍 Search")
+                self.srch_stat.configure(text=f"❌ {msg}")
+                if self.srch_more:
+                    self.srch_more.configure(state="normal", text="⬇️ Load more")
+            self._ui(_fail)
+
+    def _t_search_prefetch(self, query, mx, page):
+        """Warm the next page while the user reads this one."""
+        try:
+            SEARCH_CACHE.page(query, page, mx, lambda: self._ydl(self._search_opts()))
+        except Exception:
+            pass
+
+    def _render_search(self, entries, query, mx, page, more, hit, secs):
+        if self.srch_q != (query, mx):
+            return  # a newer search replaced this one
+        self.srch_busy = False
+        self.srch_btn.configure(state="normal", text="🔍 Search")
+
+        if page == 0:
+            for w in self.srch_scroll.winfo_children():
+                w.destroy()
+            self.srch_rows = 0
+        if self.srch_more:
+            self.srch_more.destroy()
+            self.srch_more = None
+        self.srch_page = page
+        first = self.srch_rows
+        self.srch_rows += len(entries)
+        took = "cached" if hit else f"{secs:.1f}s"
+        self.srch_stat.configure(text=f"✅ {self.srch_rows} results found ({took})"
+                                      + ("" if more else " · end of results"))
+
+        for i, e in enumerate(entries, first):
             card = ctk.CTkFrame(self.srch_scroll, corner_radius=12,
                                 fg_color=("gray88", "gray17"),
                                 border_width=1,
@@ -1663,7 +6252,7 @@ class App(ctk.CTk):
                                 text_color="white",
                                 corner_radius=4, height=20)
                             badge.place(relx=0.95, rely=0.92, anchor="se")
-                    self.after(0, _apply)
+                    self._ui(_apply)
 
                 load_thumbnail(thumb_url, (168, 94), set_thumb)
             elif dur_text:
@@ -1736,6 +6325,16 @@ class App(ctk.CTk):
                            command=lambda u=vid_url: self._copy_url(u)).pack(
                 side="left")
 
+        if more:
+            self.srch_more = ctk.CTkButton(self.srch_scroll, text="⬇️ Load more", height=36,
+                                           fg_color=("gray60", "gray30"),
+                                           hover_color=("gray50", "gray40"),
+                                           corner_radius=8, command=self._search_more)
+            self.srch_more.grid(row=self.srch_rows, column=0, padx=8, pady=(6, 12))
+            self._submit("fetch", self._t_search_prefetch, query, mx, page + 1)
+        if page == 0:
+            self._prefetch_infos([e.get("url") or e.get("webpage_url") or e.get("id", "") for e in entries])
+
     def _copy_url(self, url):
         full = url if url.startswith("http") else f"https://www.youtube.com/watch?v={url}"
         self.clipboard_clear()
@@ -1750,12 +6349,7 @@ class App(ctk.CTk):
 
     def _search_queue(self, url, title):
         full = url if url.startswith("http") else f"https://www.youtube.com/watch?v={url}"
-        self.dl_counter += 1
-        item = {"id": self.dl_counter, "url": full, "title": title,
-                "qual": "Best Quality", "fmt": "mp4", "type": "Video"}
-        self.download_queue.append(item)
-        self._add_q_widget(item)
-        self.q_cnt.configure(text=f"{len(self.download_queue)} items")
+        self._queue_add(QueueItem(url=full, title=title, qual="Best Quality", fmt="mp4", type="Video"))
 
     # ══════════════════════════════════════
     #  HISTORY
@@ -1769,19 +6363,22 @@ class App(ctk.CTk):
             f.grid(row=i, column=0, sticky="ew", padx=5, pady=2)
             f.grid_columnconfigure(1, weight=1)
             ctk.CTkLabel(f, text="✅", width=28).grid(row=0, column=0, padx=8, pady=8)
-            ctk.CTkLabel(f, text=e.get("title", "?")[:50],
+            ctk.CTkLabel(f, text=(e.title or "?")[:50],
                          font=ctk.CTkFont(size=12), anchor="w").grid(
                 row=0, column=1, padx=5, pady=8, sticky="w")
             try:
-                dt = datetime.fromisoformat(e["timestamp"]).strftime("%m/%d %H:%M")
+                dt = datetime.fromisoformat(e.timestamp).strftime("%m/%d %H:%M")
             except Exception:
                 dt = "?"
             ctk.CTkLabel(f, text=dt, font=ctk.CTkFont(size=11),
                          text_color=("gray50", "gray60")).grid(row=0, column=2, padx=8)
-            ctk.CTkLabel(f, text=f'{e.get("format", "?")} • {fmt_size(e.get("size"))}',
+            meta = f'{e.format or "?"} • {fmt_size(e.size)}'
+            if e.elapsed:
+                meta += f' • ⏱ {e.elapsed:.1f}s'
+            ctk.CTkLabel(f, text=meta,
                          font=ctk.CTkFont(size=11), text_color=("gray50", "gray60")).grid(
                 row=0, column=3, padx=8)
-            url = e.get("url", "")
+            url = e.url
             if url:
                 ctk.CTkButton(f, text="🔄", width=34, height=28,
                                fg_color=("gray55", "gray30"),
@@ -1793,17 +6390,48 @@ class App(ctk.CTk):
 
         if hasattr(self, "hist_cnt"):
             self.hist_cnt.configure(text=f"{len(self.history)} items")
+        if hasattr(self, "hist_stats"):
+            self.hist_stats.configure(text=self._hist_summary())
+
+    def _hist_summary(self, days=7):
+        """Per-day job count, median phase latencies and median throughput."""
+        by_day = {}
+        for e in self.history:
+            if not e.phases:
+                continue
+            by_day.setdefault(str(e.timestamp or "")[:10], []).append(e)
+        if not by_day:
+            return ""
+
+        def med(vals):
+            vals = [v for v in vals if v is not None]
+            return statistics.median(vals) if vals else None
+
+        lines = [f"{'day':<10}  {'jobs':>4}  {'extract':>8}  {'download':>8}  "
+                 f"{'merge+pp':>8}  {'speed':>11}"]
+        for day in sorted(by_day)[-days:]:
+            es = by_day[day]
+            ext = med([e.phases.get("extract", {}).get("seconds") for e in es])
+            dl = med([e.phases.get("download", {}).get("seconds") for e in es])
+            pp = med([sum(e.phases.get(k, {}).get("seconds", 0) for k in ("merge", "postprocess"))
+                      for e in es])
+            tp = med([e.throughput for e in es])
+            lines.append(
+                f"{day:<10}  {len(es):>4}  "
+                + "  ".join(f"{v:>7.1f}s" if v is not None else f"{'—':>8}" for v in (ext, dl, pp))
+                + f"  {fmt_size(tp) + '/s' if tp else '—':>11}")
+        return "\n".join(lines)
 
     def _filter_hist(self):
         q = self.hist_search.get().lower()
         for w in self.hist_scroll.winfo_children(): w.destroy()
-        filtered = [e for e in self.history if q in e.get("title", "").lower()]
+        filtered = [e for e in self.history if q in (e.title or "").lower()]
         for i, e in enumerate(reversed(filtered[-200:])):
             f = ctk.CTkFrame(self.hist_scroll)
             f.grid(row=i, column=0, sticky="ew", padx=5, pady=2)
             f.grid_columnconfigure(1, weight=1)
             ctk.CTkLabel(f, text="✅", width=28).grid(row=0, column=0, padx=8, pady=8)
-            ctk.CTkLabel(f, text=e.get("title", "?")[:50],
+            ctk.CTkLabel(f, text=(e.title or "?")[:50],
                          font=ctk.CTkFont(size=12), anchor="w").grid(
                 row=0, column=1, padx=5, pady=8, sticky="w")
 
@@ -1819,12 +6447,23 @@ class App(ctk.CTk):
         if not f: return
         if f.endswith(".csv"):
             import csv
+            cols = ["title", "url", "timestamp", "format", "size", "duration", "status", "hash", "hashes",
+                    "elapsed", "throughput", "effective_throughput"]
+            for ph in JOB_PHASES:
+                cols += [f"{ph}_start", f"{ph}_end", f"{ph}_seconds", f"{ph}_bytes"]
             with open(f, "w", newline="", encoding="utf-8") as fh:
-                w = csv.DictWriter(fh, fieldnames=["title", "url", "timestamp", "format", "size"])
+                w = csv.DictWriter(fh, fieldnames=cols, extrasaction="ignore")
                 w.writeheader()
-                w.writerows(self.history)
+                for e in self.history:
+                    row = e.to_dict()
+                    if e.hashes:
+                        row["hashes"] = "; ".join(f"{n}={h}" for n, h in e.hashes.items())
+                    for ph, v in (e.phases or {}).items():
+                        for k in ("start", "end", "seconds", "bytes"):
+                            row[f"{ph}_{k}"] = v.get(k)
+                    w.writerow(row)
         else:
-            self._save_json(f, self.history)
+            self._save_json(f, [e.to_dict() for e in self.history])
         messagebox.showinfo("Export", f"Saved to {f}")
 
     # ══════════════════════════════════════
@@ -1847,17 +6486,69 @@ class App(ctk.CTk):
             self.cfg["speed_limit"] = int(self.s_speed.get())
         except ValueError:
             self.cfg["speed_limit"] = 0
+        self.cfg["parallel_audio"] = self.s_par_audio.get()
+        try:
+            self.cfg["parallel_audio_min_duration"] = int(self.s_par_min.get()) * 60
+        except ValueError:
+            self.cfg["parallel_audio_min_duration"] = 600
+        try:
+            self.cfg["prefetch_count"] = max(0, int(self.s_prefetch.get()))
+        except ValueError:
+            self.cfg["prefetch_count"] = 5
+        self.cfg["cancel_partial"] = "delete" if self.s_cancel_del.get() else "keep"
+        self.cfg["staging_dir"] = self.s_stage.get().strip()
+        try:
+            self.cfg["staging_cap_gb"] = max(0.0, float(self.s_stage_cap.get()))
+        except ValueError:
+            self.cfg["staging_cap_gb"] = 20
+        self._apply_staging()
+        try:
+            self.cfg["min_free_gb"] = max(0.0, float(self.s_min_free.get()))
+        except ValueError:
+            self.cfg["min_free_gb"] = 1
+        self.cfg["preflight"] = self.s_preflight.get()
+        self._apply_disk_guard()
+        self.cfg["integrity_hash"] = self.s_hash.get()
+        self._apply_integrity()
+        self.cfg["store_dir"] = self.s_store.get().strip()
+        self.cfg["store_link"] = self.s_store_link.get()
+        self._apply_store()
+        try:
+            self.cfg["download_workers"] = max(1, int(self.s_dl_workers.get()))
+        except ValueError:
+            self.cfg["download_workers"] = 4
+        self._apply_orchestrator()
+        try:
+            self.cfg["job_retries"] = max(0, int(self.s_retries.get()))
+        except ValueError:
+            self.cfg["job_retries"] = 3
         self.cfg["proxy"] = self.s_proxy.get().strip()
+        self.cfg["proxy_pool"] = self.s_proxy_pool.get().replace(",", " ").split()
+        self.cfg["proxy_policy"] = self.s_proxy_policy.get()
+        self._apply_proxies()
         self.cfg["geo_bypass"] = self.s_geo.get()
+        if (self.cfg.get("cookies_browser"), self.cfg.get("use_cookies")) != \
+                (self.s_cookies_browser.get(), self.s_use_cookies.get()):
+            COOKIES.clear()
         self.cfg["use_cookies"] = self.s_use_cookies.get()
         self.cfg["cookies_browser"] = self.s_cookies_browser.get()
+        self.cfg["cookie_cache_disk"] = self.s_cookie_disk.get()
+        self._apply_cookie_cache()
         self.cfg["embed_thumbnail"] = self.s_ethumb.get()
+        self.cfg["clip_keyframes"] = self.ck_keyframes.get()
         self.cfg["embed_subtitles"] = self.s_esub.get()
         self.cfg["sponsor_block"] = self.s_sb.get()
         self.cfg["clipboard_monitor"] = self.s_clip.get()
         self.cfg["subtitle_lang"] = self.s_slang.get().strip() or "en"
+        self.cfg["metrics_enabled"] = self.s_metrics.get()
+        try:
+            self.cfg["metrics_port"] = int(self.s_metrics_port.get())
+        except ValueError:
+            self.cfg["metrics_port"] = 9464
+        self.cfg["profile_jobs"] = self.s_prof_jobs.get()
 
         self._save_cfg()
+        self._apply_metrics()
         os.makedirs(self.cfg["download_path"], exist_ok=True)
         self.out_e.delete(0, "end")
         self.out_e.insert(0, self.cfg["download_path"])
@@ -1880,10 +6571,8 @@ class App(ctk.CTk):
             cur = self.clipboard_get().strip()
             if cur and cur != self.last_clip:
                 self.last_clip = cur
-                if any(p in cur for p in [
-                    "youtube.com/watch", "youtu.be/",
-                    "youtube.com/shorts", "youtube.com/playlist"
-                ]):
+                if "\n" not in cur and len(cur) < 2048 and \
+                        url_key(cur, scan=False).startswith(("Youtube:", "YoutubeTab:")):
                     self.url_e.delete(0, "end")
                     self.url_e.insert(0, cur)
                     self.status_lbl.configure(text="📋 URL detected!")
@@ -1892,6 +6581,213 @@ class App(ctk.CTk):
         self.after(1500, self._poll_clipboard)
 
 
-if __name__ == "__main__":
+# ══════════════════════════════════════
+#  HEADLESS WORKER
+# ══════════════════════════════════════
+
+class HeadlessApp:
+    """The download half of App without a display, for shared-queue workers on
+    servers. Option building and the job code are App's own methods."""
+
+    _get_base_opts = App._get_base_opts
+    _ydl = App._ydl
+    _extract = App._extract
+    _dl_item = App._dl_item
+    _run_shared_job = App._run_shared_job
+    _sync_scan = App._sync_scan
+    _export_ydl = App._export_ydl
+    _apply_proxies = App._apply_proxies
+    _apply_cookie_cache = App._apply_cookie_cache
+    _apply_staging = App._apply_staging
+    _staged = App._staged
+    _guarded = App._guarded
+    _apply_disk_guard = App._apply_disk_guard
+    _apply_integrity = App._apply_integrity
+    _apply_store = App._apply_store
+    _apply_ffmpeg = App._apply_ffmpeg
+    _token = App._token
+    _hist_record = staticmethod(App._hist_record)
+
+    def __init__(self, cfg=None):
+        self.cfg = cfg or App._load_json(CONFIG_FILE, DEFAULT_CONFIG)
+        self.stop = False
+        self.tokens = {}
+        self._apply_proxies()
+        self._apply_cookie_cache()
+        self._apply_staging()
+        self._apply_disk_guard()
+        self._apply_integrity()
+        self._apply_store()
+        self._apply_ffmpeg()
+
+    def log(self, msg):
+        if not msg.startswith("[DBG]"):
+            print(f"[{datetime.now():%H:%M:%S}] {msg}", flush=True)
+
+    def work(self, sq, follow=False, poll=10):
+        """Claim and download jobs until the queue is empty, or forever with follow."""
+        self.log(f"[INFO] 🌐 Working shared queue {sq.path} as {sq.worker_id}")
+        done = failed = 0
+        while not self.stop:
+            job = sq.claim()
+            if not job:
+                wait = sq.next_retry()
+                if wait is None and not follow:
+                    break
+                time.sleep(poll if wait is None else min(wait, poll))
+                continue
+            self.log(f"[INFO] ⬇️ {job['url']}")
+            if self._run_shared_job(sq, job):
+                done += 1
+            else:
+                failed += 1
+        self.log(f"[INFO] 🌐 {done} done, {failed} failed by {sq.worker_id}")
+        return done, failed
+
+    def sync(self, url, baseline=False, qual="Best Quality", fmt="mp4"):
+        """Download what is new on a channel or playlist since its last sync.
+        With baseline, a first sync only remembers the current videos."""
+        t0 = time.monotonic()
+        title, new, read, first = self._sync_scan(url)
+        self.log(f"[INFO] 🔄 {title}: {len(new)} new, {read} checked in {time.monotonic() - t0:.1f}s")
+        if first and baseline:
+            SYNC.mark(url, [e.url for e in new])
+            self.log(f"[INFO] 🔄 First sync: {len(new)} videos remembered, none downloaded")
+            return 0, 0
+        typ = "Audio Only" if fmt in AUDIO_FORMATS else "Video"
+        done = failed = 0
+        for e in reversed(new):
+            if self.stop:
+                break
+            self.log(f"[INFO] ⬇️ {e.title or e.url}")
+            timer = JobTimer(self._token("sync"))
+            try:
+                self._dl_item(QueueItem(url=e.url, title=e.title, qual=qual, fmt=fmt, type=typ), timer)
+            except Exception as ex:
+                timer.fail()
+                self.log(f"[ERROR] {e.url}: {ex}")
+                failed += 1
+                continue
+            SYNC.mark(url, [e.url])
+            done += 1
+        self.log(f"[INFO] 🔄 {title}: {done} downloaded, {failed} failed")
+        return done, failed
+
+    def export(self, src, path, workers=None):
+        """Metadata for every URL in the file src into path (.jsonl or .csv),
+        without downloading. An earlier export to path is resumed."""
+        exp = MetadataExport(path, workers or self.cfg.get("export_workers", 8),
+                             self.cfg.get("job_retries", 3), self.cfg.get("retry_backoff", 5))
+        if exp.exported:
+            self.log(f"[INFO] 🧾 {path} already has {len(exp.exported):,} URLs; exporting the rest")
+        t0 = time.monotonic()
+
+        def progress(rec, st):
+            if rec["error"]:
+                self.log(f"[WARN] {rec['url']}: {rec['error']}")
+            n = st["done"] + st["failed"]
+            if n % 100 == 0:
+                self.log(f"[INFO] 🧾 {n:,} rows, {n / (time.monotonic() - t0) * 60:.0f} URLs/min")
+
+        tok = self._token("export")
+        st = exp.run(BatchFile(src).urls(), self._export_ydl, tok, progress)
+        self.log(f"[INFO] 🧾 {st['done']:,} exported, {st['failed']:,} failed, {st['skipped']:,} already "
+                 f"in {path}, {st['dupes']:,} duplicates in {fmt_dur(time.monotonic() - t0)}")
+        if tok.cancelled:
+            self.log("[INFO] ⛔ Stopped; run the same export again to resume")
+        return st
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=f"{APP_NAME} v{APP_VERSION}")
+    ap.add_argument("--profile-jobs", action="store_true",
+                    help="profile every download job (cProfile + tracemalloc)")
+    ap.add_argument("--profile-window", type=float, metavar="SECONDS",
+                    help="profile the whole app, Tk loop included, for SECONDS after startup")
+    ap.add_argument("--profile-dir", help=f"where profiles are written (default: {PROFILE_DIR})")
+    sq = ap.add_argument_group("shared queue")
+    sq.add_argument("--shared-queue", metavar="DB", help="SQLite job queue shared by several instances")
+    sq.add_argument("--add", metavar="FILE", help="queue the URLs in FILE (one per line) and exit")
+    sq.add_argument("--quality", default="Best Quality", choices=VIDEO_QUALITIES, help="for --add and --sync")
+    sq.add_argument("--format", default="mp4", choices=VIDEO_FORMATS + AUDIO_FORMATS,
+                    help="for --add and --sync")
+    sq.add_argument("--worker", action="store_true", help="work the queue without a GUI until it is empty")
+    sq.add_argument("--follow", action="store_true", help="with --worker: keep polling for new jobs")
+    sq.add_argument("--worker-id", help="default: <hostname>-<pid>")
+    sq.add_argument("--lease", type=float, default=60, help="seconds a claimed job stays reserved")
+    sq.add_argument("--out", help="with --worker or --sync: download directory")
+    sq.add_argument("--status", action="store_true", help="print job and worker counts and exit")
+    ap.add_argument("--store-gc", action="store_true",
+                    help="remove content store files no download folder links to, and exit")
+    sy = ap.add_argument_group("channel sync")
+    sy.add_argument("--sync", metavar="URL", action="append",
+                    help="download what is new on a channel or playlist since the last sync, and exit "
+                         "(repeatable)")
+    sy.add_argument("--sync-baseline", action="store_true",
+                    help="with --sync: a first sync remembers the current videos instead of downloading them")
+    me = ap.add_argument_group("metadata export")
+    me.add_argument("--export", metavar="FILE",
+                    help="write the metadata of every URL in FILE (.txt, .csv or .jsonl list) without "
+                         "downloading, and exit")
+    me.add_argument("--export-out", metavar="PATH",
+                    help="a .jsonl or .csv file (default: FILE.meta.jsonl); an existing one is resumed")
+    me.add_argument("--export-workers", type=int, metavar="N",
+                    help="extractions in parallel (default: export_workers from the config)")
+    a = ap.parse_args(argv)
+
+    if a.export:
+        HeadlessApp().export(a.export, a.export_out or os.path.splitext(a.export)[0] + ".meta.jsonl",
+                             a.export_workers)
+        return 0
+
+    if a.sync:
+        worker = HeadlessApp()
+        if a.out:
+            worker.cfg["download_path"] = a.out
+        failed = sum(worker.sync(url, a.sync_baseline, a.quality, a.format)[1] for url in a.sync)
+        return 1 if failed else 0
+
+    if a.store_gc:
+        HeadlessApp()
+        if not STORE:
+            print("No content store set (store_dir)")
+            return 1
+        n, freed = STORE.gc()
+        print(f"{n} unreferenced files removed" + (f", {fmt_size(freed)} freed" if freed else ""))
+        return 0
+
+    if a.shared_queue and (a.add or a.worker or a.status):
+        q = SharedQueue(a.shared_queue, a.worker_id, a.lease)
+        if a.add:
+            with open(a.add, encoding="utf-8") as f:
+                urls = (u.strip() for u in f)
+                typ = "Audio Only" if a.format in AUDIO_FORMATS else "Video"
+                n = q.add((u for u in urls if u and not u.startswith("#")), a.quality, a.format, typ)
+            print(f"{n} new jobs queued")
+        if a.worker:
+            worker = HeadlessApp()
+            if a.out:
+                worker.cfg["download_path"] = a.out
+            worker.work(q, follow=a.follow)
+        if a.status:
+            counts, workers = q.status()
+            print("  ".join(f"{k}: {v}" for k, v in sorted(counts.items())) or "empty")
+            for w in workers:
+                print(f'  {w["id"]:<30} done {w["done"]:>6}  failed {w["failed"]:>4}  '
+                      f'seen {datetime.fromtimestamp(w["last_seen"]):%Y-%m-%d %H:%M:%S}')
+        return 0
+
     app = App()
-    app.mainloop()
\ No newline at end of file
+    app.profile_jobs = a.profile_jobs
+    app.profile_dir = a.profile_dir
+    if a.profile_window:
+        app._profile_window(a.profile_window)
+    if a.shared_queue:
+        app.sq_path.delete(0, "end")
+        app.sq_path.insert(0, a.shared_queue)
+        app._refresh_shared()
+    app.mainloop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file